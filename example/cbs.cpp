@@ -7,6 +7,7 @@
 #include <yaml-cpp/yaml.h>
 
 #include <libMultiRobotPlanning/cbs.hpp>
+#include "plan_output.hpp"
 #include "timer.hpp"
 
 using libMultiRobotPlanning::CBS;
@@ -575,13 +576,16 @@ int main(int argc, char* argv[]) {
   std::string mapFile;
   std::string robotFile;
   std::string outputFile;
+  std::string outputFormat;
   desc.add_options()("help", "produce help message")
       ("map file,m", po::value<std::string>(&mapFile)->required(),
       "map data file (YAML)")
       ("robot file,r", po::value<std::string>(&robotFile)->required(),
       "robot locations (YAML)")
       ("output,o", po::value<std::string>(&outputFile)->required(),
-       "output file (YAML)");
+       "output file")
+      ("format", po::value<std::string>(&outputFormat)->default_value("yaml"),
+       "output file format: yaml or binary (see plan_output.hpp)");
 
   try {
     po::variables_map vm;
@@ -592,6 +596,9 @@ int main(int argc, char* argv[]) {
       std::cout << desc << "\n";
       return 0;
     }
+    if (outputFormat != "yaml" && outputFormat != "binary") {
+      throw po::error("--format must be yaml or binary");
+    }
   } catch (po::error& e) {
     std::cerr << e.what() << std::endl << std::endl;
     std::cerr << desc << std::endl;
@@ -640,6 +647,12 @@ int main(int argc, char* argv[]) {
       makespan = std::max<int>(makespan, s.cost);
     }
 
+    if (outputFormat == "binary") {
+      writeBinaryPlans(outputFile, solution, cost, makespan,
+                       timer.elapsedSeconds(), mapf.highLevelExpanded(),
+                       mapf.lowLevelExpanded());
+      return 0;
+    }
     std::ofstream out(outputFile);
     out << "statistics:" << std::endl;
     out << "  cost: " << cost << std::endl;
@@ -1,5 +1,6 @@
 #include <fstream>
 #include <iostream>
+#include <sstream>
 
 #include <boost/functional/hash.hpp>
 #include <boost/program_options.hpp>
@@ -7,6 +8,7 @@
 #include <yaml-cpp/yaml.h>
 
 #include <libMultiRobotPlanning/ecbs.hpp>
+#include "plan_output.hpp"
 #include "timer.hpp"
 
 using libMultiRobotPlanning::ECBS;
@@ -526,6 +528,83 @@ class Environment {
   int m_lowLevelExpanded;
 };
 
+// Planner service (--serve): the map stays loaded and every line of stdin is a
+// request
+//   plan <w> <agent count> <start x> <start y> <goal x> <goal y> ...
+// answered on stdout by
+//   ok <cost> <makespan> <runtime> <highLevelExpanded> <lowLevelExpanded>
+// and a line "<state count> <x> <y> <t> ..." per agent, or by "fail" if there
+// is no solution and "error <message>" for a malformed request. "quit" (or the
+// end of stdin) stops the service. Log output goes to stderr.
+int serve(int dimx, int dimy, const std::unordered_set<Location>& obstacles) {
+  std::ostream response(std::cout.rdbuf());
+  std::cout.rdbuf(std::cerr.rdbuf());
+
+  std::string line;
+  while (std::getline(std::cin, line)) {
+    std::istringstream request(line);
+    std::string command;
+    request >> command;
+    if (command == "quit") {
+      break;
+    }
+    float w;
+    size_t agentCount;
+    if (command != "plan" || !(request >> w >> agentCount)) {
+      response << "error expected: plan <w> <agent count> <starts and goals>"
+               << std::endl;
+      continue;
+    }
+    std::vector<State> startStates;
+    std::vector<Location> goals;
+    bool valid = true;
+    for (size_t a = 0; a < agentCount && valid; ++a) {
+      int sx, sy, gx, gy;
+      valid = static_cast<bool>(request >> sx >> sy >> gx >> gy) && sx >= 0 &&
+              sx < dimx && sy >= 0 && sy < dimy && gx >= 0 && gx < dimx &&
+              gy >= 0 && gy < dimy;
+      startStates.emplace_back(State(0, sx, sy));
+      goals.emplace_back(Location(gx, gy));
+    }
+    if (!valid) {
+      response << "error invalid start or goal" << std::endl;
+      continue;
+    }
+
+    Environment mapf(dimx, dimy, obstacles, goals);
+    ECBS<State, Action, int, Conflict, Constraints, Environment> cbs(mapf, w);
+    std::vector<PlanResult<State, Action, int> > solution;
+
+    Timer timer;
+    bool success = cbs.search(startStates, solution);
+    timer.stop();
+
+    if (!success) {
+      response << "fail" << std::endl;
+      continue;
+    }
+    int cost = 0;
+    int makespan = 0;
+    for (const auto& s : solution) {
+      cost += s.cost;
+      makespan = std::max<int>(makespan, s.cost);
+    }
+    response << "ok " << cost << " " << makespan << " "
+             << timer.elapsedSeconds() << " " << mapf.highLevelExpanded()
+             << " " << mapf.lowLevelExpanded() << "\n";
+    for (const auto& s : solution) {
+      response << s.states.size();
+      for (const auto& state : s.states) {
+        response << " " << state.first.x << " " << state.first.y << " "
+                 << state.second;
+      }
+      response << "\n";
+    }
+    response << std::flush;
+  }
+  return 0;
+}
+
 int main(int argc, char* argv[]) {
   namespace po = boost::program_options;
   // Declare the supported options.
@@ -533,16 +612,21 @@ int main(int argc, char* argv[]) {
   std::string mapFile;
   std::string robotFile;
   std::string outputFile;
+  std::string outputFormat;
   float w;
+  bool serveRequests;
   desc.add_options()("help", "produce help message")
       ("map,m", po::value<std::string>(&mapFile)->required(),
       "map file (YAML)")
-      ("robots,r", po::value<std::string>(&robotFile)->required(),
+      ("robots,r", po::value<std::string>(&robotFile),
       "robots' start and goal (YAML)")
-      ("output,o", po::value<std::string>(&outputFile)->required(),
-      "output file (YAML)")
+      ("output,o", po::value<std::string>(&outputFile),
+      "output file")
+      ("format", po::value<std::string>(&outputFormat)->default_value("yaml"),
+       "output file format: yaml or binary (see plan_output.hpp)")
       ("suboptimality,w", po::value<float>(&w)->default_value(1.0),
-      "suboptimality bound");
+      "suboptimality bound")
+      ("serve", "keep the map loaded and answer planning requests on stdin");
 
   try {
     po::variables_map vm;
@@ -553,6 +637,13 @@ int main(int argc, char* argv[]) {
       std::cout << desc << "\n";
       return 0;
     }
+    if (outputFormat != "yaml" && outputFormat != "binary") {
+      throw po::error("--format must be yaml or binary");
+    }
+    serveRequests = vm.count("serve") != 0u;
+    if (!serveRequests && (robotFile.empty() || outputFile.empty())) {
+      throw po::error("--robots and --output are required without --serve");
+    }
   } catch (po::error& e) {
     std::cerr << e.what() << std::endl << std::endl;
     std::cerr << desc << std::endl;
@@ -560,7 +651,6 @@ int main(int argc, char* argv[]) {
   }
 
   YAML::Node mapConfig = YAML::LoadFile(mapFile);
-  YAML::Node robotConfig = YAML::LoadFile(robotFile);
 
   std::unordered_set<Location> obstacles;
   std::vector<Location> goals;
@@ -574,6 +664,12 @@ int main(int argc, char* argv[]) {
     obstacles.insert(Location(node[0].as<int>(), node[1].as<int>()));
   }
 
+  if (serveRequests) {
+    return serve(dimx, dimy, obstacles);
+  }
+
+  YAML::Node robotConfig = YAML::LoadFile(robotFile);
+
   for (const auto& node : robotConfig["robots"]) {
     const auto& start = node["start"];
     const auto& goal = node["goal"];
@@ -599,6 +695,12 @@ int main(int argc, char* argv[]) {
       makespan = std::max<int>(makespan, s.cost);
     }
 
+    if (outputFormat == "binary") {
+      writeBinaryPlans(outputFile, solution, cost, makespan,
+                       timer.elapsedSeconds(), mapf.highLevelExpanded(),
+                       mapf.lowLevelExpanded());
+      return 0;
+    }
     std::ofstream out(outputFile);
     out << "statistics:" << std::endl;
     out << "  cost: " << cost << std::endl;
@@ -0,0 +1,45 @@
+#pragma once
+
+#include <cstdint>
+#include <fstream>
+#include <string>
+#include <vector>
+
+// Binary plan file (python/functions/plan_format.py), little-endian:
+//   char    magic[8]  "MRPPLAN1"
+//   int32   agent count, cost, makespan, reserved (0)
+//   float64 runtime
+//   int64   highLevelExpanded, lowLevelExpanded
+// followed per agent by
+//   int32   state count
+//   int32   x, y, t of every state
+template <typename Solution>
+void writeBinaryPlans(const std::string& outputFile, const Solution& solution,
+                      int cost, int makespan, double runtime,
+                      int64_t highLevelExpanded, int64_t lowLevelExpanded) {
+  std::ofstream out(outputFile, std::ios::binary);
+  auto write = [&out](const auto& value) {
+    out.write(reinterpret_cast<const char*>(&value), sizeof(value));
+  };
+  out.write("MRPPLAN1", 8);
+  write(static_cast<int32_t>(solution.size()));
+  write(static_cast<int32_t>(cost));
+  write(static_cast<int32_t>(makespan));
+  write(static_cast<int32_t>(0));
+  write(runtime);
+  write(highLevelExpanded);
+  write(lowLevelExpanded);
+
+  std::vector<int32_t> states;
+  for (const auto& plan : solution) {
+    states.clear();
+    for (const auto& state : plan.states) {
+      states.push_back(state.first.x);
+      states.push_back(state.first.y);
+      states.push_back(state.second);
+    }
+    write(static_cast<int32_t>(plan.states.size()));
+    out.write(reinterpret_cast<const char*>(states.data()),
+              states.size() * sizeof(int32_t));
+  }
+}
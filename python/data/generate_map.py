@@ -16,6 +16,10 @@ import argparse
 import os
 import sys
 
+sys.path.insert(1, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from functions.map_distances import update_distance_fields
+from functions.map_store import GridMap, store_grid_map
+
 def main():
 
 	# INPUTS:
@@ -97,6 +101,12 @@ def main():
 	# Write to YAML file
 	with open(yaml_map_file, "w") as map_file:
 		yaml.safe_dump(map_dict, map_file, sort_keys=True, default_flow_style=False)
+	# binary occupancy grid of the map store, the runs do not parse the YAML
+	store_grid_map(yaml_map_file, GridMap(map_array != 9))
+
+	# BFS distance fields of all start and goal cells (true-distance
+	# heuristics), rebuilt only if the map CSV changed
+	update_distance_fields(base_loc, csv_map_file, map_array != 9, start_locs + goal_locs)
 
 	### --------------------- ROBOTS FILE ----------------------------
 	# create robots with randomly assigned start and goal locations
@@ -7,39 +7,36 @@ import networkx as nx
 import matplotlib.pyplot as plt
 import logging
 import time
+import numpy as np
 
 from functions.adg_node import *
 from functions.adg_dependency_group import *
+from functions.plan_format import plan_array
 
 logger = logging.getLogger(__name__)
 
 def draw_ADG(ADG, robots, graph_title="ADG graph", writer=None):
 	# plt.title(graph_title)
+	nodes = ADG.graph["nodes"]
 
 	# get current robot node to adjust positions
-	position_offset = {}
+	position_offset = np.zeros(nodes.robot_count, dtype=np.int32)
 	for robot in robots:
-		current_node_position = int(robot.current_node.split("_")[2])
-		position_offset[robot.robot_ID] = current_node_position
+		position_offset[robot.robot_ID] = robot.current_idx
 
 	# update positions (move finished nodes backwards)
-	pos = nx.get_node_attributes(ADG, "pos")
-	for node, plot_pos in pos.items():
-		robot_id_of_node = int(node.split("_")[1])
-		new_plot_pos = (plot_pos[0]-position_offset[robot_id_of_node], plot_pos[1])
-		pos[node] = new_plot_pos # update position for plotting
+	plot_x = nodes.time - position_offset[nodes.robot]
+	pos = {node: (plot_x[node], nodes.robot[node]) for node in ADG.nodes()}
 
-	nodelist = []
 	nodecolor = []
-	for node in ADG.nodes(data=True):
-		nodelist.append(node[0])
-		if node[1]["data"].status == Status.STAGED:
+	for node in ADG.nodes():
+		if nodes.status[node] == Status.STAGED:
 			nodecolor.append("r")
-		elif node[1]["data"].status == Status.FINISHED:
+		elif nodes.status[node] == Status.FINISHED:
 			nodecolor.append("g")
 		else: # ENQUEUED!
 			nodecolor.append("y")
-	labels_dict = None # nx.get_node_attributes(ADG, "label")
+	labels_dict = None # {node: nodes.info(node) for node in ADG.nodes()}
 	nx.draw_networkx(ADG, pos=pos, node_color=nodecolor, labels=labels_dict, with_labels=False)
 
 	plt.xlim(-20,20)
@@ -48,15 +45,79 @@ def draw_ADG(ADG, robots, graph_title="ADG graph", writer=None):
 		writer.grab_frame()
 	plt.clf()
 
-def determine_ADG(plans, show_graph=False, show_logging=False):
+def plot_positions(nodes):
+	""" original plotting position (plan time, robot ID) of every node """
+	return {node: (nodes.time[node], nodes.robot[node]) for node in range(len(nodes))}
+
+def determine_ADG_nodes(plans, merge_same_positions=True):
+	"""
+		Creates the ADG nodes from the robot plans: one node per move of a
+		robot (waits in place are merged into the node if
+		merge_same_positions)
+		Inputs:
+		 - plans
+		Outputs:
+		 - nodes : ADGNodes node data, node IDs are consecutive per robot
+		 - robot_plan : dictionary of robot plans
+		 - goal_positions : dictionary of robot goal positions => only plotting!
+	"""
+	robot_plan = {}
+	goal_positions = {}
+	robot_node_counts = []
+	time = []
+	s_loc = []
+	g_loc = []
+
+	node_ID = 0
+	# loop through each robot's plan ([states, 3] arrays of x, y, t)
+	for robot_ID, plan in enumerate(plans["schedule"].values()):
+		states = plan_array(plan)
+		goal_positions[robot_ID] = dict(zip(("x", "y", "t"), states[-1].tolist()))
+
+		# one node per state, BUT the last, which moves to the next state
+		moves = np.ones(len(states) - 1, dtype=bool)
+		same_position = np.all(states[:-1, :2] == states[1:, :2], axis=1)
+		if merge_same_positions:
+			moves &= ~same_position
+		elif np.any(same_position):
+			logger.info("same nodes are NOT merged in ADG for deadlock simulation!")
+		move_states = states[:-1][moves]
+
+		robot_plan[robot_ID] = {}
+		robot_plan[robot_ID]["nodes"] = list(range(node_ID, node_ID + len(move_states)))
+		robot_plan[robot_ID]["positions"] = [{"x": x, "y": y} for x, y in move_states[:, :2].tolist()]
+		time.append(move_states[:, 2])
+		s_loc.append(move_states[:, :2])
+		g_loc.append(states[1:][moves, :2])
+
+		# if start and goal are the same
+		if len(states) == 1:
+			time.append(states[:, 2])
+			s_loc.append(states[:, :2])
+			g_loc.append(states[:, :2])
+
+		node_count = len(move_states) + (len(states) == 1)
+		robot_node_counts.append(node_count)
+		node_ID += node_count
+
+	time = np.concatenate(time) if len(time) > 0 else []
+	s_loc = np.concatenate(s_loc) if len(s_loc) > 0 else []
+	g_loc = np.concatenate(g_loc) if len(g_loc) > 0 else []
+	nodes = ADGNodes(robot_node_counts, time, s_loc, g_loc)
+
+	return nodes, robot_plan, goal_positions
+
+def determine_ADG(plans, show_graph=False, show_logging=False, spatial_index=True):
 	"""
 		Based on the global robot plans determined by a global planning
 		algorithm (e.g. CBS, CCBS, ECBS, ..), determine the action dependency
 		graph (ADG)
 		Inputs:
 		 - plans
+		 - spatial_index : find Type 2 edges through a location index instead
+		   of comparing every node pair (both give the same graph)
 		Outputs:
-		 - ADG : action dependency graph
+		 - ADG : action dependency graph, node data in ADG.graph["nodes"]
 		 - robot_plan : dictionary of robot plans
 		 - goal_positions : dictionary of robot goal positions => only plotting!
 	"""
@@ -67,123 +128,106 @@ def determine_ADG(plans, show_graph=False, show_logging=False):
 	for robot, plan in plans["schedule"].items():
 		logger.debug("  {} :{}".format(robot,plan))
 	logger.info(" Constructing ADG from plans ...")
-	ADG = nx.DiGraph()
-
-	# create robot plan for simulation (required later on)
-	robot_plan = {}
-
-	goal_positions = {}
 
 	# ADD NODES AND TYPE 1 EDGES
-	robot_ID = 0
-	# loop through each robot's plan
 	logger.info("  1 adding nodes and type 1 edges ...")
-	for robot, plan in plans["schedule"].items():
-		# robot plan
-		robot_plan[robot_ID] = {}
-		robot_plan[robot_ID]["nodes"] = []
-		robot_plan[robot_ID]["positions"] = []
-
-		goal_positions[robot_ID] = plan[-1]
-
-		plan_length = len(plan)
-		node_idx = 0
-		for idx, item in enumerate(plan[:-1]): # loop through all elements, BUT last
-			next_item = plan[idx+1]
-			if not (item["x"] == next_item["x"] and item["y"] == next_item["y"]): # check for difference in position
-				node_ID = "p_" + str(robot_ID) + "_" + str(node_idx)
-				robot_plan[robot_ID]["nodes"].append(node_ID)
-				robot_plan[robot_ID]["positions"].append({"x": item["x"], "y": item["y"]})
-				ADG_node = ADGNode(node_ID, item, next_item)
-				ADG.add_node(node_ID, data=ADG_node, pos=(item["t"], robot_ID), label=ADG_node.info)
-				if node_idx > 0: # Add edge if a node has been added
-					prev_node_ID = "p_" + str(robot_ID) + "_" + str(node_idx-1)
-					ADG.add_edge(prev_node_ID, node_ID, type=1)
-				node_idx += 1
-
-		# if start and goal are the same
-		if plan_length == 1:
-			item = plan[0]
-			node_ID = "p_" + str(robot_ID) + "_" + str(node_idx)
-			ADG_node = ADGNode(node_ID, item, item)
-			ADG.add_node(node_ID, data=ADG_node, pos=(item["t"], robot_ID), label=ADG_node.info)
-
-		# next robot ID
-		robot_ID += 1
+	nodes, robot_plan, goal_positions = determine_ADG_nodes(plans)
+	ADG = nx.DiGraph(nodes=nodes)
+	ADG.add_nodes_from(range(len(nodes)))
+	for robot_ID in range(nodes.robot_count):
+		robot_nodes = nodes.robot_nodes(robot_ID)
+		ADG.add_edges_from(zip(robot_nodes[:-1], robot_nodes[1:]), type=1)
 	logger.debug("    done!")
 
-	robot_count = robot_ID
-	robot_ID_list = range(robot_count)
-
 	# ADD TYPE 2 EDGES
 	logger.info("  2 adding type 2 edges ...")
-	for this_robot_ID in robot_ID_list:
-		this_node_idx = 0
-		this_node_ID = "p_" + str(this_robot_ID) + "_" + str(this_node_idx)
-		this_neighbor_list = list(ADG.neighbors(this_node_ID))
-		while len(this_neighbor_list) > 0: # while list not empty
-			this_node = ADG.nodes[this_node_ID]["data"]
-			for other_robot_ID in robot_ID_list:
-				if other_robot_ID != this_robot_ID:
-					other_node_idx = 0
-					other_node_ID = "p_" + str(other_robot_ID) + "_" + str(other_node_idx)
-					other_neighbor_list = list(ADG.neighbors(other_node_ID))
-
-					while len(other_neighbor_list) > 0:
-						other_node = ADG.nodes[other_node_ID]["data"]
-						if (this_node.s_loc == other_node.g_loc) and (this_node.time <= other_node.time):
-							ADG.add_edge(this_node_ID, other_node_ID, type=2)
-						other_node_idx += 1
-						other_node_ID = "p_" + str(other_robot_ID) + "_" + str(other_node_idx)
-						other_neighbor_list = list(ADG.neighbors(other_node_ID))
-
-			# get next node in list
-			this_node_idx += 1
-			this_node_ID = "p_" + str(this_robot_ID) + "_" + str(this_node_idx)
-			this_neighbor_list = list(ADG.neighbors(this_node_ID))
+	if spatial_index:
+		add_type_2_edges_indexed(ADG, nodes)
+	else:
+		add_type_2_edges_pairwise(ADG, nodes)
 	logger.debug("    done!")
 	logger.info("  done! ADG construction took {} s".format(time.process_time() - start))
 
 	if show_graph:
 		plt.figure()
 		plt.title("Original ADG graph")
-		pos = nx.get_node_attributes(ADG, "pos")
-		labels_dict = nx.get_node_attributes(ADG, "label")
+		pos = plot_positions(nodes)
+		labels_dict = {node: nodes.info(node) for node in ADG.nodes()}
 		nx.draw_networkx(ADG, pos=pos, labels=labels_dict, with_labels=True)
 		# plt.show()
 
 	return ADG, robot_plan, goal_positions
 
-def analyze_ADG(G_ADG, plans, show_graph=False):
+def add_type_2_edges_pairwise(ADG, nodes):
 	"""
-		Inputs:
-		 - Action dependency graph G_ADG
-		 - plans of each robot
-		Outputs:
-		 - all ADG nodes
-		 - all type 1 edges
-		 - dependency groups
+		Adds the Type 2 edges by comparing every node of every robot with
+		every node of every other robot => O(R^2 N^2). Reference implementation
+		for add_type_2_edges_indexed.
+		Only nodes with a Type 1 successor (i.e. all but the last node of each
+		robot) take part.
 	"""
+	s_loc = [tuple(loc) for loc in nodes.s_loc.tolist()]
+	g_loc = [tuple(loc) for loc in nodes.g_loc.tolist()]
+	node_time = nodes.time.tolist()
+	robot_ID_list = range(nodes.robot_count)
+	for this_robot_ID in robot_ID_list:
+		for this_node in nodes.robot_nodes(this_robot_ID)[:-1]:
+			for other_robot_ID in robot_ID_list:
+				if other_robot_ID != this_robot_ID:
+					for other_node in nodes.robot_nodes(other_robot_ID)[:-1]:
+						if (s_loc[this_node] == g_loc[other_node]) and (node_time[this_node] <= node_time[other_node]):
+							ADG.add_edge(this_node, other_node, type=2)
 
-	logger.info(" Analyzing ADG to get switchable dependencies")
-	start = time.process_time()
-
-	all_edges = G_ADG.edges()
-	logger.debug("   all edges: {}".format(all_edges))
-
-	edges_type_1 = [(u,v) for u,v,e in G_ADG.edges(data=True) if e["type"] == 1]
-	logger.debug("   Type 1: {}".format(edges_type_1))
-
-	edges_type_2 = [(u,v) for u,v,e in G_ADG.edges(data=True) if e["type"] == 2]
-	logger.debug("   Type 2: {}".format(edges_type_2))
-
-	edges_type_2_orig = edges_type_2.copy()
-	# remove edges part of group
-
+def add_type_2_edges_indexed(ADG, nodes):
+	"""
+		Adds the same Type 2 edges as add_type_2_edges_pairwise, in the same
+		order, but only compares nodes which share a location:
+		 1) sort the nodes by (goal location, time)
+		 2) for each node, look up the nodes of other robots which end on its
+		    start location at the same time or later
+	"""
+	robot_node_count = nodes.offsets[nodes.robot+1] - nodes.offsets[nodes.robot]
+	candidates = np.flatnonzero(nodes.index < robot_node_count - 1)
+	if len(candidates) == 0:
+		return
+
+	# encode (location, time) as one sortable key
+	width = int(max(nodes.s_loc.max(), nodes.g_loc.max())) + 1
+	span = int(nodes.time.max()) + 1
+	s_loc = nodes.s_loc[candidates].astype(np.int64)
+	g_loc = nodes.g_loc[candidates].astype(np.int64)
+	node_time = nodes.time[candidates].astype(np.int64)
+	g_key = (g_loc[:,0]*width + g_loc[:,1])*span + node_time
+	s_key = (s_loc[:,0]*width + s_loc[:,1])*span
+
+	# location -> nodes sorted by time
+	order = np.argsort(g_key, kind="stable")
+	sorted_key = g_key[order]
+	sorted_nodes = candidates[order]
+	first = np.searchsorted(sorted_key, s_key + node_time, side="left")
+	last = np.searchsorted(sorted_key, s_key + span, side="left")
+
+	edges = []
+	for this_node, lo, hi in zip(candidates.tolist(), first.tolist(), last.tolist()):
+		if lo == hi:
+			continue
+		# same insertion order as the pairwise search: by robot, then by node
+		others = np.sort(sorted_nodes[lo:hi])
+		others = others[nodes.robot[others] != nodes.robot[this_node]]
+		edges.extend((this_node, other_node) for other_node in others.tolist())
+	ADG.add_edges_from(edges, type=2)
+
+def group_dependencies_scan(edges_type_2, nodes):
+	"""
+		Assigns each Type 2 edge to the first existing dependency group which
+		continues with it (same or opposite direction), otherwise creates a
+		new group => O(E*G). Reference implementation for
+		group_dependencies_indexed.
+	"""
 	dependency_groups = []
 
 	logger.debug(len(edges_type_2))
-	for edge in edges_type_2_orig:
+	for edge in edges_type_2:
 		added_to_existing_group = False
 		for group in dependency_groups:
 			logger.debug("currently checking edge {}".format(edge))
@@ -198,14 +242,98 @@ def analyze_ADG(G_ADG, plans, show_graph=False):
 
 		if not added_to_existing_group:
 			logger.debug("creating new group for edge: {}".format(edge))
-			new_group = DependencyGroup(edge)
+			new_group = DependencyGroup(edge, nodes)
 			dependency_groups.append(new_group)
 
 		logger.debug(edge)
 
+	return dependency_groups
+
+def group_dependencies_indexed(edges_type_2, nodes):
+	"""
+		Gives the same dependency groups as group_dependencies_scan, but keeps
+		every group in two dictionaries keyed by the next edge it expects (one
+		for the same, one for the opposite direction) => one lookup per edge.
+		If an edge continues more than one group, the oldest group gets it, as
+		in the scan.
+	"""
+	dependency_groups = []
+	expected_same = {}		# next edge (u+1, v+1) -> group index
+	expected_opposite = {}	# next edge (u+1, v-1) -> group index
+	expected_edges = []		# group index -> (same key, opposite key)
+
+	for edge in edges_type_2:
+		same_idx = expected_same.get(edge)
+		opposite_idx = expected_opposite.get(edge)
+
+		if same_idx is None and opposite_idx is None:
+			group_idx = len(dependency_groups)
+			dependency_groups.append(DependencyGroup(edge, nodes))
+			expected_edges.append((None, None))
+		elif opposite_idx is None or (same_idx is not None and same_idx < opposite_idx):
+			group_idx = same_idx
+			dependency_groups[group_idx].next_edge_same(edge)
+		else:
+			group_idx = opposite_idx
+			dependency_groups[group_idx].next_edge_opposite(edge)
+
+		# replace the expected edges of the group
+		same_key, opposite_key = expected_edges[group_idx]
+		if same_key is not None:
+			del expected_same[same_key]
+		if opposite_key is not None:
+			del expected_opposite[opposite_key]
+
+		group = dependency_groups[group_idx]
+		same_key = None
+		opposite_key = None
+		if group.type == GroupType.single or group.type == GroupType.same:
+			same_key = (edge[0]+1, edge[1]+1)
+			expected_same[same_key] = group_idx
+		if group.type == GroupType.single or group.type == GroupType.opposite:
+			opposite_key = (edge[0]+1, edge[1]-1)
+			expected_opposite[opposite_key] = group_idx
+		expected_edges[group_idx] = (same_key, opposite_key)
+
+	return dependency_groups
+
+def analyze_ADG(G_ADG, plans, show_graph=False, indexed_grouping=True):
+	"""
+		Inputs:
+		 - Action dependency graph G_ADG
+		 - plans of each robot
+		 - indexed_grouping : look up the group of each Type 2 edge by the
+		   next edge the group expects, instead of asking every group
+		Outputs:
+		 - all ADG nodes
+		 - all type 1 edges
+		 - dependency groups
+	"""
+
+	logger.info(" Analyzing ADG to get switchable dependencies")
+	start = time.process_time()
+	nodes = G_ADG.graph["nodes"]
+
+	all_edges = G_ADG.edges()
+	logger.debug("   all edges: {}".format(all_edges))
+
+	edges_type_1 = [(u,v) for u,v,e in G_ADG.edges(data=True) if e["type"] == 1]
+	logger.debug("   Type 1: {}".format(edges_type_1))
+
+	edges_type_2 = [(u,v) for u,v,e in G_ADG.edges(data=True) if e["type"] == 2]
+	logger.debug("   Type 2: {}".format(edges_type_2))
+
+	if indexed_grouping:
+		dependency_groups = group_dependencies_indexed(edges_type_2, nodes)
+	else:
+		dependency_groups = group_dependencies_scan(edges_type_2, nodes)
+
 	for group in dependency_groups:
 		logger.debug("group (type: {}): {} ".format(group.type, group.edges))
-		group.determine_reverse()
+		group.determine_reverse(nodes)
+
+	# numeric switchability thresholds (determine_switchable_groups)
+	G_ADG.graph["group_thresholds"] = GroupThresholds(dependency_groups, nodes)
 
 	rev_edges = []
 
@@ -220,7 +348,6 @@ def analyze_ADG(G_ADG, plans, show_graph=False):
 
 	# obtain reverse groups:
 	G_new_ADG = nx.DiGraph()
-	pos = nx.get_node_attributes(G_ADG, "pos")
 	G_new_ADG.add_nodes_from(G_ADG.nodes())
 	G_new_ADG.add_edges_from(edges_type_1)
 	G_new_ADG.add_edges_from(rev_edges)
@@ -230,8 +357,8 @@ def analyze_ADG(G_ADG, plans, show_graph=False):
 	if show_graph:
 		plt.figure()
 		plt.title("Reversed dependency ADG graph")
-		pos = nx.get_node_attributes(G_ADG, "pos")
-		labels_dict = nx.get_node_attributes(G_ADG, "label")
+		pos = plot_positions(nodes)
+		labels_dict = {node: nodes.info(node) for node in G_ADG.nodes()}
 		nx.draw_networkx(G_new_ADG, pos=pos, with_labels=True, labels=labels_dict)
 		# plt.show()
 
@@ -252,58 +379,10 @@ def determine_robot_plans(plans, show_graph=False, show_logging=False):
 	"""
 
 	logger.info("Determining robot plans (with possible deadlocks)")
-	start = time.process_time()
 
 	for robot, plan in plans["schedule"].items():
 		logger.debug("  {} :{}".format(robot,plan))
-	logger.info(" Constructing ADG from plans ...")
-	ADG = nx.DiGraph()
-
-	# create robot plan for simulation (required later on)
-	robot_plan = {}
-
-	goal_positions = {}
-
-	# ADD NODES AND TYPE 1 EDGES
-	robot_ID = 0
-	# loop through each robot's plan
-	logger.info("  1 adding nodes and type 1 edges ...")
-	for robot, plan in plans["schedule"].items():
-		# robot plan
-		robot_plan[robot_ID] = {}
-		robot_plan[robot_ID]["nodes"] = []
-		robot_plan[robot_ID]["positions"] = []
-
-		goal_positions[robot_ID] = plan[-1]
-
-		plan_length = len(plan)
-		node_idx = 0
-		for idx, item in enumerate(plan[:-1]): # loop through all elements, BUT last
-			next_item = plan[idx+1]
-			if not (item["x"] == next_item["x"] and item["y"] == next_item["y"]): # check for difference in position
-				logger.info("same nodes are NOT merged in ADG for deadlock simulation!")
-			node_ID = "p_" + str(robot_ID) + "_" + str(node_idx)
-			robot_plan[robot_ID]["nodes"].append(node_ID)
-			robot_plan[robot_ID]["positions"].append({"x": item["x"], "y": item["y"]})
-			ADG_node = ADGNode(node_ID, item, next_item)
-			ADG.add_node(node_ID, data=ADG_node, pos=(item["t"], robot_ID), label=ADG_node.info)
-			if node_idx > 0: # Add edge if a node has been added
-				prev_node_ID = "p_" + str(robot_ID) + "_" + str(node_idx-1)
-				ADG.add_edge(prev_node_ID, node_ID, type=1)
-			node_idx += 1
-
-		# if start and goal are the same
-		if plan_length == 1:
-			item = plan[0]
-			node_ID = "p_" + str(robot_ID) + "_" + str(node_idx)
-			ADG_node = ADGNode(node_ID, item, item)
-			ADG.add_node(node_ID, data=ADG_node, pos=(item["t"], robot_ID), label=ADG_node.info)
-
-		# next robot ID
-		robot_ID += 1
-	logger.debug("    done!")
 
-	robot_count = robot_ID
-	robot_ID_list = range(robot_count)
+	nodes, robot_plan, goal_positions = determine_ADG_nodes(plans, merge_same_positions=False)
 
 	return robot_plan, goal_positions
@@ -0,0 +1,110 @@
+"""
+    Incremental cycle detection for the ADG (Pearce-Kelly dynamic
+    topological order)
+
+    A topological order of the ADG is computed once and then maintained
+    while edges are added and removed through ADGCycleCheck. Removing an edge
+    never invalidates the order. Adding an edge u -> v with ord(u) > ord(v)
+    only searches the nodes between v and u in the order, and reorders them.
+"""
+
+import networkx as nx
+import numpy as np
+
+import logging
+logger = logging.getLogger(__name__)
+
+class ADGCycleCheck(object):
+    """
+        Adds/removes the edges of the ADG and keeps a topological order of it
+        up to date. cycle is None while the ADG is acyclic, else the list of
+        edges of a cycle.
+
+        The listeners (e.g. an ADGExecution) are told about every edge change
+        through their edge_added(tail, head) / edge_removed(tail, head).
+    """
+    def __init__(self, ADG):
+        self.ADG = ADG
+        self.listeners = []
+        self.reset()
+
+    def reset(self):
+        """ full topological sort of the ADG """
+        self.order = np.zeros(self.ADG.number_of_nodes(), dtype=np.int64) # node -> position
+        try:
+            for position, node in enumerate(nx.topological_sort(self.ADG)):
+                self.order[node] = position
+            self.cycle = None
+        except nx.NetworkXUnfeasible:
+            self.cycle = list(nx.find_cycle(self.ADG, orientation="original"))
+            self.cycle = [(tail, head) for tail, head, _ in self.cycle]
+
+    def remove_edge(self, tail, head):
+        self.ADG.remove_edge(tail, head)
+        for listener in self.listeners:
+            listener.edge_removed(tail, head)
+        if self.cycle is not None:
+            self.reset()
+
+    def add_edge(self, tail, head, **attr):
+        """ adds the edge tail -> head, returns the edges of a cycle it closes (or None) """
+        if self.ADG.has_edge(tail, head):
+            self.ADG.add_edge(tail, head, **attr)
+            return self.cycle
+        if self.cycle is None:
+            cycle = self.__reorder(tail, head)
+            if cycle is not None:
+                self.cycle = cycle
+                logger.warning("edge {} -> {} closes a cycle of {} edges".format(tail, head, len(cycle)))
+        self.ADG.add_edge(tail, head, **attr)
+        for listener in self.listeners:
+            listener.edge_added(tail, head)
+        return self.cycle
+
+    def __reorder(self, tail, head):
+        order = self.order
+        lower = order[head]
+        upper = order[tail]
+        if lower > upper:
+            return None # already in order
+        if tail == head:
+            return [(tail, head)]
+
+        # nodes reachable from head which are not after tail in the order
+        parent = {head: None}
+        forward = [head]
+        stack = [head]
+        while len(stack) > 0:
+            node = stack.pop()
+            for successor in self.ADG.succ[node]:
+                if successor == tail:
+                    cycle = [(node, tail), (tail, head)]
+                    while parent[node] is not None:
+                        cycle.insert(0, (parent[node], node))
+                        node = parent[node]
+                    return cycle
+                if successor not in parent and order[successor] < upper:
+                    parent[successor] = node
+                    forward.append(successor)
+                    stack.append(successor)
+
+        # nodes reaching tail which are not before head in the order
+        visited = {tail}
+        backward = [tail]
+        stack = [tail]
+        while len(stack) > 0:
+            node = stack.pop()
+            for predecessor in self.ADG.pred[node]:
+                if predecessor not in visited and order[predecessor] > lower:
+                    visited.add(predecessor)
+                    backward.append(predecessor)
+                    stack.append(predecessor)
+
+        # the backward nodes take the first positions, keeping their relative order
+        backward.sort(key=lambda node: order[node])
+        forward.sort(key=lambda node: order[node])
+        moved = backward + forward
+        positions = sorted(order[node] for node in moved)
+        for node, position in zip(moved, positions):
+            order[node] = position
+        return None
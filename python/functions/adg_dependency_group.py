@@ -6,6 +6,8 @@
      2 opposite - a group of edges where robots move in opposite direction
 """
 
+import numpy as np
+
 import logging
 logger = logging.getLogger(__name__)
 
@@ -16,29 +18,32 @@ class GroupType(Enum):
     opposite = 2
 
 class DependencyGroup(object):
-    def __init__(self, edge):
+    def __init__(self, edge, nodes):
         self.edges = []
         self.edges.append(edge)
         self.reverse_edges = []
         self.type = GroupType.single # 0 single, 1 same, 2 opposite
-        self.robot_blocking = edge[0].split("_")[1]
-        self.robot_blocked = edge[1].split("_")[1]
+        self.robot_blocking = int(nodes.robot[edge[0]])
+        self.robot_blocked = int(nodes.robot[edge[1]])
         self.original_direction = True # false if reverse_edges are active
+        self.reversible = True # false if a reverse edge would point before the start of a plan
         self.first_edge_tail = edge[0]
         self.first_edge_head = edge[1]
 
     def __add_edge(self, edge):
         self.edges.append(edge)
 
+    # Node IDs are consecutive per robot: node + 1 is the next node in the
+    # robot's plan. Tails and heads of Type 2 edges are never the last node of
+    # a plan, so u + 1 and v + 1 stay within the robot's plan, and v - 1 can
+    # only cross into another robot's plan on a node that never heads a Type 2
+    # edge.
+
     def next_edge_same(self, edge):
         if self.type == GroupType.single or self.type == GroupType.same:
             current_edge = self.edges[-1]
-            u_curr = current_edge[0]
-            v_curr = current_edge[1]
-            spl_u = u_curr.split("_")
-            spl_v = v_curr.split("_")
-            u_next = spl_u[0] + "_" + spl_u[1] + "_" + str(int(spl_u[2])+1)
-            v_next = spl_v[0] + "_" + spl_v[1] + "_" + str(int(spl_v[2])+1)
+            u_next = current_edge[0] + 1
+            v_next = current_edge[1] + 1
             logger.debug("edge[0] {} == u_next {} and edge[1] {} == v_next {}".format(edge[0], u_next, edge[1], v_next))
             if edge[0] == u_next and edge[1] == v_next:
                 logger.debug("changed to same")
@@ -53,12 +58,8 @@ class DependencyGroup(object):
     def next_edge_opposite(self, edge):
         if self.type == GroupType.single or self.type == GroupType.opposite:
             current_edge = self.edges[-1]
-            u_curr = current_edge[0]
-            v_curr = current_edge[1]
-            spl_u = u_curr.split("_")
-            spl_v = v_curr.split("_")
-            u_next = spl_u[0] + "_" + spl_u[1] + "_" + str(int(spl_u[2])+1)
-            v_next = spl_v[0] + "_" + spl_v[1] + "_" + str(int(spl_v[2])-1)
+            u_next = current_edge[0] + 1
+            v_next = current_edge[1] - 1
             logger.debug("edge[0] {} == u_next {} and edge[1] {} == v_next {}".format(edge[0], u_next, edge[1], v_next))
             if edge[0] == u_next and edge[1] == v_next:
                 logger.debug("changed to opposite")
@@ -69,52 +70,56 @@ class DependencyGroup(object):
         else:
             return False
 
-    def determine_reverse(self):
-        if self.type == GroupType.single:
-            # single arrow -> self.edges has length 1
-            edge = self.edges[0]
+    def determine_reverse(self, nodes):
+        # the reverse of u -> v is v+1 -> u-1, for all group types
+        for edge in self.edges:
             u_curr = edge[0]
             v_curr = edge[1]
-            spl_u = u_curr.split("_")
-            spl_v = v_curr.split("_")
-            v_new = spl_u[0] + "_" + spl_u[1] + "_" + str(int(spl_u[2])-1) # was +1
-            u_new = spl_v[0] + "_" + spl_v[1] + "_" + str(int(spl_v[2])+1) # was -1
+            if nodes.index[u_curr] == 0:
+                # u is the first node of its plan: u-1 does not exist and the
+                # group can never be switched
+                self.reversible = False
+                continue
+            v_new = u_curr - 1
+            u_new = v_curr + 1
             self.reverse_edges.append((u_new, v_new))
-            # v_new = spl_u[0] + "_" + spl_u[1] + "_" + str(int(spl_u[2])+1) # was +1
-            # u_new = spl_v[0] + "_" + spl_v[1] + "_" + str(int(spl_v[2])-1) # was -1
-            # self.reverse_edges.append((u_new, v_new))
-            # v_new = spl_u[0] + "_" + spl_u[1] + "_" + str(int(spl_u[2])) # was +1
-            # u_new = spl_v[0] + "_" + spl_v[1] + "_" + str(int(spl_v[2])) # was -1
-            # self.reverse_edges.append((u_new, v_new))
-        elif self.type == GroupType.same:
-            for edge in self.edges:
-                u_curr = edge[0]
-                v_curr = edge[1]
-                spl_u = u_curr.split("_")
-                spl_v = v_curr.split("_")
-                v_new = spl_u[0] + "_" + spl_u[1] + "_" + str(int(spl_u[2])-1)
-                u_new = spl_v[0] + "_" + spl_v[1] + "_" + str(int(spl_v[2])+1)
-                self.reverse_edges.append((u_new, v_new))
-        elif self.type == GroupType.opposite:
-            for edge in self.edges:
-                u_curr = edge[0]
-                v_curr = edge[1]
-                spl_u = u_curr.split("_")
-                spl_v = v_curr.split("_")
-                v_new = spl_u[0] + "_" + spl_u[1] + "_" + str(int(spl_u[2])-1)
-                u_new = spl_v[0] + "_" + spl_v[1] + "_" + str(int(spl_v[2])+1)
-                # u_new = v_curr
-                # v_new = u_curr
-                self.reverse_edges.append((u_new, v_new))
-                # add last pointing edge
-
-
-
-
-
-
-
-
-
 
-            #.
+class GroupThresholds(object):
+    """
+        Switchability of dependency groups as numeric thresholds on the plan
+        indices of the robots' current nodes, compiled once after analyze_ADG.
+        A group can be switched if it is reversible and
+         - the blocked robot is before the first head of its edges
+           (blocked_index)
+         - the blocking robot is before the first head of its reverse edges
+           (blocking_index)
+         - the first edge head is within H_control of its robot's node
+    """
+    def __init__(self, dependency_groups, nodes):
+        self.dependency_groups = dependency_groups
+        count = len(dependency_groups)
+        self.groups = np.empty(count, dtype=object)
+        self.groups[:] = dependency_groups
+        self.reversible = np.array([group.reversible for group in dependency_groups], dtype=bool)
+        self.blocked_robot = np.array([group.robot_blocked for group in dependency_groups], dtype=np.int64)
+        self.blocking_robot = np.array([group.robot_blocking for group in dependency_groups], dtype=np.int64)
+        self.blocked_index = np.full(count, np.iinfo(np.int64).max, dtype=np.int64)
+        self.blocking_index = np.full(count, np.iinfo(np.int64).max, dtype=np.int64)
+        for edge_list, thresholds in [("edges", self.blocked_index), ("reverse_edges", self.blocking_index)]:
+            group_idx = np.repeat(np.arange(count), [len(getattr(group, edge_list)) for group in dependency_groups])
+            heads = np.array([edge[1] for group in dependency_groups for edge in getattr(group, edge_list)], dtype=np.int64)
+            np.minimum.at(thresholds, group_idx, nodes.index[heads])
+        heads = np.array([group.first_edge_head for group in dependency_groups], dtype=np.int64)
+        self.head_robot = np.asarray(nodes.robot[heads], dtype=np.int64)
+        self.head_index = np.asarray(nodes.index[heads], dtype=np.int64)
+        self.robots = np.unique(np.concatenate([self.blocked_robot, self.blocking_robot, self.head_robot]))
+
+    def matches(self, dependency_groups):
+        return dependency_groups is self.dependency_groups
+
+    def switchable(self, progress, H_control):
+        """ boolean array: can each group be switched, for the plan indices progress[robot_ID] """
+        return (self.reversible
+                & (progress[self.blocked_robot] < self.blocked_index)
+                & (progress[self.blocking_robot] < self.blocking_index)
+                & (self.head_index <= progress[self.head_robot] + H_control))
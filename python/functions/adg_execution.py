@@ -0,0 +1,123 @@
+"""
+    Event-driven execution of the ADG
+
+    Every node keeps the number of its predecessors which are not FINISHED,
+    and the robots whose current node has none are kept in a ready set.
+    Finishing a node only updates the counters of its successors, so a time
+    step costs O(changes) instead of a scan over all robots and their
+    dependencies.
+"""
+
+import heapq
+import numpy as np
+
+from functions.adg_node import Status
+
+class ADGExecution(object):
+    """
+        Advances the robots along the ADG, like the step loop of main_ECBS:
+        robots are visited in ID order, and a robot advances if all the
+        predecessors of its current node are FINISHED and it is not delayed.
+        A node finished in a step therefore also releases robots with a
+        higher ID in the same step.
+
+        Changes of the ADG edges have to be reported through edge_added /
+        edge_removed (e.g. as a listener of the ADGCycleCheck).
+    """
+    def __init__(self, ADG, robots):
+        self.ADG = ADG
+        self.nodes = ADG.graph["nodes"]
+        self.robots = robots
+        self.unfinished = np.zeros(len(self.nodes), dtype=np.int32) # unfinished predecessors per node
+        for tail, head in ADG.edges():
+            if self.nodes.status[tail] != Status.FINISHED:
+                self.unfinished[head] += 1
+        self.ready = set(robot.robot_ID for robot in robots if self.__is_ready(robot))
+
+    def __is_ready(self, robot):
+        return (not robot.is_done()) and self.unfinished[robot.current_node] == 0
+
+    def __node_robot(self, node):
+        """ the robot whose current node is node (or None) """
+        robot = self.robots[self.nodes.robot[node]]
+        if robot.current_node == node and not robot.is_done():
+            return robot
+        return None
+
+    def edge_added(self, tail, head):
+        if self.nodes.status[tail] != Status.FINISHED:
+            self.unfinished[head] += 1
+            robot = self.__node_robot(head)
+            if robot is not None:
+                self.ready.discard(robot.robot_ID)
+
+    def edge_removed(self, tail, head):
+        if self.nodes.status[tail] != Status.FINISHED:
+            self.unfinished[head] -= 1
+            robot = self.__node_robot(head)
+            if robot is not None and self.unfinished[head] == 0:
+                self.ready.add(robot.robot_ID)
+
+    def finish_node(self, node):
+        """
+            Marks the node FINISHED
+            Outputs:
+             - released_robots : the robots (other than the node's) whose
+                                 current node has no unfinished predecessor left
+        """
+        released_robots = []
+        if self.nodes.status[node] == Status.FINISHED:
+            return released_robots
+        self.nodes.status[node] = Status.FINISHED
+        for successor in self.ADG.succ[node]:
+            self.unfinished[successor] -= 1
+            if self.unfinished[successor] == 0:
+                successor_robot = self.__node_robot(successor)
+                if successor_robot is not None and successor_robot.robot_ID != self.nodes.robot[node]:
+                    self.ready.add(successor_robot.robot_ID)
+                    released_robots.append(successor_robot)
+        return released_robots
+
+    def update_ready(self, robot):
+        if self.__is_ready(robot):
+            self.ready.add(robot.robot_ID)
+        else:
+            self.ready.discard(robot.robot_ID)
+
+    def step(self, robot_IDs_to_delay=()):
+        """
+            Advances every ready robot which is not delayed
+            Outputs:
+             - advanced_robots : the robots which advanced (in ID order)
+        """
+        delayed = set(int(robot_ID) for robot_ID in robot_IDs_to_delay)
+        queue = sorted(self.ready)
+        advanced_robots = []
+        while len(queue) > 0:
+            robot_ID = heapq.heappop(queue)
+            if robot_ID in delayed:
+                continue
+            robot = self.robots[robot_ID]
+            for released_robot in self.finish_node(robot.current_node):
+                if released_robot.robot_ID > robot_ID:
+                    heapq.heappush(queue, released_robot.robot_ID)
+
+            robot.advance()
+            advanced_robots.append(robot)
+            self.update_ready(robot)
+        return advanced_robots
+
+    def finish(self, robot):
+        """
+            Finishes the robot's current node and moves the robot to its next
+            node, or to done at the goal (without the extra goal step of
+            Robot.advance)
+            Outputs:
+             - released_robots : see finish_node
+        """
+        node = robot.current_node
+        released_robots = self.finish_node(node)
+        while robot.current_node == node and not robot.is_done():
+            robot.advance()
+        self.update_ready(robot)
+        return released_robots
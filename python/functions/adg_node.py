@@ -1,24 +1,52 @@
 """
-	Object which represents the data required to define a node in an Action
+	Object which represents the data required to define the nodes in an Action
 	Depenency Graph (ADG)
+
+	A node is a flat integer ID: the nodes of robot k are numbered
+	consecutively, such that node ID = offsets[k] + i for the i-th node of
+	robot k (p_k_i). The per-node data is stored in NumPy arrays indexed by
+	the node ID. The "p_k_i" string form is only used for logging/plotting.
 """
 
-from enum import Enum
-class Status(Enum):
+import numpy as np
+
+from enum import IntEnum
+class Status(IntEnum):
 	STAGED = 1
 	ENQUEUED = 2
 	FINISHED = 3
 
-class ADGNode(object):
-	def __init__(self, ID, item, next_item):
-		self.ID = ID # p_k_i
-		time = item["t"]
-		sx = item["x"]
-		sy = item["y"]
-		gx = next_item["x"]
-		gy = next_item["y"]
-		self.time = time
-		self.s_loc = (sx, sy)
-		self.g_loc = (gx, gy)
-		self.status = Status.STAGED
-		self.info = str(ID) + "\n s("+str(sx)+","+str(sy)+")"+" \n g("+str(gx)+","+str(gy)+")" + "\n t " + str(time)
+class ADGNodes(object):
+	def __init__(self, robot_node_counts, time, s_loc, g_loc):
+		"""
+			Inputs:
+			 - robot_node_counts : number of nodes of each robot (in robot ID order)
+			 - time : plan time t of each node
+			 - s_loc, g_loc : (x, y) start and goal location of each node
+		"""
+		self.robot_count = len(robot_node_counts)
+		self.offsets = np.zeros(self.robot_count+1, dtype=np.int64)
+		self.offsets[1:] = np.cumsum(robot_node_counts)
+		self.robot = np.repeat(np.arange(self.robot_count, dtype=np.int32), robot_node_counts)
+		self.index = (np.arange(len(self.robot)) - self.offsets[self.robot]).astype(np.int32)
+		self.time = np.array(time, dtype=np.int32)
+		self.s_loc = np.array(s_loc, dtype=np.int32).reshape(-1, 2)
+		self.g_loc = np.array(g_loc, dtype=np.int32).reshape(-1, 2)
+		self.status = np.full(len(self.robot), Status.STAGED, dtype=np.int8)
+
+	def __len__(self):
+		return len(self.robot)
+
+	def node_ID(self, robot_ID, idx):
+		return int(self.offsets[robot_ID]) + idx
+
+	def robot_nodes(self, robot_ID):
+		return range(int(self.offsets[robot_ID]), int(self.offsets[robot_ID+1]))
+
+	def name(self, node_ID):
+		return "p_" + str(self.robot[node_ID]) + "_" + str(self.index[node_ID])
+
+	def info(self, node_ID):
+		sx, sy = self.s_loc[node_ID]
+		gx, gy = self.g_loc[node_ID]
+		return self.name(node_ID) + "\n s("+str(sx)+","+str(sy)+")"+" \n g("+str(gx)+","+str(gy)+")" + "\n t " + str(self.time[node_ID])
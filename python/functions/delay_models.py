@@ -0,0 +1,204 @@
+"""
+    Delay models of the simulation
+
+    A delay model decides which robots do not advance in a time step. The
+    random draws of a run are generated up front, in vectorized batches over
+    all time steps and robots, so the step loop only looks up its row.
+    Models are registered by name in DELAY_MODELS (make_delay_model):
+     - "interval"  : every delay_amount steps, delayed_robot_cnt robots are
+                     delayed for the whole interval (the original scheme)
+     - "bernoulli" : every robot is delayed in every step with probability p
+     - "stall"     : stalls start with probability rate per robot and step,
+                     their durations are Poisson (or heavy-tailed Pareto)
+     - "trace"     : replays logged stalls (step, robot, duration)
+     - "zone"      : congestion stalls of areas of the map, which delay the
+                     robots inside them
+"""
+
+import csv
+import numpy as np
+
+import logging
+logger = logging.getLogger(__name__)
+
+DELAY_MODELS = {} # name -> class
+
+def register_delay_model(name):
+    """ decorator adding a delay model class to DELAY_MODELS """
+    def register(model_class):
+        DELAY_MODELS[name] = model_class
+        return model_class
+    return register
+
+def make_delay_model(name, robot_count, steps, seed=None, **params):
+    """
+        Delay model name for robot_count robots and steps time steps, with its
+        parameters. Raises ValueError for unknown names.
+    """
+    if name not in DELAY_MODELS:
+        raise ValueError("unknown delay model '{}', expected one of {}".format(name, sorted(DELAY_MODELS)))
+    return DELAY_MODELS[name](robot_count, steps, seed=seed, **params)
+
+def stall_windows(starts, durations, steps):
+    """
+        Boolean [steps, columns] array, True while a stall is active: a stall
+        starting in step k (starts[k, c]) lasts durations[k, c] steps
+    """
+    start_steps, columns = np.nonzero(starts)
+    end_steps = np.minimum(start_steps + durations[start_steps, columns], steps)
+    active = np.zeros((steps + 1, starts.shape[1]), dtype=np.int32)
+    np.add.at(active, (start_steps, columns), 1)
+    np.add.at(active, (end_steps, columns), -1)
+    return np.cumsum(active[:-1], axis=0) > 0
+
+class DelayModel(object):
+    """
+        Base class: generate() returns the boolean [steps, robot_count] array
+        of the delayed robots, which is drawn once per run. Steps after the
+        last one are not delayed.
+    """
+    def __init__(self, robot_count, steps, seed=None):
+        self.robot_count = robot_count
+        self.steps = steps
+        self.rng = np.random.RandomState(seed)
+        self.delayed = self.generate()
+
+    def generate(self):
+        raise NotImplementedError
+
+    def robot_IDs_to_delay(self, k, robots):
+        """ IDs of the robots which do not advance in step k """
+        if k >= self.steps:
+            return np.zeros(0, dtype=np.int64)
+        return np.flatnonzero(self.delayed[k])
+
+@register_delay_model("interval")
+class IntervalDelays(DelayModel):
+    """
+        Every delay_amount steps, delayed_robot_cnt different robots are drawn
+        and delayed until the next draw (same draws as np.random.choice of
+        main_ECBS with the same seed)
+    """
+    def __init__(self, robot_count, steps, seed=None, delay_amount=5, delayed_robot_cnt=1):
+        if delay_amount < 1:
+            raise ValueError("delay_amount must be at least 1: {}".format(delay_amount))
+        self.delay_amount = delay_amount
+        self.delayed_robot_cnt = delayed_robot_cnt
+        super().__init__(robot_count, steps, seed)
+
+    def generate(self):
+        interval_count = -(-self.steps // self.delay_amount)
+        picked = np.zeros((interval_count, self.robot_count), dtype=bool)
+        for interval in range(interval_count):
+            picked[interval, self.rng.choice(self.robot_count, size=self.delayed_robot_cnt, replace=False)] = True
+        return np.repeat(picked, self.delay_amount, axis=0)[:self.steps]
+
+@register_delay_model("bernoulli")
+class BernoulliDelays(DelayModel):
+    """ every robot is delayed in every step with probability p """
+    def __init__(self, robot_count, steps, seed=None, p=0.05):
+        if not 0.0 <= p <= 1.0:
+            raise ValueError("p must be a probability: {}".format(p))
+        self.p = p
+        super().__init__(robot_count, steps, seed)
+
+    def generate(self):
+        return self.rng.random_sample((self.steps, self.robot_count)) < self.p
+
+def draw_durations(rng, size, mean_duration, distribution="poisson", pareto_shape=1.5):
+    """
+        Stall durations [steps] of at least 1 step:
+         - "poisson" : 1 + Poisson(mean_duration - 1)
+         - "pareto"  : Pareto with shape pareto_shape (> 1, heavy tail) and mean
+                       mean_duration, rounded up
+    """
+    if mean_duration < 1:
+        raise ValueError("mean_duration must be at least 1 step: {}".format(mean_duration))
+    if distribution == "poisson":
+        return 1 + rng.poisson(mean_duration - 1, size=size)
+    if distribution == "pareto":
+        if pareto_shape <= 1:
+            raise ValueError("pareto_shape must be larger than 1 for a finite mean: {}".format(pareto_shape))
+        scale = mean_duration*(pareto_shape - 1)/pareto_shape
+        return np.ceil(scale*(1 + rng.pareto(pareto_shape, size=size))).astype(np.int64)
+    raise ValueError("unknown duration distribution '{}'".format(distribution))
+
+@register_delay_model("stall")
+class StallDelays(DelayModel):
+    """
+        Stalls start with probability rate per robot and step (while the robot
+        is not stalled already, it can start another one); see draw_durations
+        for their durations
+    """
+    def __init__(self, robot_count, steps, seed=None, rate=0.01, mean_duration=5, distribution="poisson", pareto_shape=1.5):
+        self.rate = rate
+        self.mean_duration = mean_duration
+        self.distribution = distribution
+        self.pareto_shape = pareto_shape
+        super().__init__(robot_count, steps, seed)
+
+    def generate(self):
+        size = (self.steps, self.robot_count)
+        starts = self.rng.random_sample(size) < self.rate
+        durations = draw_durations(self.rng, size, self.mean_duration, self.distribution, self.pareto_shape)
+        return stall_windows(starts, durations, self.steps)
+
+def load_delay_trace(file_name):
+    """ stalls of a log: csv file with the columns step, robot, duration """
+    with open(file_name) as csv_file:
+        return [(int(row["step"]), int(row["robot"]), int(row["duration"])) for row in csv.DictReader(csv_file)]
+
+@register_delay_model("trace")
+class TraceDelays(DelayModel):
+    """
+        Replays the stalls of trace, a list of (step, robot ID, duration) or
+        the csv file of load_delay_trace; stalls of other robots are ignored
+    """
+    def __init__(self, robot_count, steps, seed=None, trace=()):
+        if isinstance(trace, str):
+            trace = load_delay_trace(trace)
+        self.trace = np.array(trace, dtype=np.int64).reshape(-1, 3)
+        super().__init__(robot_count, steps, seed)
+
+    def generate(self):
+        trace = self.trace[(self.trace[:, 0] < self.steps) & (self.trace[:, 1] < self.robot_count)]
+        starts = np.zeros((self.steps, self.robot_count), dtype=bool)
+        durations = np.zeros((self.steps, self.robot_count), dtype=np.int64)
+        starts[trace[:, 0], trace[:, 1]] = True
+        np.maximum.at(durations, (trace[:, 0], trace[:, 1]), trace[:, 2])
+        return stall_windows(starts, durations, self.steps)
+
+@register_delay_model("zone")
+class ZoneDelays(DelayModel):
+    """
+        Congestion of areas of the map: zones are (x_min, y_min, x_max, y_max)
+        rectangles (inclusive), each of them congests with probability rate per
+        step for a duration from draw_durations. Robots whose current position
+        is in a congested zone are delayed, so the robots delayed in a step
+        depend on where they are and the draws are per zone.
+    """
+    def __init__(self, robot_count, steps, seed=None, zones=(), rate=0.01, mean_duration=5, distribution="poisson", pareto_shape=1.5):
+        self.zones = np.array(zones, dtype=np.int64).reshape(-1, 4)
+        self.rate = rate
+        self.mean_duration = mean_duration
+        self.distribution = distribution
+        self.pareto_shape = pareto_shape
+        super().__init__(robot_count, steps, seed)
+
+    def generate(self):
+        """ boolean [steps, zones] array of the congested zones """
+        size = (self.steps, len(self.zones))
+        starts = self.rng.random_sample(size) < self.rate
+        durations = draw_durations(self.rng, size, self.mean_duration, self.distribution, self.pareto_shape)
+        return stall_windows(starts, durations, self.steps)
+
+    def robot_IDs_to_delay(self, k, robots):
+        if k >= self.steps or len(self.zones) == 0:
+            return np.zeros(0, dtype=np.int64)
+        congested = self.zones[self.delayed[k]]
+        if len(congested) == 0:
+            return np.zeros(0, dtype=np.int64)
+        positions = np.array([[robot.current_position["x"], robot.current_position["y"]] for robot in robots])
+        inside = ((positions[:, None, 0] >= congested[None, :, 0]) & (positions[:, None, 1] >= congested[None, :, 1])
+                  & (positions[:, None, 0] <= congested[None, :, 2]) & (positions[:, None, 1] <= congested[None, :, 3]))
+        return np.array([robots[idx].robot_ID for idx in np.flatnonzero(inside.any(axis=1))], dtype=np.int64)
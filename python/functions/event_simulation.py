@@ -0,0 +1,107 @@
+"""
+    Continuous-time execution of the ADG (discrete-event simulation)
+
+    Instead of the unit time steps of main_ECBS, every ADG node takes a
+    real-valued duration (e.g. from the length of its move and the speed of
+    its robot). A robot starts its current node as soon as all predecessors
+    of the node are FINISHED; the completion of the node is an event in a
+    priority queue. Processing an event finishes the node (ADGExecution),
+    moves the robot to its next node and starts the robots it released, so
+    the simulation jumps from event to event and the Robot, ADG node status
+    and ADG ordering are kept up to date like in the step loop.
+"""
+
+import heapq
+import numpy as np
+
+import logging
+logger = logging.getLogger(__name__)
+
+def node_durations(nodes, robot_speeds=None, cell_size=1.0):
+    """
+        Duration of every ADG node: length of its move (s_loc -> g_loc, in
+        cells of cell_size) over the speed of its robot
+         - robot_speeds : speed per robot ID [length/time], default 1.0
+    """
+    distances = np.linalg.norm((nodes.g_loc - nodes.s_loc).astype(np.float64), axis=1)*cell_size
+    if robot_speeds is None:
+        return distances
+    robot_speeds = np.asarray(robot_speeds, dtype=np.float64)
+    if np.any(robot_speeds <= 0):
+        raise ValueError("robot speeds must be positive")
+    return distances/robot_speeds[nodes.robot]
+
+class EventSimulation(object):
+    """
+        Executes the ADG with the node durations, driven by the events of an
+        ADGExecution (which also has to listen to the ADG changes of the
+        ordering, see ADGCycleCheck.listeners).
+
+        The robots' time_to_next_node are set to the durations of their
+        nodes, so the ordering (solve_MILP / solve_heuristic) plans with the
+        same times the simulation executes.
+    """
+    def __init__(self, robots, execution, durations):
+        self.robots = robots
+        self.execution = execution
+        self.durations = np.asarray(durations, dtype=np.float64)
+        for robot in robots:
+            robot.time_to_next_node = [float(self.durations[node]) for node in robot.plan_nodes]
+        self.time = 0.0
+        self.events = []        # heap of (completion time, robot ID)
+        self.running = set()    # robots which started their current node
+        self.completion_time = {} # robot ID -> time the robot reached its goal (float)
+        self.event_count = 0
+        self.delays = {}        # robot ID -> delay of its current node
+        for robot in robots:
+            if robot.is_done():
+                self.completion_time[robot.robot_ID] = 0.0
+
+    def is_done(self):
+        return len(self.completion_time) == len(self.robots)
+
+    def delay(self, robot_ID, amount):
+        """
+            the robot finishes its current node amount later. Like in the
+            step loop, a robot waiting for a dependency loses nothing: the
+            delay is dropped unless the robot runs or can start its node.
+        """
+        if robot_ID not in self.running and robot_ID not in self.execution.ready:
+            return
+        self.delays[robot_ID] = self.delays.get(robot_ID, 0.0) + amount
+
+    def __start_ready(self):
+        for robot_ID in sorted(self.execution.ready - self.running):
+            robot = self.robots[robot_ID]
+            heapq.heappush(self.events, (self.time + float(self.durations[robot.current_node]), robot_ID))
+            self.running.add(robot_ID)
+
+    def run(self, until=np.inf):
+        """
+            Processes the events up to the time until (all of them by
+            default). Events at the same time are processed in robot ID order.
+            Outputs:
+             - finished_robots : the robots which reached their goal
+        """
+        finished_robots = []
+        self.__start_ready()
+        while len(self.events) > 0 and self.events[0][0] <= until:
+            event_time, robot_ID = heapq.heappop(self.events)
+            self.time = float(event_time) # plain floats: the times end up in the results YAML
+            if self.delays.get(robot_ID, 0.0) > 0:
+                heapq.heappush(self.events, (self.time + self.delays.pop(robot_ID), robot_ID))
+                continue
+            self.running.discard(robot_ID)
+            robot = self.robots[robot_ID]
+            self.execution.finish(robot)
+            self.event_count += 1
+            if robot.is_done():
+                self.completion_time[robot_ID] = self.time
+                finished_robots.append(robot)
+            self.__start_ready()
+        if len(self.events) == 0 and not self.is_done():
+            waiting = sorted(robot.robot_ID for robot in self.robots if robot.robot_ID not in self.completion_time)
+            raise Exception("no robot can advance, robots {} are waiting (deadlock)".format(waiting))
+        if until != np.inf:
+            self.time = float(max(self.time, until))
+        return finished_robots
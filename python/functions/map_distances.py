@@ -0,0 +1,114 @@
+"""
+    True-distance heuristics of a map
+
+    BFS distance fields ([dimx, dimy] arrays of the 4-connected distances to
+    a cell) of all start/goal cells of a map are computed by
+    data/generate_map.py and stored next to csv_map_yaml.yaml:
+     - distance_fields.npy : [cells, dimx, dimy] int32 distance fields
+     - distance_cells.npy  : [cells, 2] the cells of the fields
+     - distance_fields.yaml : sha256 of the map CSV the fields belong to
+    load_distance_fields memory-maps them, so planners and estimators get a
+    field without running a BFS; they are only rebuilt when the map CSV (or
+    the set of cells) changed.
+"""
+
+import os
+import numpy as np
+import yaml
+
+from functions.map_store import file_hash, load_grid_map
+
+import logging
+logger = logging.getLogger(__name__)
+
+UNREACHABLE = np.iinfo(np.int32).max
+FIELDS_FILE = "distance_fields.npy"
+CELLS_FILE = "distance_cells.npy"
+META_FILE = "distance_fields.yaml"
+
+def load_map(map_file):
+    """ [dimx, dimy] boolean array (read-only) of the free cells of a map YAML file """
+    return load_grid_map(map_file).free
+
+def distance_fields(free, cells):
+    """
+        [cells, dimx, dimy] int32 array of the 4-connected distances of all
+        free cells to each of cells (UNREACHABLE if there is no path), by
+        BFS wavefronts of all cells at once
+    """
+    cells = np.array(cells, dtype=np.int64).reshape(-1, 2)
+    distance = np.full((len(cells),) + free.shape, UNREACHABLE, dtype=np.int32)
+    frontier = np.zeros(distance.shape, dtype=bool)
+    frontier[np.arange(len(cells)), cells[:, 0], cells[:, 1]] = free[cells[:, 0], cells[:, 1]]
+    distance[frontier] = 0
+    step = 0
+    while frontier.any():
+        step += 1
+        reached = np.zeros_like(frontier)
+        reached[:, 1:, :] |= frontier[:, :-1, :]
+        reached[:, :-1, :] |= frontier[:, 1:, :]
+        reached[:, :, 1:] |= frontier[:, :, :-1]
+        reached[:, :, :-1] |= frontier[:, :, 1:]
+        reached &= free & (distance == UNREACHABLE)
+        distance[reached] = step
+        frontier = reached
+    return distance
+
+def distance_field(free, cell):
+    """ [dimx, dimy] distance field of one cell (see distance_fields) """
+    return distance_fields(free, [cell])[0]
+
+class DistanceFields(object):
+    """ distance fields of a map directory, memory-mapped (read-only) """
+    def __init__(self, map_dir):
+        self.fields = np.load(os.path.join(map_dir, FIELDS_FILE), mmap_mode="r")
+        self.cells = np.load(os.path.join(map_dir, CELLS_FILE))
+        self.index = {(int(x), int(y)): idx for idx, (x, y) in enumerate(self.cells)}
+
+    def field(self, cell):
+        """ distance field of cell, None if it was not precomputed """
+        idx = self.index.get((int(cell[0]), int(cell[1])))
+        if idx is None:
+            return None
+        return self.fields[idx].view(np.ndarray) # plain array view of the mapped file
+
+def load_distance_fields(map_dir, csv_map_file=None):
+    """
+        The precomputed distance fields of map_dir, None if there are none
+        (or if they do not belong to csv_map_file any more)
+    """
+    meta_file = os.path.join(map_dir, META_FILE)
+    if not os.path.exists(meta_file):
+        return None
+    if csv_map_file is not None:
+        with open(meta_file) as yaml_file:
+            if yaml.safe_load(yaml_file)["csv_sha256"] != file_hash(csv_map_file):
+                return None
+    return DistanceFields(map_dir)
+
+def update_distance_fields(map_dir, csv_map_file, free, cells):
+    """
+        Computes and stores the distance fields of cells, unless the stored
+        ones already belong to the same map CSV and cells
+        Outputs:
+         - distance_fields : DistanceFields of map_dir
+    """
+    cells = np.array(sorted(set((int(x), int(y)) for x, y in cells)), dtype=np.int64).reshape(-1, 2)
+    csv_hash = file_hash(csv_map_file)
+    stored = load_distance_fields(map_dir, csv_map_file)
+    if stored is not None and np.array_equal(stored.cells, cells) and stored.fields.shape[1:] == free.shape:
+        logger.info("distance fields of {} are up to date".format(map_dir))
+        return stored
+
+    fields = distance_fields(free, cells)
+    # replace the files (processes which mapped the old ones keep them)
+    if os.path.exists(os.path.join(map_dir, META_FILE)):
+        os.remove(os.path.join(map_dir, META_FILE))
+    for file_name, array in [(FIELDS_FILE, fields), (CELLS_FILE, cells)]:
+        with open(os.path.join(map_dir, file_name + ".tmp"), "wb") as npy_file:
+            np.save(npy_file, array)
+        os.replace(os.path.join(map_dir, file_name + ".tmp"), os.path.join(map_dir, file_name))
+    with open(os.path.join(map_dir, META_FILE), "w") as yaml_file:
+        yaml.safe_dump({"csv_sha256": csv_hash, "cells": len(cells), "dimensions": list(free.shape)}, yaml_file, default_flow_style=False)
+    logger.info("stored {} distance fields of {}".format(len(cells), map_dir))
+    return DistanceFields(map_dir)
@@ -0,0 +1,163 @@
+"""
+    Map store: every map YAML file is parsed once
+
+    The map YAML files written by generate_map.py list thousands of obstacles,
+    and parsing them takes a large part of the start-up of a run on the big
+    maps. The store parses a map once and keeps it as a GridMap:
+     - free : [dimx, dimy] boolean occupancy grid (True: free cell)
+     - indptr, indices : 4-connected adjacency of the free cells in CSR form,
+                         cell index x*dimy + y, the neighbours of cell c are
+                         indices[indptr[c]:indptr[c+1]]
+    All arrays are read-only views shared by the simulator, the visualizer
+    and the planners. The grid is also cached on disk next to the YAML file
+    (<map>_grid.npz, rebuilt when the sha256 of the YAML file changed), so
+    the next processes do not parse the YAML file either.
+"""
+
+import hashlib
+import os
+import threading
+import numpy as np
+import yaml
+
+import logging
+logger = logging.getLogger(__name__)
+
+GRID_SUFFIX = "_grid.npz"
+
+def _read_only(array):
+    view = array.view()
+    view.flags.writeable = False
+    return view
+
+def adjacency(free):
+    """ CSR (indptr, indices) of the 4-connected adjacency of the free cells of free """
+    dimx, dimy = free.shape
+    cells = np.arange(free.size, dtype=np.int64).reshape(dimx, dimy)
+    sources = []
+    targets = []
+    for source, target in [(np.s_[1:, :], np.s_[:-1, :]), (np.s_[:-1, :], np.s_[1:, :]),
+                           (np.s_[:, 1:], np.s_[:, :-1]), (np.s_[:, :-1], np.s_[:, 1:])]:
+        edges = free[source] & free[target]
+        sources.append(cells[source][edges])
+        targets.append(cells[target][edges])
+    sources = np.concatenate(sources)
+    targets = np.concatenate(targets)
+    order = np.lexsort((targets, sources))
+    indptr = np.zeros(free.size + 1, dtype=np.int64)
+    np.cumsum(np.bincount(sources, minlength=free.size), out=indptr[1:])
+    return indptr, targets[order].astype(np.int32)
+
+class GridMap(object):
+    """ occupancy grid and CSR adjacency of a map, read-only """
+    def __init__(self, free, indptr=None, indices=None):
+        free = np.asarray(free, dtype=bool)
+        if indptr is None:
+            indptr, indices = adjacency(free)
+        self.free = _read_only(free)
+        self.indptr = _read_only(indptr)
+        self.indices = _read_only(indices)
+        self.dimensions = free.shape
+
+    @property
+    def obstacles(self):
+        """ [obstacles, 2] array of the obstacle cells """
+        return np.argwhere(~self.free)
+
+    def cell_index(self, cell):
+        return int(cell[0])*self.dimensions[1] + int(cell[1])
+
+    def neighbours(self, cell):
+        """ [neighbours, 2] array of the free 4-connected neighbours of cell """
+        idx = self.cell_index(cell)
+        return np.stack(np.divmod(self.indices[self.indptr[idx]:self.indptr[idx+1]], self.dimensions[1]), axis=1)
+
+    def padded(self, obstacle=1.0, free=0.0):
+        """ float map array (obstacle / free) padded with obstacles, for plotting """
+        map_array = np.where(self.free, free, obstacle)
+        return np.pad(map_array, (1, 1), mode="constant", constant_values=obstacle)
+
+def grid_file(map_file):
+    return os.path.splitext(map_file)[0] + GRID_SUFFIX
+
+def file_hash(file_name):
+    """ sha256 of the file, to tell whether a cache still belongs to it """
+    with open(file_name, "rb") as hashed_file:
+        return hashlib.sha256(hashed_file.read()).hexdigest()
+
+def _parse_map_file(map_file):
+    loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+    with open(map_file) as yaml_file:
+        map_config = yaml.load(yaml_file, Loader=loader)["map"]
+    free = np.ones(map_config["dimensions"], dtype=bool)
+    obstacles = np.array(map_config["obstacles"], dtype=np.int64).reshape(-1, 2)
+    free[obstacles[:, 0], obstacles[:, 1]] = False
+    return free
+
+def store_grid_map(map_file, grid_map, map_hash=None):
+    """ writes the on-disk cache of map_file (the processes reading the old one keep it) """
+    map_hash = file_hash(map_file) if map_hash is None else map_hash
+    tmp_file = grid_file(map_file) + ".tmp"
+    with open(tmp_file, "wb") as npz_file:
+        np.savez(npz_file, map_sha256=np.array(map_hash), free=np.packbits(grid_map.free, axis=None),
+                 dimensions=np.array(grid_map.dimensions, dtype=np.int64), indptr=grid_map.indptr, indices=grid_map.indices)
+    os.replace(tmp_file, grid_file(map_file))
+
+def _load_grid_file(map_file, map_hash):
+    if not os.path.exists(grid_file(map_file)):
+        return None
+    try:
+        with np.load(grid_file(map_file)) as cached:
+            if str(cached["map_sha256"]) != map_hash:
+                return None
+            dimensions = tuple(int(value) for value in cached["dimensions"])
+            free = np.unpackbits(cached["free"], count=dimensions[0]*dimensions[1]).astype(bool).reshape(dimensions)
+            return GridMap(free, cached["indptr"], cached["indices"])
+    except (OSError, ValueError, KeyError) as exc:
+        logger.warning("ignoring the grid cache of {}: {}".format(map_file, exc))
+        return None
+
+class MapStore(object):
+    """
+        GridMaps of map YAML files, loaded once per process (and once per
+        map file version on disk)
+    """
+    def __init__(self, disk_cache=True):
+        self.disk_cache = disk_cache
+        self.maps = {} # absolute path -> (mtime, size, GridMap)
+        self.lock = threading.Lock()
+
+    def get(self, map_file):
+        """ GridMap of map_file """
+        map_file = os.path.abspath(map_file)
+        stat = os.stat(map_file)
+        with self.lock:
+            cached = self.maps.get(map_file)
+            if cached is not None and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+                return cached[2]
+            grid_map = self.__load(map_file)
+            self.maps[map_file] = (stat.st_mtime_ns, stat.st_size, grid_map)
+            return grid_map
+
+    def __load(self, map_file):
+        if not self.disk_cache:
+            return GridMap(_parse_map_file(map_file))
+        map_hash = file_hash(map_file)
+        grid_map = _load_grid_file(map_file, map_hash)
+        if grid_map is None:
+            grid_map = GridMap(_parse_map_file(map_file))
+            try:
+                store_grid_map(map_file, grid_map, map_hash)
+            except OSError as exc:
+                logger.warning("cannot cache the grid of {}: {}".format(map_file, exc))
+        return grid_map
+
+    def clear(self):
+        with self.lock:
+            self.maps = {}
+
+map_store = MapStore()
+
+def load_grid_map(map_file):
+    """ GridMap of a map YAML file, from the process-wide map store """
+    return map_store.get(map_file)
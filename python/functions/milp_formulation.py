@@ -2,356 +2,1141 @@
     Solves the MILP based on the current progress of the robots
 """
 
-from mip import Model, xsum, maximize, minimize, BINARY, CONTINUOUS, Constr, ConstrList
+from mip import Model, LinExpr, Var, xsum, maximize, minimize, BINARY, CONTINUOUS, Constr, ConstrList, OptimizationStatus
 import matplotlib.pyplot as plt
 import networkx as nx
 import time
 import numpy as np
 
+from functions.objectives import OBJECTIVES, Objective, make_objective
+from functions.adg_dependency_group import GroupThresholds
+
 import logging
 logger = logging.getLogger(__name__)
 
 # epsilon boundary => required to avoid a1 >= b1 AND b1 >= a1 to be true simultaneously
 eps = 0.01 #1
 
-def solve_MILP(robots, dependency_groups, ADG, ADG_reverse, H_control, H_prediction, m, pl_opt, run=True, uncertainty_bound=0.0, cost_func="cumulative"):
-    """
-        Formulate and solve an MILP which uses:
-         - each robot's current location
-         - inter-robot dependencies represented by ADG
-        to determine if the ordering should be revised
+M = 1000000 # Big-M method - Niels: "choose wisely to help solver numerically"
+BIG_M_MODES = ["fixed", "tight"]
 
-        If the ordering needs to be revised, the ADG is updated accordingly
+MAX_SOLVE_TIME = 600 # [s] solver time limit without a time budget
+MIN_SOLVE_TIME = 0.01 # [s] smallest solver time limit within a time budget
+
+# outcome of an ordering step (SolveOutcomes):
+#  - "optimal"   : the MILP was solved to optimality (solve_heuristic: the
+#                  local search converged)
+#  - "incumbent" : the best solution found within the time budget (or gap)
+#  - "fallback"  : no (acyclic) solution, the current ordering was kept
+#  - "skipped"   : the MILPCache skipped the solve
+OUTCOMES = ["optimal", "incumbent", "fallback", "skipped"]
 
+def determine_switchable_groups(robots, dependency_groups, nodes, H_control, thresholds=None):
+    """
         Dependencies can only be switched if none of the robots have reached the
-        nodes linking these dependencies
+        nodes linking these dependencies, and the group starts within the
+        control horizon H_control
+        thresholds are the GroupThresholds of dependency_groups (compiled by
+        analyze_ADG into ADG.graph["group_thresholds"]); without them, they
+        are compiled here
+        Outputs:
+         - switchable_dependency_groups : groups which CAN be switched
+         - fixed_dependency_groups : groups which CANNOT be switched
     """
-    if not run:
-        logger.info(" solve_MILP: NOT running optimization - original behavior")
-        return None, 0
-    else:
-        logger.info(" solve_MILP: Formulating and solving MILP ...")
+    if thresholds is None or not thresholds.matches(dependency_groups):
+        thresholds = GroupThresholds(dependency_groups, nodes)
 
-    current_positions = {} # list of node ID's where the robots are
-    for robot in robots:
-        current_positions[robot.robot_ID] = robot.current_node
+    # plan indices where the robots are
+    robot_IDs = np.array([robot.robot_ID for robot in robots], dtype=np.int64)
+    progress = np.full(max([0] + [robot_ID + 1 for robot_ID in robot_IDs] + [robot_ID + 1 for robot_ID in thresholds.robots]), -1, dtype=np.int64)
+    progress[robot_IDs] = nodes.index[np.array([robot.current_node for robot in robots], dtype=np.int64)]
+    if (progress[thresholds.robots] < 0).any():
+        raise KeyError("no robot for dependency groups of robots {}".format(thresholds.robots[progress[thresholds.robots] < 0]))
 
-    """ 1 - Determine which edges can be reversed based on robot's current position """
     logger.info(" 1 determining switchable_dependency_groups ...")
-    switchable_dependency_groups = []   # list of dependency groups which CAN be switched
-    fixed_dependency_groups = []        # list of dependency groups which CANNOT be switched
-
-    for dependency_group in dependency_groups:
-        logger.debug("dependency group type: {}".format(dependency_group.type))
-        group_is_switchable = True
-        blocked_robot_ID = dependency_group.robot_blocked
-        blocking_robot_ID = dependency_group.robot_blocking
-
-        # check the original dependency edges
-        for edge in dependency_group.edges:
-            node_pointing_to = edge[1]  # the node the edge is pointing to
-            plan_idx = node_pointing_to.split("_")[2] # get the plan number "p_0_2" = 2
-            current_robot_plan_idx = current_positions[int(blocked_robot_ID)].split("_")[2]
-            if int(plan_idx) <= int(current_robot_plan_idx):
-                group_is_switchable = False
-
-        # check the reverse dependency edges
-        for edge in dependency_group.reverse_edges:
-            node_pointing_to = edge[1] # the node the edge is pointing to
-            plan_idx = node_pointing_to.split("_")[2] # get the plan number "p_0_2" = 2
-            current_robot_plan_idx = current_positions[int(blocking_robot_ID)].split("_")[2]
-            if int(plan_idx) <= int(current_robot_plan_idx):
-                group_is_switchable = False
-
-        # check if closest head is within horizon
-        tail = dependency_group.first_edge_tail
-        head = dependency_group.first_edge_head
-        head_robot_id = int(head.split("_")[1])
-        head_pos_idx = int(head.split("_")[2])
-        robot_node = current_positions[head_robot_id]
-        robot_pos_idx = int(robot_node.split("_")[2])
-        if head_pos_idx > robot_pos_idx + H_control: # if outside horizon
-            group_is_switchable = False
-
-        # if dependencies are switchable, add to list
-        if group_is_switchable:
-            switchable_dependency_groups.append(dependency_group)
-        else:
-            fixed_dependency_groups.append(dependency_group)
-
-    # logger.debug("Length: {}".format(len(switchable_dependency_groups)))
+    switchable = thresholds.switchable(progress, H_control)
+    switchable_dependency_groups = thresholds.groups[switchable].tolist()  # list of dependency groups which CAN be switched
+    fixed_dependency_groups = thresholds.groups[~switchable].tolist()      # list of dependency groups which CANNOT be switched
     logger.info("   done!")
 
-    """ 2 - Formulate MILP using switchable_dependency_groups """
-    logger.info(" 2 formulating MILP problem ...")
+    return switchable_dependency_groups, fixed_dependency_groups
 
-    M = 1000000 # Big-M method - Niels: "choose wisely to help solver numerically"
+def prediction_horizon(H_prediction):
+    """ H_prediction as a node count, None (also for NaN) if the whole plans are predicted """
+    if H_prediction is None or H_prediction != H_prediction:
+        return None
+    if H_prediction < 0:
+        raise ValueError("prediction horizon must not be negative: {}".format(H_prediction))
+    return int(H_prediction)
 
-    # m_opt.start = #TODO INITIAL FEASIBLE SOLUTION - Ch 5.4 of MIP manual
-    milp_variables = {}
-    milp_variables["continuous"] = {}
-    milp_variables["binary"] = []
+def first_node_bound(robot, uncertainty_bound=0.0):
+    """ lower bound on the completion time of the robot's current node """
+    progress = 0.14 # change later in robot.object
+    left_over = (1-progress)
+    return left_over*robot.time_to_next_node[robot.current_idx] + eps + uncertainty_bound
+
+class PlanSchedule(object):
+    """
+        Precedence constraints of the robots' remaining plans (and of
+        dependency groups with a fixed orientation), set up once to evaluate
+        the earliest completion times of several orientations of the other
+        dependency groups (earliest_times). This is the longest-path schedule
+        of the MILP's constraints, shared by the MIP start, the cycle check
+        of the prediction horizon and the ordering heuristic.
+         - release_times : {node: lower bound on the node's completion time}
+         - fixed_dependency_groups : groups always in their original_direction
+    """
+    def __init__(self, robots, uncertainty_bound=0.0, release_times=None, fixed_dependency_groups=()):
+        self.successors = {}
+        self.in_degree = {}
+        self.start_time = {}
+        for robot in robots:
+            prev_node = None
+            for idx, node in enumerate(robot.get_remaining_plan()):
+                self.successors[node] = []
+                self.in_degree[node] = 0
+                if prev_node is None:
+                    self.start_time[node] = first_node_bound(robot, uncertainty_bound)
+                else:
+                    self.start_time[node] = 0.0
+                    weight = robot.time_to_next_node[robot.current_idx+idx] + eps + uncertainty_bound
+                    self.successors[prev_node].append((node, weight))
+                    self.in_degree[node] += 1
+                prev_node = node
+        if release_times is not None:
+            for node, release_time in release_times.items():
+                self.start_time[node] = max(self.start_time[node], release_time)
+        for tail_node, head_node in self.__edges(fixed_dependency_groups, None):
+            self.successors[tail_node].append((head_node, eps))
+            self.in_degree[head_node] += 1
+
+    def __edges(self, dependency_groups, directions):
+        for dependency_group in dependency_groups:
+            direction = dependency_group.original_direction
+            if directions is not None:
+                direction = directions.get(dependency_group, direction)
+            for tail_node, head_node in (dependency_group.edges if direction else dependency_group.reverse_edges):
+                # edges to finished nodes are no longer constraints
+                if tail_node in self.successors and head_node in self.successors:
+                    yield tail_node, head_node
+
+    def earliest_times(self, dependency_groups, directions=None):
+        """
+            {node: earliest completion time} with dependency_groups in their
+            original_direction (or in directions: {dependency group:
+            direction}), None if the orientation has a cycle
+        """
+        in_degree = dict(self.in_degree)
+        group_successors = {}
+        for tail_node, head_node in self.__edges(dependency_groups, directions):
+            group_successors.setdefault(tail_node, []).append(head_node)
+            in_degree[head_node] += 1
+
+        # longest path in topological order
+        start_time = dict(self.start_time)
+        ready = [node for node, degree in in_degree.items() if degree == 0]
+        visited_count = 0
+        while len(ready) > 0:
+            node = ready.pop()
+            visited_count += 1
+            for next_node, weight in self.successors[node]:
+                start_time[next_node] = max(start_time[next_node], start_time[node] + weight)
+                in_degree[next_node] -= 1
+                if in_degree[next_node] == 0:
+                    ready.append(next_node)
+            for next_node in group_successors.get(node, ()):
+                start_time[next_node] = max(start_time[next_node], start_time[node] + eps)
+                in_degree[next_node] -= 1
+                if in_degree[next_node] == 0:
+                    ready.append(next_node)
+        if visited_count < len(in_degree):
+            return None
+        return start_time
+
+def earliest_completion_times(robots, dependency_groups, uncertainty_bound=0.0, directions=None, release_times=None):
+    """
+        Earliest completion time of every remaining node for a fixed
+        orientation of the dependency groups (longest path through the
+        precedence and dependency constraints of the MILP, see PlanSchedule)
+        Inputs:
+         - directions : {dependency group: direction} overriding the groups'
+                        original_direction
+         - release_times : {node: lower bound on the node's completion time}
+        Outputs:
+         - {node: time}, or None if the orientation has a cycle
+    """
+    return PlanSchedule(robots, uncertainty_bound, release_times).earliest_times(dependency_groups, directions)
+
+class ConstraintRows(object):
+    """
+        Constraints  coeffs . variables >= rhs  collected as sparse rows and
+        added to a model at once. The rows come in blocks of NumPy arrays
+        (columns and coeffs [rows, terms], rhs [rows]) over the columns
+        (Var.idx) of the model, merged into one CSR matrix by csr(). emit()
+        builds one LinExpr per row straight from its coefficients instead of
+        the intermediate expressions of python-mip's operators (t_2 >= t_1 +
+        eps - M*b builds four of them). A variable occurs once per row at most.
+        keys (one per row) identify the constraints for the caller.
+    """
+    def __init__(self):
+        self.blocks = []
+        self.keys = []
+
+    def __len__(self):
+        return len(self.keys)
+
+    def add(self, columns, coeffs, rhs, keys):
+        """ adds a block of rows, coeffs and rhs are broadcast to its shape """
+        if len(keys) == 0:
+            return
+        columns = np.asarray(columns, dtype=np.int64).reshape(len(keys), -1)
+        coeffs = np.broadcast_to(np.asarray(coeffs, dtype=float), columns.shape)
+        rhs = np.broadcast_to(np.asarray(rhs, dtype=float), (len(keys),))
+        self.blocks.append((columns, coeffs, rhs))
+        self.keys.extend(keys)
+
+    def csr(self):
+        """ (indptr, columns, coeffs, rhs) arrays of all rows """
+        indptr = np.zeros(len(self) + 1, dtype=np.int64)
+        if len(self) == 0:
+            return indptr, np.zeros(0, dtype=np.int64), np.zeros(0), np.zeros(0)
+        np.cumsum(np.concatenate([np.full(len(rhs), columns.shape[1]) for columns, _, rhs in self.blocks]), out=indptr[1:])
+        return (indptr, np.concatenate([columns.ravel() for columns, _, _ in self.blocks]),
+                np.concatenate([coeffs.ravel() for _, coeffs, _ in self.blocks]),
+                np.concatenate([rhs for _, _, rhs in self.blocks]))
+
+    def emit(self, m):
+        """ adds the rows to model m, returns [(key, constraint)] in row order """
+        indptr, columns, coeffs, rhs = self.csr()
+        variables = m.vars
+        columns = [variables[column] for column in columns.tolist()]
+        coeffs = coeffs.tolist()
+        indptr = indptr.tolist()
+        constrs = []
+        for row, row_rhs in enumerate(rhs.tolist()):
+            start, end = indptr[row], indptr[row+1]
+            constrs.append(m.add_constr(LinExpr(columns[start:end], coeffs[start:end], -row_rhs, ">")))
+        return list(zip(self.keys, constrs))
+
+class MILPFormulation(object):
+    """
+        The ordering MILP of solve_MILP, kept alive across time steps.
+
+        With incremental=True, update() only changes what differs from the
+        previous step:
+         - the variables (and constraints) of nodes the robots finished are
+           removed
+         - the first remaining node of each robot gets its lower bound
+         - dependency groups which changed between switchable and fixed (or
+           changed direction) have their constraints replaced
+        With incremental=False, update() adds the whole problem to the model,
+        which the caller has to clear beforehand. Either way, the precedence
+        constraints of new robots and the constraints of (re)built dependency
+        groups are collected as ConstraintRows and added in bulk.
+
+        big_M selects the M of the switchable (disjunctive) constraints:
+         - "fixed" : the global M
+         - "tight" : per constraint, the largest difference the tail and head
+                     can have in an earliest-time schedule (time_bounds). The
+                     constraints of a switchable group are rebuilt if a later
+                     update needs a larger M.
+
+        With compress=True, only the nodes which need their own time get a
+        variable (anchors): the first remaining node and the goal of each
+        robot, and the nodes of dependency (Type 2) edges and release times.
+        A run of nodes between two anchors has no constraint of its own, so
+        it shares the variable of the anchor before it: a node's time is
+        that variable plus the plan duration from the anchor to the node
+        (completion_times), and consecutive anchors are linked by one
+        precedence constraint with the summed duration of the run. This does
+        not change the optimal orientation.
+
+        With a prediction horizon H_prediction (argument of update), only the
+        fixed dependency edges between nodes within H_prediction nodes of
+        their robots' current nodes are constraints. Beyond the horizon, a
+        robot's plan is one run (unless it holds switchable edges): its goal
+        variable is only bounded by the plan duration. The model size then
+        depends on the horizon instead of the plan lengths.
+    """
+    def __init__(self, m=None, incremental=True, big_M="fixed", compress=True):
+        if m is None:
+            m = Model()
+        if big_M not in BIG_M_MODES:
+            raise ValueError("unknown big_M mode '{}', expected one of {}".format(big_M, BIG_M_MODES))
+        self.model = m
+        self.incremental = incremental
+        self.big_M = big_M
+        self.compress = compress
+        self.uncertainty_bound = None
+        self.H_prediction = None
+        self.reset()
+
+    def reset(self):
+        if self.uncertainty_bound is not None:
+            self.model.clear()
+        self.continuous = {}    # robot ID -> {node: variable of its anchor} of the remaining nodes (in plan order)
+        self.node_variables = {} # anchor node -> variable
+        self.anchor_of = {}     # remaining node -> anchor node (the node itself, or the anchor before it)
+        self.anchor_robot = {}  # anchor node -> robot ID
+        self.links = {}         # anchor node -> (next anchor node, precedence constraint)
+        self.cumulative = {}    # remaining node -> plan duration (incl. eps) from the robot's first variable
+        self.first_node = {}    # robot ID -> node with the lower bound
+        self.horizon_end = {}   # robot ID -> last node within the prediction horizon
+        self.node_constrs = {}  # anchor node -> constraints on the node's variable
+        self.groups = {}        # dependency group -> (binary variable or None, direction, constraints, M per constraint or fixed edge count)
+        self.objective = None   # Objective the objective variables/constraints belong to
+        self.objective_objects = {} # key -> variable or constraint of the objective
+        self.var_count = 0      # unique variable names (CBC matches start values by name)
+
+    def __new_name(self, prefix):
+        self.var_count += 1
+        return prefix + "_" + str(self.var_count)
+
+    def use_objective(self, objective):
+        """ removes the objective variables/constraints of a different objective """
+        if objective != self.objective:
+            to_remove = [obj for obj in self.objective_objects.values() if obj.idx >= 0]
+            if len(to_remove) > 0:
+                self.model.remove(to_remove)
+            self.objective_objects = {}
+            self.objective = objective
+
+    def objective_var(self, key):
+        """ auxiliary variable of the objective, added once per model """
+        var = self.objective_objects.get(key)
+        if var is None:
+            var = self.model.add_var(name=self.__new_name("z"), var_type="C")
+            self.objective_objects[key] = var
+        return var
+
+    def objective_constr(self, key, lin_expr):
+        """
+            auxiliary constraint of the objective, added once per model (it
+            must only use objective variables and goal node variables, which
+            stay in the model as long as their robot)
+        """
+        constr = self.objective_objects.get(key)
+        if constr is None:
+            constr = self.model.add_constr(lin_expr)
+            self.objective_objects[key] = constr
+        return constr
+
+    def update(self, robots, switchable_dependency_groups, fixed_dependency_groups, uncertainty_bound=0.0, release_times=None, H_prediction=None):
+        """
+            Brings the model up to date with the robots' progress
+            release_times ({node: time}) are additional lower bounds on the
+            nodes' completion times (they stay in the model, so only for
+            incremental=False)
+            H_prediction is the prediction horizon in nodes (None or NaN: the
+            whole plans)
+            Outputs:
+             - milp_variables : {"continuous": {robot ID: {node: variable}},
+                                 "binary": [variable per switchable group]}
+        """
+        H_prediction = prediction_horizon(H_prediction)
+        if (not self.incremental) or uncertainty_bound != self.uncertainty_bound or H_prediction != self.H_prediction:
+            self.reset()
+        self.uncertainty_bound = uncertainty_bound
+        self.H_prediction = H_prediction
+        m = self.model
+
+        # objects removed from the model at the end of the update
+        to_remove = []
+
+        # Define continuous variables and constraints
+        logger.debug("    - adding continuous constraints ...")
+        for robot in robots:
+            if H_prediction is None:
+                self.horizon_end[robot.robot_ID] = robot.plan_nodes[-1]
+            else:
+                self.horizon_end[robot.robot_ID] = robot.plan_nodes[min(robot.current_idx + H_prediction, len(robot.plan_nodes) - 1)]
+        anchors = None
+        links = ConstraintRows() # precedence constraints of the new robots
+        for robot in robots:
+            remaining_plan = robot.get_remaining_plan()
+            robot_variables = self.continuous.get(robot.robot_ID)
+            if robot_variables is None:
+                if anchors is None:
+                    anchors = self.__dependency_nodes(robots, switchable_dependency_groups, fixed_dependency_groups, release_times)
+                self.__add_robot(robot, remaining_plan, anchors, links)
+            else:
+                # drop the nodes the robot has finished
+                first_node = remaining_plan[0]
+                if first_node not in self.node_variables:
+                    self.__split(first_node, to_remove)
+                while next(iter(robot_variables)) != first_node:
+                    node = next(iter(robot_variables))
+                    del robot_variables[node]
+                    del self.anchor_of[node]
+                    del self.cumulative[node]
+                    if node in self.node_variables:
+                        to_remove.append(self.node_variables.pop(node))
+                        to_remove.extend(self.node_constrs.pop(node))
+                        del self.anchor_robot[node]
+                        self.links.pop(node, None)
 
-    # Define continuous variables and constraints
-    logger.debug("    - adding continuous constraints ...")
-    for robot in robots:
-        milp_variables["continuous"][robot.robot_ID] = {}
-        time_to_next_node = robot.get_remaining_times_to_next_node()
-        for idx, node in enumerate(robot.get_remaining_plan()):
-            milp_variables["continuous"][robot.robot_ID][node] = m.add_var(var_type="C")
             # add first node constraint
-            if idx == 0:
-                progress = 0.14 # change later in robot.object
-                left_over = (1-progress)
-                this_node = node
-                this_node_var = milp_variables["continuous"][robot.robot_ID][node]
-                m += this_node_var >= left_over*time_to_next_node[idx] + eps + uncertainty_bound
-                prev_node_var = this_node_var
-                prev_node = this_node
-                logger.debug("      {} >= {}".format(node, left_over*time_to_next_node[idx]))
+            first_node = remaining_plan[0]
+            if self.first_node.get(robot.robot_ID) != first_node:
+                self.node_variables[first_node].lb = first_node_bound(robot, uncertainty_bound)
+                self.first_node[robot.robot_ID] = first_node
+                logger.debug("      {} >= {}".format(first_node, self.node_variables[first_node].lb))
+        for (anchor, next_anchor), constr in links.emit(m):
+            self.__add_link(anchor, next_anchor, constr)
+        logger.debug("      {} precedence constraints".format(len(links)))
+
+        if release_times is not None:
+            for node, release_time in release_times.items():
+                if node not in self.node_variables:
+                    self.__split(node, to_remove)
+                node_variable = self.node_variables[node]
+                node_variable.lb = max(node_variable.lb, release_time)
+
+        # groups which just became switchable may need nodes within a run
+        for dependency_group in switchable_dependency_groups:
+            group_state = self.groups.get(dependency_group)
+            if group_state is None or group_state[0] is None:
+                for edge in dependency_group.edges + dependency_group.reverse_edges:
+                    for node in edge:
+                        if node not in self.node_variables:
+                            self.__split(node, to_remove)
+
+        if self.big_M == "tight":
+            lower_bound, upper_bound = self.time_bounds(robots)
+
+        # Define binary (dependency) variables and constraints
+        logger.debug("    - adding binary constraints ...")
+        dependencies = ConstraintRows() # dependency constraints of the (re)built groups
+        switchable_edges = [] # (group, tail, head) of the switchable constraints to add
+        binary_columns = []
+        signed_big_Ms = []    # +M for edges, -M for reverse edges
+        binary_variables = []
+        for dependency_group in switchable_dependency_groups:
+            if self.big_M == "tight":
+                big_Ms = [max(upper_bound[tail_node] - lower_bound[head_node] + eps, 0.0)
+                          for tail_node, head_node in dependency_group.edges + dependency_group.reverse_edges]
             else:
-                this_node_var = milp_variables["continuous"][robot.robot_ID][node]
-                m += this_node_var >= prev_node_var + time_to_next_node[idx] + eps + uncertainty_bound
-                logger.debug("      {} >= {} + {}".format(node, prev_node, time_to_next_node[idx]))
-                prev_node = node
-                prev_node_var = this_node_var
+                big_Ms = [M]*(len(dependency_group.edges) + len(dependency_group.reverse_edges))
 
-    # Define binary (dependency) variables and constraints
-    logger.debug("    - adding binary constraints ...")
-    for dependency_group in switchable_dependency_groups:
-        binary_variable = m.add_var(var_type="B")
-        milp_variables["binary"].append(binary_variable)
+            group_state = self.groups.get(dependency_group)
+            binary_variable = None
+            if group_state is not None and group_state[0] is not None:
+                # keep the constraints as long as their M is still large enough
+                if all(big_M <= group_big_M for big_M, group_big_M in zip(big_Ms, group_state[3])):
+                    binary_variables.append(group_state[0])
+                    continue
+                binary_variable = group_state[0]
+            if group_state is not None:
+                to_remove.extend(group_state[2])
 
-        # define constraints
-        for edge in dependency_group.edges:
-            tail_node = edge[0]
-            head_node = edge[1]
+            if binary_variable is None:
+                binary_variable = m.add_var(name=self.__new_name("b"), var_type="B")
+            switchable_edges.extend((dependency_group, tail_node, head_node)
+                                    for tail_node, head_node in dependency_group.edges + dependency_group.reverse_edges)
+            binary_columns.extend([binary_variable.idx]*len(big_Ms))
+            signed_big_Ms.extend(big_Ms[:len(dependency_group.edges)])
+            signed_big_Ms.extend(-big_M for big_M in big_Ms[len(dependency_group.edges):])
+            self.groups[dependency_group] = (binary_variable, None, [], big_Ms)
+            binary_variables.append(binary_variable)
+        # edges:         head - tail + M*b >= eps      (head >= tail + eps - b*M)
+        # reverse edges: head - tail - M*b >= eps - M  (head >= tail + eps - (1-b)*M)
+        signed_big_Ms = np.array(signed_big_Ms, dtype=float).reshape(-1, 1)
+        dependencies.add(np.column_stack([self.__edge_columns(switchable_edges, to_remove), binary_columns]),
+                         np.hstack([np.ones_like(signed_big_Ms), -np.ones_like(signed_big_Ms), signed_big_Ms]),
+                         eps + np.minimum(signed_big_Ms[:, 0], 0.0), switchable_edges)
 
-            tail_robot_id = int(tail_node.split("_")[1])
-            head_robot_id = int(head_node.split("_")[1])
+        logger.debug("    - adding fixed dependency constraints ...")
+        fixed_edges = [] # (group, tail, head) of the fixed constraints to add
+        for dependency_group in fixed_dependency_groups:
+            edges = self.__fixed_edges(dependency_group)
+            group_state = self.groups.get(dependency_group)
+            if group_state is not None and group_state[0] is None and group_state[1] == dependency_group.original_direction and group_state[3] == len(edges):
+                continue
+            if group_state is not None:
+                if group_state[0] is not None:
+                    to_remove.append(group_state[0])
+                to_remove.extend(group_state[2])
 
-            tail_variable = milp_variables["continuous"][tail_robot_id][tail_node]
-            head_variable = milp_variables["continuous"][head_robot_id][head_node]
+            # edges to finished nodes are no longer constraints
+            fixed_edges.extend((dependency_group, tail_node, head_node) for tail_node, head_node in edges
+                               if self.__is_remaining(tail_node) and self.__is_remaining(head_node))
+            # the horizons only move forward: the edge count identifies the edges
+            self.groups[dependency_group] = (None, dependency_group.original_direction, [], len(edges))
+        # head - tail >= eps
+        dependencies.add(self.__edge_columns(fixed_edges, to_remove), [1.0, -1.0], eps, fixed_edges)
 
-            m += head_variable >= tail_variable + eps - binary_variable*M
-            logger.debug("      {} >= {} - {}M".format(head_node, tail_node, binary_variable))
+        for (dependency_group, tail_node, head_node), constr in dependencies.emit(m):
+            self.groups[dependency_group][2].append(constr)
+            self.node_constrs[tail_node].append(constr)
+            self.node_constrs[head_node].append(constr)
+        logger.debug("      {} dependency constraints".format(len(dependencies)))
 
-        for edge in dependency_group.reverse_edges:
-            tail_node = edge[0]
-            head_node = edge[1]
+        # remove everything that is no longer part of the model (only once)
+        to_remove = list({id(obj): obj for obj in to_remove if obj.idx >= 0}.values())
+        if len(to_remove) > 0:
+            m.remove(to_remove)
 
-            tail_robot_id = int(tail_node.split("_")[1])
-            head_robot_id = int(head_node.split("_")[1])
+        milp_variables = {}
+        milp_variables["continuous"] = self.continuous
+        milp_variables["binary"] = binary_variables
+        return milp_variables
 
-            tail_variable = milp_variables["continuous"][tail_robot_id][tail_node]
-            head_variable = milp_variables["continuous"][head_robot_id][head_node]
+    def time_bounds(self, robots):
+        """
+            Bounds on the nodes' completion times of an earliest-time schedule
+            (each node as early as its constraints allow), valid for every
+            orientation of the dependency groups:
+             - lower : the node's lower bound, propagated along its robot's plan
+             - upper : the longest any path through the constraints can be
+                       (largest lower bound + every plan step + one dependency
+                       per node), minus the rest of the node's robot plan
+            For the objectives of solve_MILP, an optimal solution with earliest
+            times exists, so a switchable constraint with M >= upper(tail) -
+            lower(head) + eps does not cut it off.
+        """
+        lower_bound = {}
+        after = {}
+        plan_duration = 0.0
+        largest_lower_bound = 0.0
+        for robot in robots:
+            robot_nodes = [self.first_node[robot.robot_ID]]
+            while robot_nodes[-1] in self.links:
+                robot_nodes.append(self.links[robot_nodes[-1]][0])
+            prev_bound = None
+            for idx, node in enumerate(robot_nodes):
+                node_bound = self.node_variables[node].lb
+                largest_lower_bound = max(largest_lower_bound, node_bound)
+                if prev_bound is not None:
+                    node_bound = max(node_bound, prev_bound + self.cumulative[node] - self.cumulative[robot_nodes[idx-1]])
+                lower_bound[node] = node_bound
+                prev_bound = node_bound
+            for node in robot_nodes:
+                after[node] = self.cumulative[robot_nodes[-1]] - self.cumulative[node]
+            plan_duration += self.cumulative[robot_nodes[-1]] - self.cumulative[robot_nodes[0]]
 
-            m += head_variable >= tail_variable + eps - (1.0 - binary_variable)*M
-            logger.debug("      {} >= {} - (1-{})M".format(head_node, tail_node, binary_variable))
+        longest_path = largest_lower_bound + plan_duration + eps*len(lower_bound)
+        upper_bound = {node: longest_path - after[node] for node in after}
+        return lower_bound, upper_bound
 
-    logger.debug("    - adding fixed dependency constraints ...")
-    for dependency_group in fixed_dependency_groups:
+    def current_orientation_start(self, robots, switchable_dependency_groups, release_times=None):
+        """
+            Initial feasible solution (MIP start) for the last update: every
+            switchable group keeps the direction of the previous step
+            (original_direction), and every node gets the earliest completion
+            time this orientation allows (longest path through the precedence
+            and dependency constraints). The auxiliary variables of the
+            objective (e.g. the makespan z of "max") get the smallest value
+            their constraints allow. None if the orientation has a cycle.
+        """
+        start_time = earliest_completion_times(robots, self.groups, self.uncertainty_bound, release_times=release_times)
+        if start_time is None:
+            logger.warning("   - no MIP start: current orientation has a cycle")
+            return None
+
+        start = [(var, start_time[node]) for node, var in self.node_variables.items()]
+        for dependency_group in switchable_dependency_groups:
+            binary_variable = self.groups[dependency_group][0]
+            start.append((binary_variable, 0.0 if dependency_group.original_direction else 1.0))
+        return start + self.__objective_start(start)
+
+    def __objective_start(self, start):
+        """
+            start values of the objective variables: the smallest value each
+            objective constraint (one objective variable, the other variables
+            in start) allows
+        """
+        objective_vars = {obj.idx: obj for obj in self.objective_objects.values() if isinstance(obj, Var) and obj.idx >= 0}
+        values = {var.idx: value for var, value in start} # Var.__eq__ builds constraints: key by index
+        objective_values = {idx: max(var.lb, 0.0) for idx, var in objective_vars.items()}
+        for constr in self.objective_objects.values():
+            if isinstance(constr, Var) or constr.idx < 0:
+                continue
+            lin_expr = constr.expr
+            residual = lin_expr.const
+            objective_terms = []
+            for var, coeff in lin_expr.expr.items():
+                if var.idx in objective_vars:
+                    objective_terms.append((var.idx, coeff))
+                else:
+                    residual += coeff*values[var.idx]
+            if len(objective_terms) != 1:
+                continue
+            idx, coeff = objective_terms[0]
+            # residual + coeff*z <= 0 (or >= 0): bound on z if it pushes z up
+            if (lin_expr.sense == "<" and coeff < 0) or (lin_expr.sense == ">" and coeff > 0):
+                objective_values[idx] = max(objective_values[idx], -residual/coeff)
+        return [(objective_vars[idx], value) for idx, value in objective_values.items()]
+
+    def completion_times(self):
+        """ {node: completion time} of all remaining nodes in the solution of the model """
+        return {node: self.node_variables[anchor].x + self.node_offset(node) for node, anchor in self.anchor_of.items()}
+
+    def node_offset(self, node):
+        """ time of node minus the value of its variable (the anchor's) """
+        return self.cumulative[node] - self.cumulative[self.anchor_of[node]]
+
+    def __fixed_edges(self, dependency_group):
+        """ edges of a fixed group in its current direction, within the prediction horizon """
         if dependency_group.original_direction:
-            for edge in dependency_group.edges:
-                tail_node = edge[0]
-                head_node = edge[1]
-
-                tail_robot_id = int(tail_node.split("_")[1])
-                head_robot_id = int(head_node.split("_")[1])
-                try:
-                    tail_variable = milp_variables["continuous"][tail_robot_id][tail_node]
-                    head_variable = milp_variables["continuous"][head_robot_id][head_node]
-
-                    m += head_variable >= tail_variable + eps
-                    logger.debug("      {} >= {} ".format(head_node, tail_node))
-                except KeyError:
-                    pass
+            edges = dependency_group.edges
+            tail_robot, head_robot = dependency_group.robot_blocking, dependency_group.robot_blocked
         else:
-            for edge in dependency_group.reverse_edges:
-                tail_node = edge[0]
-                head_node = edge[1]
+            edges = dependency_group.reverse_edges
+            tail_robot, head_robot = dependency_group.robot_blocked, dependency_group.robot_blocking
+        if self.H_prediction is None:
+            return edges
+        tail_end = self.horizon_end.get(tail_robot, np.inf)
+        head_end = self.horizon_end.get(head_robot, np.inf)
+        return [edge for edge in edges if edge[0] <= tail_end and edge[1] <= head_end]
 
-                tail_robot_id = int(tail_node.split("_")[1])
-                head_robot_id = int(head_node.split("_")[1])
-                try:
-                    tail_variable = milp_variables["continuous"][tail_robot_id][tail_node]
-                    head_variable = milp_variables["continuous"][head_robot_id][head_node]
+    def __dependency_nodes(self, robots, switchable_dependency_groups, fixed_dependency_groups, release_times):
+        """
+            nodes which need their own variable besides the first and goal
+            nodes: the nodes of the switchable groups' edges, of the fixed
+            groups' edges in their current direction (unless they point from
+            or to a finished node or lie beyond the prediction horizon) and
+            of the release times; nodes needed later on are split off their
+            run by __split
+        """
+        if not self.compress:
+            return None
+        remaining = set(node for robot in robots for node in robot.get_remaining_plan())
+        anchors = set()
+        for dependency_group in switchable_dependency_groups:
+            for edge in dependency_group.edges + dependency_group.reverse_edges:
+                anchors.update(edge)
+        for dependency_group in fixed_dependency_groups:
+            for edge in self.__fixed_edges(dependency_group):
+                if edge[0] in remaining and edge[1] in remaining:
+                    anchors.update(edge)
+        if release_times is not None:
+            anchors.update(release_times)
+        return anchors
 
-                    m += head_variable >= tail_variable + eps
-                    logger.debug("      {} >= {} ".format(head_node, tail_node))
-                except KeyError:
-                    pass
+    def __add_robot(self, robot, remaining_plan, anchors, links):
+        """
+            variables (anchors) of a robot's remaining plan, its precedence
+            constraints go to links (ConstraintRows)
+        """
+        robot_variables = {}
+        self.continuous[robot.robot_ID] = robot_variables
+        cumulative = 0.0
+        robot_anchors = []
+        for idx, node in enumerate(remaining_plan):
+            if idx > 0:
+                cumulative += robot.time_to_next_node[robot.current_idx+idx] + eps + self.uncertainty_bound
+            self.cumulative[node] = cumulative
+            if anchors is None or idx == 0 or idx == len(remaining_plan) - 1 or node in anchors:
+                self.__add_anchor(node, robot.robot_ID)
+                robot_anchors.append(node)
+            self.anchor_of[node] = robot_anchors[-1]
+            robot_variables[node] = self.node_variables[robot_anchors[-1]]
 
-    logger.info(" 3 define cost function and solve MILP ...")
-    logger.info("   - using solver: {}".format(m.solver_name))
-    cont_var_count = sum([len(milp_variables["continuous"][robot_vars]) for robot_vars in milp_variables["continuous"]])
-    binary_var_count = len(milp_variables["binary"])
-    logger.info("   - cont.  variables: {}".format(cont_var_count))
-    logger.info("   - binary variables: {}".format(binary_var_count))
+        # next anchor - anchor >= summed duration of the run
+        columns = np.array([self.node_variables[node].idx for node in robot_anchors], dtype=np.int64)
+        durations = np.diff([self.cumulative[node] for node in robot_anchors])
+        links.add(np.column_stack([columns[1:], columns[:-1]]), [1.0, -1.0], durations,
+                  list(zip(robot_anchors[:-1], robot_anchors[1:])))
 
-    # define cost function
-    # get the goal nodes
-    goal_node_variables = []
-    for robot in robots:
-        robot_id = int(robot.robot_ID)
-        node_name = robot.get_goal_node()
-        goal_node = milp_variables["continuous"][robot_id][node_name]
-        goal_node_variables.append(goal_node)
+    def __add_anchor(self, node, robot_ID):
+        self.node_variables[node] = self.model.add_var(name="t_" + str(node), var_type="C")
+        self.node_constrs[node] = []
+        self.anchor_robot[node] = robot_ID
+
+    def __link(self, anchor, next_anchor):
+        """ adds the precedence constraint of consecutive anchors """
+        duration = self.cumulative[next_anchor] - self.cumulative[anchor]
+        self.__add_link(anchor, next_anchor, self.model.add_constr(self.node_variables[next_anchor] >= self.node_variables[anchor] + duration))
+        logger.debug("      {} >= {} + {}".format(next_anchor, anchor, duration))
+
+    def __add_link(self, anchor, next_anchor, constr):
+        self.node_constrs[anchor].append(constr)
+        self.node_constrs[next_anchor].append(constr)
+        self.links[anchor] = (next_anchor, constr)
+
+    def __split(self, node, to_remove):
+        """ gives node (within a run) its own variable, splitting the run of its anchor """
+        anchor = self.anchor_of[node]
+        robot_ID = self.anchor_robot[anchor]
+        next_anchor, constr = self.links[anchor]
+        to_remove.append(constr)
+        self.node_constrs[anchor].remove(constr)
+        self.node_constrs[next_anchor].remove(constr)
+        self.__add_anchor(node, robot_ID)
+        self.__link(anchor, node)
+        self.__link(node, next_anchor)
+        robot_variables = self.continuous[robot_ID]
+        run_node = node # node IDs are consecutive along a robot's plan
+        while run_node != next_anchor:
+            self.anchor_of[run_node] = node
+            robot_variables[run_node] = self.node_variables[node]
+            run_node += 1
+
+    def __is_remaining(self, node):
+        return node in self.anchor_of
 
-    # get all the continuous nodes
-    node_variables = []
+    def __edge_columns(self, edges, to_remove):
+        """
+            [edges, 2] columns (head, tail) of the (group, tail, head) edges,
+            splitting runs where an edge needs a node
+        """
+        for _, tail_node, head_node in edges:
+            for node in (tail_node, head_node):
+                if node not in self.node_variables:
+                    self.__split(node, to_remove)
+        return np.array([(self.node_variables[head_node].idx, self.node_variables[tail_node].idx)
+                         for _, tail_node, head_node in edges], dtype=np.int64).reshape(-1, 2)
+
+def define_objective(formulation, robots, milp_variables, cost_func):
+    """
+        Sets the objective cost_func (a name or an Objective, see
+        functions/objectives.py) of the updated MILPFormulation
+    """
+    objective = make_objective(cost_func)
+    formulation.use_objective(objective)
+    cost = OBJECTIVES[objective.name](formulation, robots, milp_variables, objective)
+    if objective.switching_penalty > 0 and len(milp_variables["binary"]) > 0:
+        # to discourage switching if NOT ABSOLUTELY NECESSARY
+        cost = cost + objective.switching_penalty*xsum(milp_variables["binary"])
+    formulation.model.objective = minimize(cost)
+    return objective
+
+def determine_components(robots, switchable_dependency_groups):
+    """
+        Partitions the robots into the connected components of the robot
+        interaction graph, in which two robots are linked if they share a
+        switchable dependency group
+        Outputs:
+         - components : list of (robot IDs, switchable dependency groups) of
+                        the components with at least one switchable group
+    """
+    parent = {robot.robot_ID: robot.robot_ID for robot in robots}
+    def find(robot_ID):
+        while parent[robot_ID] != robot_ID:
+            parent[robot_ID] = parent[parent[robot_ID]]
+            robot_ID = parent[robot_ID]
+        return robot_ID
+
+    for dependency_group in switchable_dependency_groups:
+        root_blocking = find(dependency_group.robot_blocking)
+        root_blocked = find(dependency_group.robot_blocked)
+        if root_blocking != root_blocked:
+            parent[root_blocked] = root_blocking
+
+    components = {}
+    for dependency_group in switchable_dependency_groups:
+        root = find(dependency_group.robot_blocking)
+        if root not in components:
+            components[root] = ([], [])
+        components[root][1].append(dependency_group)
     for robot in robots:
-        robot_id = int(robot.robot_ID)
-        for node in milp_variables["continuous"][robot_id]:
-            node_variables.append(node)
-
-
-    # DIFFERENT OBJECTIVE FUNCTIONS
-    #
-    # 1) Makespan optimization min max(t_g(v_i^k)) for all v_i^k \in \mathcal{V}_{ADG}
-    OBJECTIVE_FUNC = cost_func # cumulative, max, binary_penalty 
-    if OBJECTIVE_FUNC == "max":
-        z = m.add_var('z')
-        m.objective = minimize(z)
-
-        for goal_node in goal_node_variables:
-            m += goal_node <= z
-
-    if OBJECTIVE_FUNC == "cumulative":
-        m.objective = minimize(xsum(goal_node_variables))
-
-    if OBJECTIVE_FUNC == "bp_kb_10":
-        # Add a cost for binary variables = 1! (To discourage switching if NOT ABSOLUTELY NECESSARY)
-        if binary_var_count > 0:
-            # c = np.array(binary_var_count*[100000.0])
-            # logger.info("   - c: {}".format(c))
-            # logger.info("   - bin var's: {}".format(milp_variables["binary"]))
-            bin_vars = milp_variables["binary"]
-            K_d = 10
-            I = range(binary_var_count)
-            m.objective = minimize(xsum(goal_node_variables) + xsum(bin_vars[i]*(K_d) for i in I))
-        else:
-            # If not binary variables:
-            m.objective = minimize(xsum(goal_node_variables))
-    
-    if OBJECTIVE_FUNC == "bp_kb_2":
-        # Add a cost for binary variables = 1! (To discourage switching if NOT ABSOLUTELY NECESSARY)
-        if binary_var_count > 0:
-            # c = np.array(binary_var_count*[100000.0])
-            # logger.info("   - c: {}".format(c))
-            # logger.info("   - bin var's: {}".format(milp_variables["binary"]))
-            bin_vars = milp_variables["binary"]
-            K_d = 2
-            I = range(binary_var_count)
-            m.objective = minimize(xsum(goal_node_variables) + xsum(bin_vars[i]*(K_d) for i in I))
-        else:
-            # If not binary variables:
-            m.objective = minimize(xsum(goal_node_variables))
-    
-    if OBJECTIVE_FUNC == "bp_kb_5":
-        # Add a cost for binary variables = 1! (To discourage switching if NOT ABSOLUTELY NECESSARY)
-        if binary_var_count > 0:
-            # c = np.array(binary_var_count*[100000.0])
-            # logger.info("   - c: {}".format(c))
-            # logger.info("   - bin var's: {}".format(milp_variables["binary"]))
-            bin_vars = milp_variables["binary"]
-            K_d = 5
-            I = range(binary_var_count)
-            m.objective = minimize(xsum(goal_node_variables) + xsum(bin_vars[i]*(K_d) for i in I))
-        else:
-            # If not binary variables:
-            m.objective = minimize(xsum(goal_node_variables))
-    
-    if OBJECTIVE_FUNC == "bp_kb_1":
-        # Add a cost for binary variables = 1! (To discourage switching if NOT ABSOLUTELY NECESSARY)
-        if binary_var_count > 0:
-            # c = np.array(binary_var_count*[100000.0])
-            # logger.info("   - c: {}".format(c))
-            # logger.info("   - bin var's: {}".format(milp_variables["binary"]))
-            bin_vars = milp_variables["binary"]
-            K_d = 1
-            I = range(binary_var_count)
-            m.objective = minimize(xsum(goal_node_variables) + xsum(bin_vars[i]*(K_d) for i in I))
+        root = find(robot.robot_ID)
+        if root in components:
+            components[root][0].append(robot.robot_ID)
+    return list(components.values())
+
+def solve_component(robots, switchable_dependency_groups, fixed_dependency_groups, release_times, uncertainty_bound, cost_func, solver_name, warm_start, max_mip_gap, big_M="fixed", H_prediction=None, time_budget=None):
+    """
+        Builds and solves the ordering MILP of one component from scratch
+        (picklable inputs only, such that it can run in a worker process)
+        Outputs:
+         - res : solver status
+         - binary_values : value per switchable group, None if no solution
+         - solver_time : solver (process) time
+    """
+    formulation = MILPFormulation(Model(solver_name=solver_name), incremental=False, big_M=big_M)
+    milp_variables = formulation.update(robots, switchable_dependency_groups, fixed_dependency_groups, uncertainty_bound, release_times, H_prediction)
+    m = formulation.model
+    define_objective(formulation, robots, milp_variables, cost_func)
+
+    m.verbose = 0
+    if warm_start:
+        initial_solution = formulation.current_orientation_start(robots, switchable_dependency_groups, release_times)
+        if initial_solution is not None:
+            m.start = initial_solution
+    if max_mip_gap is not None:
+        m.max_mip_gap = max_mip_gap
+
+    start = time.process_time()
+    res = m.optimize(max_seconds=MAX_SOLVE_TIME if time_budget is None else time_budget)
+    solver_time = time.process_time() - start
+    if m.num_solutions == 0:
+        return res, None, solver_time
+    return res, [binary_variable.x for binary_variable in milp_variables["binary"]], solver_time
+
+def solve_MILP_components(robots, switchable_dependency_groups, fixed_dependency_groups, uncertainty_bound, cost_func, solver_name, warm_start=True, max_mip_gap=None, pool=None, big_M="fixed", H_prediction=None, deadline=None):
+    """
+        Solves one MILP per connected component of the robot interaction graph
+        (determine_components) instead of one MILP for all robots
+
+        The robots outside a component enter its MILP as release times: a
+        fixed dependency edge from an outside robot bounds the head node by
+        the tail's earliest completion time under the current orientation.
+        The components are therefore solved as if the outside robots kept
+        their current schedule.
+
+        With a pool (concurrent.futures.Executor), the components are solved
+        in parallel. With a deadline (time.perf_counter() value), every
+        component gets the time left until then.
+        Outputs:
+         - res : OPTIMAL if every component was solved to optimality, else
+                 the status of the first component which was not
+         - binary_values : value per switchable group, None if a component
+                           has no solution or the combined orientation has
+                           a cycle
+         - solver_time : sum of the components' solver times
+    """
+    components = determine_components(robots, switchable_dependency_groups)
+    logger.info("   - components: {} (robots: {})".format(len(components), [len(robot_IDs) for robot_IDs, _ in components]))
+
+    completion_times = earliest_completion_times(robots, switchable_dependency_groups + fixed_dependency_groups, uncertainty_bound)
+    if completion_times is None:
+        logger.warning("   - current orientation has a cycle: no release times")
+        return None, None, 0.0
+
+    robots_by_ID = {robot.robot_ID: robot for robot in robots}
+    solves = []
+    for robot_IDs, component_groups in components:
+        component_robot_IDs = set(robot_IDs)
+        component_fixed_groups = []
+        release_times = {}
+        for dependency_group in fixed_dependency_groups:
+            if dependency_group.robot_blocking in component_robot_IDs and dependency_group.robot_blocked in component_robot_IDs:
+                component_fixed_groups.append(dependency_group)
+                continue
+            if dependency_group.original_direction:
+                edges = dependency_group.edges
+                head_robot_ID = dependency_group.robot_blocked
+            else:
+                edges = dependency_group.reverse_edges
+                head_robot_ID = dependency_group.robot_blocking
+            if head_robot_ID not in component_robot_IDs:
+                continue
+            for tail_node, head_node in edges:
+                if tail_node in completion_times and head_node in completion_times:
+                    release_times[head_node] = max(release_times.get(head_node, 0.0), completion_times[tail_node] + eps)
+
+        time_budget = None
+        if deadline is not None:
+            time_budget = max(deadline - time.perf_counter(), MIN_SOLVE_TIME)
+        args = ([robots_by_ID[robot_ID] for robot_ID in robot_IDs], component_groups, component_fixed_groups,
+                release_times, uncertainty_bound, cost_func, solver_name, warm_start, max_mip_gap, big_M, H_prediction, time_budget)
+        if pool is None:
+            solves.append(solve_component(*args))
         else:
-            # If not binary variables:
-            m.objective = minimize(xsum(goal_node_variables))
+            solves.append(pool.submit(solve_component, *args))
+
+    res = OptimizationStatus.OPTIMAL
+    solver_time = 0.0
+    directions = {}
+    for (robot_IDs, component_groups), component_solve in zip(components, solves):
+        if pool is not None:
+            component_solve = component_solve.result()
+        component_res, component_values, component_time = component_solve
+        solver_time += component_time
+        if component_values is None:
+            logger.warning("   - component of robots {} has no solution: {}".format(robot_IDs, component_res))
+            return component_res, None, solver_time
+        if res == OptimizationStatus.OPTIMAL:
+            res = component_res
+        for dependency_group, value in zip(component_groups, component_values):
+            directions[dependency_group] = value < 0.5
+
+    # the components do not see each other's decisions
+    if earliest_completion_times(robots, switchable_dependency_groups + fixed_dependency_groups, uncertainty_bound, directions=directions) is None:
+        logger.warning("   - combined orientation of the components has a cycle")
+        return res, None, solver_time
+
+    binary_values = [0.0 if directions[dependency_group] else 1.0 for dependency_group in switchable_dependency_groups]
+    return res, binary_values, solver_time
+
+class MILPCache(object):
+    """
+        Remembers the inputs of the last MILP solve of solve_MILP. The solve is
+        skipped (and the current ordering kept) when:
+         - there is no switchable dependency group, or
+         - the switchable groups, their orientation and the progress of
+           their robots relative to the groups are the same as after the
+           last solve
+        Robots which are not part of a switchable group do not enter the
+        fingerprint, so their progress alone never triggers a new solve.
+        The MILP has no delay input of its own: the delays applied to the
+        robots (robot_IDs_to_delay of the delay models) reach it only
+        through the robots' progress.
+    """
+    def __init__(self):
+        self.fingerprint = None
+        self.status = OptimizationStatus.OPTIMAL # status of the last solve
+        self.step_hits = [] # per time step: 1 if the solve was skipped, else 0
+
+    def hit_count(self):
+        return sum(self.step_hits)
+
+    def miss_count(self):
+        return len(self.step_hits) - sum(self.step_hits)
+
+    def input_fingerprint(self, robots, switchable_dependency_groups, nodes, objective, uncertainty_bound):
+        current_idx = {robot.robot_ID: robot.current_idx for robot in robots}
+        groups = []
+        for dependency_group in switchable_dependency_groups:
+            tail_idx = nodes.index[dependency_group.first_edge_tail]
+            head_idx = nodes.index[dependency_group.first_edge_head]
+            groups.append((id(dependency_group), dependency_group.original_direction,
+                           current_idx[dependency_group.robot_blocking] - tail_idx,
+                           current_idx[dependency_group.robot_blocked] - head_idx))
+        return (tuple(groups), objective, uncertainty_bound)
+
+class SolveOutcomes(object):
+    """ outcome (see OUTCOMES) of the ordering step per time step of solve_MILP """
+    def __init__(self):
+        self.steps = []
+
+    def record(self, outcome):
+        if outcome not in OUTCOMES:
+            raise ValueError("unknown outcome '{}', expected one of {}".format(outcome, OUTCOMES))
+        self.steps.append(outcome)
+
+    def count(self, outcome):
+        return self.steps.count(outcome)
+
+    def counts(self):
+        return {outcome: self.count(outcome) for outcome in OUTCOMES}
+
+def solve_full_MILP(robots, switchable_dependency_groups, fixed_dependency_groups, m, uncertainty_bound, cost_func, warm_start=True, max_mip_gap=None, big_M="fixed", H_prediction=None, deadline=None):
+    """
+        Formulates (or updates) and solves the MILP of all robots, with the
+        time left until deadline (time.perf_counter() value) if one is given
+        Outputs:
+         - res : solver status (None if the solver failed)
+         - binary_values : value per switchable group of the best solution
+                           found (None if there is none)
+         - solver_time : solver (process) time
+    """
+    logger.info(" 2 formulating MILP problem ...")
 
-    if OBJECTIVE_FUNC == "greedy":
-        m.objective = minimize(xsum(node_variables))
-        
+    if isinstance(m, MILPFormulation):
+        formulation = m
+    else:
+        # a plain python-mip model (cleared by the caller) is built from scratch
+        formulation = MILPFormulation(m, incremental=False, big_M=big_M)
+    milp_variables = formulation.update(robots, switchable_dependency_groups, fixed_dependency_groups, uncertainty_bound, H_prediction=H_prediction)
+    m = formulation.model
 
+    logger.info(" 3 define cost function and solve MILP ...")
+    logger.info("   - using solver: {}".format(m.solver_name))
+    node_count = sum([len(milp_variables["continuous"][robot_vars]) for robot_vars in milp_variables["continuous"]])
+    binary_var_count = len(milp_variables["binary"])
+    logger.info("   - cont.  variables: {} (nodes: {})".format(len(formulation.node_variables), node_count))
+    logger.info("   - binary variables: {}".format(binary_var_count))
+
+    # define cost function
+    define_objective(formulation, robots, milp_variables, cost_func)
 
     # solve the MILP
     m.verbose = 0
 
+    # initial feasible solution: the ordering of the previous step - Ch 5.4 of MIP manual
+    if warm_start:
+        initial_solution = formulation.current_orientation_start(robots, switchable_dependency_groups)
+        if initial_solution is not None:
+            m.start = initial_solution
+    if max_mip_gap is not None:
+        m.max_mip_gap = max_mip_gap
+
     ### SOLVE THE MILP
+    max_seconds = MAX_SOLVE_TIME
+    if deadline is not None:
+        max_seconds = deadline - time.perf_counter()
+        if max_seconds < MIN_SOLVE_TIME:
+            logger.warning("   - no time left to solve the MILP")
+            return OptimizationStatus.NO_SOLUTION_FOUND, None, 0.0
     start = time.process_time()
-    opt_success = True
     try:
-        res = m.optimize(max_seconds=600) # max 10 minute solve time
-        logger.info("   -> optimized cost: {}".format(m.objective_value));
-        logger.info("   solver status: {}".format(res))
-        solver_time = time.process_time() - start
-        logger.info("   solver time: {} s".format(solver_time))
-        logger.info(" 4 results of MILP solution:")
-        logger.debug("    Result: {}".format(res))
-
-        for binary_variable in milp_variables["binary"]:
-            logger.debug("    {} : {}".format(binary_variable, binary_variable.x))
-    except:
-        # The optimization failed and returned an infeasible solution?
-        opt_success = False
-        return None, None
+        res = m.optimize(max_seconds=max_seconds)
+    except Exception as exc:
+        logger.error("   solver failed: {}".format(exc))
+        return None, None, time.process_time() - start
+    solver_time = time.process_time() - start
+    logger.info("   solver status: {}".format(res))
+    logger.info("   solver time: {} s".format(solver_time))
+    if m.num_solutions == 0:
+        return res, None, solver_time
+    logger.info("   -> optimized cost: {}".format(m.objective_value))
+    logger.info(" 4 results of MILP solution:")
 
-    logger.info(" 5 update the ADG based on new optimal solution")
+    binary_values = []
+    for binary_variable in milp_variables["binary"]:
+        logger.debug("    {} : {}".format(binary_variable, binary_variable.x))
+        binary_values.append(float(binary_variable.x))
+    if res != OptimizationStatus.OPTIMAL:
+        binary_values = [float(round(value)) for value in binary_values] # incumbent: integral up to the tolerance
 
-    # remove all dependencies (all Type 2 edges)
-    edges_all = ADG.edges(data=True)
-    edges_type_2 = [edge for edge in edges_all if edge[2]["type"] == 2]
+    return res, binary_values, solver_time
 
-    logger.debug("    edges  (all)  : {}".format(edges_all))
-    logger.debug("    edges (Type 2): {}".format(edges_type_2))
 
-    logger.debug("    ADG Edges 0: {}".format(ADG.edges(data=True)))
-    ADG.remove_edges_from(edges_type_2)
-    logger.debug("    ADG Edges 1: {}".format(ADG.edges(data=True)))
+def update_ADG_ordering(ADG, switchable_dependency_groups, fixed_dependency_groups, binary_values, cycle_check=None):
+    """
+        Replaces the Type 2 edges of the ADG by the edges of the dependency
+        groups in their new direction: binary value 1 (reversed) or 0
+        (original) per switchable group, original_direction for the fixed
+        groups. Only the edges which change are removed/added, through the
+        ADGCycleCheck if one is given.
+    """
+    new_edges_type_2 = {}
 
     # add fixed dependency groups
     for dependency_group in fixed_dependency_groups:
         if dependency_group.original_direction:
-            for edge in dependency_group.edges:
-                ADG.add_edge(edge[0], edge[1], type=2)
+            new_edges_type_2.update(dict.fromkeys(dependency_group.edges))
         else:
-            for edge in dependency_group.reverse_edges:
-                ADG.add_edge(edge[0], edge[1], type=2)
-        # ADG.add_edges_from(dependency_group.edges)
+            new_edges_type_2.update(dict.fromkeys(dependency_group.reverse_edges))
 
     # add active switchable_dependency_groups based on MILP results
     dependency_idx = 0
     binary_true_count = 0
     binary_false_count = 0
     for dependency_group in switchable_dependency_groups:
-        if milp_variables["binary"][dependency_idx].x > 0.999999999999999:
+        if binary_values[dependency_idx] > 0.999999999999999:
             binary_true_count += 1
             dependency_group.original_direction = False
-            for edge in dependency_group.reverse_edges:
-                ADG.add_edge(edge[0], edge[1], type=2)
-        elif milp_variables["binary"][dependency_idx].x < 0.00001:
+            new_edges_type_2.update(dict.fromkeys(dependency_group.reverse_edges))
+        elif binary_values[dependency_idx] < 0.00001:
             dependency_group.original_direction = True
             binary_false_count += 1
-            for edge in dependency_group.edges:
-                ADG.add_edge(edge[0], edge[1], type=2)
+            new_edges_type_2.update(dict.fromkeys(dependency_group.edges))
         else:
             logger.error("Binary variable is NOT binary!")
         dependency_idx += 1
 
-    logger.debug("    ADG Edges 2: {}".format(ADG.edges(data=True)))
+    # remove the dependencies (Type 2 edges) which are not part of the new ordering
+    edges_type_2 = [(edge[0], edge[1]) for edge in ADG.edges(data="type") if edge[2] == 2]
+    removed_edges = [edge for edge in edges_type_2 if edge not in new_edges_type_2]
+    edges_type_2 = set(edges_type_2)
+    added_edges = [edge for edge in new_edges_type_2 if edge not in edges_type_2]
+    logger.debug("    removed Type 2 edges: {}".format(removed_edges))
+    logger.debug("    added Type 2 edges  : {}".format(added_edges))
 
-    ADG_reverse = ADG.reverse(copy=False)
+    if cycle_check is None:
+        ADG.remove_edges_from(removed_edges)
+        ADG.add_edges_from(added_edges, type=2)
+    else:
+        for edge in removed_edges:
+            cycle_check.remove_edge(edge[0], edge[1])
+        for edge in added_edges:
+            cycle_check.add_edge(edge[0], edge[1], type=2)
 
-    logger.info("   - set variables     : {} / {}".format(binary_true_count, binary_var_count))
-    logger.info("   - cleared variables : {} / {}".format(binary_false_count, binary_var_count))
+    logger.info("   - set variables     : {} / {}".format(binary_true_count, len(binary_values)))
+    logger.info("   - cleared variables : {} / {}".format(binary_false_count, len(binary_values)))
     logger.info(" done! ")
 
+def solve_MILP(robots, dependency_groups, ADG, ADG_reverse, H_control, H_prediction, m, pl_opt, run=True, uncertainty_bound=0.0, cost_func="cumulative", warm_start=True, max_mip_gap=None, cache=None, decompose=False, pool=None, big_M="fixed", cycle_check=None, time_budget=None, outcomes=None):
+    """
+        Formulate and solve an MILP which uses:
+         - each robot's current location
+         - inter-robot dependencies represented by ADG
+        to determine if the ordering should be revised
+
+        If the ordering needs to be revised, the ADG is updated accordingly
+
+        Dependencies can only be switched if none of the robots have reached the
+        nodes linking these dependencies
+
+        With warm_start, the solver starts from the previous step's ordering.
+        max_mip_gap (relative) stops the search early once the incumbent is
+        that close to the best bound.
+
+        cost_func is an objective name or an Objective (functions/objectives.py).
+
+        With a MILPCache, solves whose inputs did not change are skipped.
+
+        With decompose, one MILP is solved per connected component of the
+        robot interaction graph (solve_MILP_components), in parallel if a
+        pool is given. If that fails, the full MILP is solved instead.
+
+        big_M ("fixed" or "tight", see MILPFormulation) applies to models built
+        from scratch; a MILPFormulation keeps its own mode.
+
+        With an ADGCycleCheck (functions/adg_cycle_check.py), the changed ADG
+        edges go through it, such that it can report a cycle.
+
+        With a prediction horizon H_prediction (nodes, None or NaN: the whole
+        plans), the MILP only models the fixed dependencies within it (see
+        MILPFormulation). If the orientation it finds closes a cycle through
+        dependencies beyond the horizon, the current ordering is kept.
+
+        time_budget [s] bounds the whole step (formulation and solve): once it
+        is used up, the best solution found so far is used, or the current
+        ordering (which is acyclic) is kept if there is none. The same
+        fallback applies if the solver fails. The returned status stays the
+        solver's (None if it failed); only SolveOutcomes records the outcome
+        of the step (see OUTCOMES).
+    """
+    deadline = None if time_budget is None else time.perf_counter() + time_budget
+    objective = make_objective(cost_func)
+    if not run:
+        logger.info(" solve_MILP: NOT running optimization - original behavior")
+        return None, 0
+    else:
+        logger.info(" solve_MILP: Formulating and solving MILP ...")
+
+    """ 1 - Determine which edges can be reversed based on robot's current position """
+    nodes = ADG.graph["nodes"]
+    switchable_dependency_groups, fixed_dependency_groups = determine_switchable_groups(robots, dependency_groups, nodes, H_control,
+                                                                                         ADG.graph.get("group_thresholds"))
+
+    if cache is not None:
+        fingerprint = cache.input_fingerprint(robots, switchable_dependency_groups, nodes, objective, uncertainty_bound)
+        if len(switchable_dependency_groups) == 0 or fingerprint == cache.fingerprint:
+            logger.info("   - switchable dependency groups unchanged: keeping the current ordering")
+            cache.step_hits.append(1)
+            if outcomes is not None:
+                outcomes.record("skipped")
+            return cache.status, 0.0
+        cache.step_hits.append(0)
+
+    if isinstance(m, MILPFormulation):
+        solver_name = m.model.solver_name
+        big_M = m.big_M
+    else:
+        solver_name = m.solver_name
+
+    binary_values = None
+    if decompose:
+        logger.info(" 2 formulating and solving MILP per component ...")
+        res, binary_values, solver_time = solve_MILP_components(robots, switchable_dependency_groups, fixed_dependency_groups,
+                                                                uncertainty_bound, objective, solver_name, warm_start, max_mip_gap, pool, big_M, H_prediction, deadline)
+        logger.info("   solver status: {}".format(res))
+        logger.info("   solver time: {} s".format(solver_time))
+        if binary_values is None:
+            logger.warning("   - decomposition failed: solving the full MILP")
+
+    if binary_values is None:
+        component_time = solver_time if decompose else 0.0
+        res, binary_values, solver_time = solve_full_MILP(robots, switchable_dependency_groups, fixed_dependency_groups, m,
+                                                          uncertainty_bound, objective, warm_start, max_mip_gap, big_M, H_prediction, deadline)
+        solver_time += component_time
+
+    outcome = "optimal" if res == OptimizationStatus.OPTIMAL else "incumbent"
+    if binary_values is None:
+        logger.warning("   - no solution ({}): keeping the current ordering".format(res))
+        outcome = "fallback"
+    elif prediction_horizon(H_prediction) is not None:
+        directions = {dependency_group: value < 0.5 for dependency_group, value in zip(switchable_dependency_groups, binary_values)}
+        if earliest_completion_times(robots, switchable_dependency_groups + fixed_dependency_groups, uncertainty_bound, directions=directions) is None:
+            logger.warning("   - orientation has a cycle beyond the prediction horizon: keeping the current ordering")
+            outcome = "fallback"
+    if outcome == "fallback":
+        binary_values = [0.0 if dependency_group.original_direction else 1.0 for dependency_group in switchable_dependency_groups]
+    if outcomes is not None:
+        outcomes.record(outcome)
+
+    logger.info(" 5 update the ADG based on new optimal solution")
+    update_ADG_ordering(ADG, switchable_dependency_groups, fixed_dependency_groups, binary_values, cycle_check)
+
+    if cache is not None and outcome != "fallback": # retry the solve next step
+        # with the orientation of the solution
+        cache.fingerprint = cache.input_fingerprint(robots, switchable_dependency_groups, nodes, objective, uncertainty_bound)
+        cache.status = res
+
     # return result status of the optimizer
     return res, solver_time
@@ -0,0 +1,160 @@
+"""
+    Monte Carlo evaluation of delay scenarios
+
+    The MAPF plan, the ADG and the dependency groups only depend on the map
+    and its seed, so they are determined once (plan_snapshot) and many delay
+    realizations, horizons and cost functions are then simulated on copies
+    of them (run_scenarios), in parallel worker processes. The workers get the
+    snapshot when they start: with the fork start method it is shared with the
+    parent copy-on-write, and a worker only copies it for each of its
+    scenarios. The results are rows of one table (save_table, summarize).
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from collections import namedtuple
+import copy
+import csv
+import multiprocessing
+import statistics as stat
+import time
+from mip import Model
+
+from functions.adg import determine_ADG, analyze_ADG
+from functions.adg_cycle_check import ADGCycleCheck
+from functions.adg_execution import ADGExecution
+from functions.delay_models import make_delay_model
+from functions.milp_formulation import MILPFormulation, MILPCache, SolveOutcomes, solve_MILP
+from functions.objectives import make_objective
+from functions.ordering_heuristic import solve_heuristic
+from functions.robot import Robot
+
+import logging
+logger = logging.getLogger(__name__)
+
+# one delay realization: every delay_amount steps, delayed_robot_cnt robots
+# (drawn with the random seed) do not advance, or the delays of another
+# delay_model with delay_params (functions/delay_models.py); ordered with
+# H_control and cost_func by the ordering_solver ("MILP" with solver and
+# prediction horizon H_prediction and time_budget [s] per step, or
+# "heuristic")
+Scenario = namedtuple("Scenario", ["seed", "delay_amount", "delayed_robot_cnt", "H_control", "cost_func",
+                                   "ordering_solver", "solver", "big_M", "sim_timeout", "delay_model", "delay_params", "H_prediction",
+                                   "time_budget"],
+                      defaults=["MILP", "CBC", "tight", 500, "interval", None, None, None])
+
+def plan_snapshot(plans):
+    """ ADG and dependency groups of the MAPF plans (run_CBS), shared by all scenarios """
+    ADG, robot_plan, goal_positions = determine_ADG(plans, show_graph=False)
+    _, _, dependency_groups = analyze_ADG(ADG, plans, show_graph=False)
+    return {"ADG": ADG, "robot_plan": robot_plan, "goal_positions": goal_positions, "dependency_groups": dependency_groups}
+
+def simulate_scenario(snapshot, scenario):
+    """
+        Runs the closed loop of main_ECBS (without visuals) for the scenario on
+        a copy of the snapshot
+        Outputs:
+         - result : row of the results table
+    """
+    start = time.perf_counter()
+    ADG, dependency_groups = copy.deepcopy((snapshot["ADG"], snapshot["dependency_groups"]))
+    robot_plan = snapshot["robot_plan"]
+    robots = [Robot(robot_ID, robot_plan[robot_ID], None, snapshot["goal_positions"][robot_ID]) for robot_ID in robot_plan]
+    cycle_check = ADGCycleCheck(ADG)
+    execution = ADGExecution(ADG, robots)
+    cycle_check.listeners.append(execution)
+    objective = make_objective(scenario.cost_func)
+    m_opt = MILPFormulation(Model(solver_name=scenario.solver), big_M=scenario.big_M)
+    milp_cache = MILPCache()
+    solve_outcomes = SolveOutcomes()
+    delay_params = dict(scenario.delay_params or {})
+    if scenario.delay_model == "interval":
+        delay_params = dict({"delay_amount": scenario.delay_amount, "delayed_robot_cnt": scenario.delayed_robot_cnt}, **delay_params)
+    delays = make_delay_model(scenario.delay_model, len(robots), scenario.sim_timeout, seed=scenario.seed, **delay_params)
+
+    time_to_goal = {robot.robot_ID: 0 for robot in robots}
+    solve_time = []
+    k = 0
+    while (not all(robot.is_done() for robot in robots)) and (k < scenario.sim_timeout):
+        if scenario.ordering_solver == "heuristic":
+            res, solve_t = solve_heuristic(robots, dependency_groups, ADG, scenario.H_control, cost_func=objective, time_budget=scenario.time_budget,
+                                           cache=milp_cache, cycle_check=cycle_check, outcomes=solve_outcomes)
+        else:
+            res, solve_t = solve_MILP(robots, dependency_groups, ADG, None, scenario.H_control, scenario.H_prediction, m_opt, None, cost_func=objective,
+                                      cache=milp_cache, big_M=scenario.big_M, cycle_check=cycle_check, time_budget=scenario.time_budget,
+                                      outcomes=solve_outcomes)
+        if cycle_check.cycle is not None:
+            raise Exception("ADG has a cycle => deadlock! something is wrong with optimization")
+        solve_time.append(solve_t)
+
+        if k > 0:
+            for robot in execution.step(delays.robot_IDs_to_delay(k, robots)):
+                if robot.is_done():
+                    time_to_goal[robot.robot_ID] = k
+        k += 1
+    for robot in robots:
+        if not robot.is_done():
+            time_to_goal[robot.robot_ID] = k
+
+    result = scenario._asdict()
+    result["total time"] = sum(time_to_goal.values())
+    result["makespan"] = max(time_to_goal.values())
+    result["steps"] = k
+    result["solve time max"] = max(solve_time)
+    result["solve time avg"] = stat.mean(solve_time)
+    result["MILP cache hits"] = milp_cache.hit_count()
+    for outcome, count in solve_outcomes.counts().items():
+        result["MILP " + outcome] = count
+    result["wall time"] = time.perf_counter() - start
+    return result
+
+_snapshot = None # snapshot of the worker process
+
+def _init_worker(snapshot):
+    global _snapshot
+    _snapshot = snapshot
+    logging.getLogger("functions").setLevel(logging.WARNING)
+
+def _simulate_worker_scenario(scenario):
+    return simulate_scenario(_snapshot, scenario)
+
+def run_scenarios(snapshot, scenarios, processes=0):
+    """
+        Simulates all scenarios on the snapshot, in processes worker
+        processes (0: in this process)
+        Outputs:
+         - results : rows of the results table, in the order of scenarios
+    """
+    if processes == 0:
+        return [simulate_scenario(snapshot, scenario) for scenario in scenarios]
+    if "fork" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("fork") # the workers share the snapshot copy-on-write
+    else:
+        context = None # the snapshot is pickled once per worker
+    with ProcessPoolExecutor(max_workers=processes, mp_context=context, initializer=_init_worker, initargs=(snapshot,)) as pool:
+        return list(pool.map(_simulate_worker_scenario, scenarios))
+
+def summarize(results, keys=("H_control", "delay_amount", "cost_func", "ordering_solver")):
+    """
+        Mean and standard deviation of the total time and makespan over the
+        delay realizations (seeds) of every combination of keys
+    """
+    groups = {}
+    for result in results:
+        groups.setdefault(tuple(result[key] for key in keys), []).append(result)
+    summary = []
+    for group_key, group_results in groups.items():
+        row = dict(zip(keys, group_key))
+        row["runs"] = len(group_results)
+        for column in ["total time", "makespan", "solve time avg"]:
+            values = [result[column] for result in group_results]
+            row[column + " mean"] = stat.mean(values)
+            row[column + " std"] = stat.pstdev(values)
+        summary.append(row)
+    return summary
+
+def save_table(rows, file_name):
+    """ saves the rows (dicts with the same keys) as a csv file """
+    with open(file_name, mode="w", newline="") as results_file:
+        results_writer = csv.DictWriter(results_file, fieldnames=list(rows[0].keys()))
+        results_writer.writeheader()
+        results_writer.writerows(rows)
@@ -0,0 +1,137 @@
+"""
+    Cost functions of the ordering MILP (solve_MILP)
+
+    An objective builder returns the linear expression of its cost for the
+    current MILP; builders are registered by name in OBJECTIVES. Solvers
+    without an MILP (functions/ordering_heuristic.py) use the value function
+    of the objective in OBJECTIVE_VALUES instead. Every objective can add a
+    switching penalty (cost per switched dependency group) and weight the
+    robots' terms with per-robot priorities.
+
+    Names (cost_func of solve_MILP, last argument of main_ECBS.py):
+     - "cumulative" : sum of the goal times
+     - "max"        : makespan, the latest goal time
+     - "greedy"     : sum of the times of all remaining nodes
+     - "<name>_kb_<K>" : objective <name> with switching penalty K, e.g.
+                         "max_kb_5"; "bp_kb_<K>" is "cumulative_kb_<K>"
+"""
+
+import re
+from mip import xsum
+
+OBJECTIVES = {} # name -> builder(formulation, robots, milp_variables, objective)
+
+def register_objective(name):
+    """ decorator adding an objective builder to OBJECTIVES """
+    def register(builder):
+        OBJECTIVES[name] = builder
+        return builder
+    return register
+
+class Objective(object):
+    """
+        A registered objective and its parameters:
+         - name : key in OBJECTIVES
+         - switching_penalty : cost per switched (reversed) dependency group
+         - priorities : {robot ID: weight} of the robots' terms (default 1.0)
+    """
+    def __init__(self, name, switching_penalty=0.0, priorities=None):
+        if name not in OBJECTIVES:
+            raise ValueError("unknown objective '{}', expected one of {}".format(name, sorted(OBJECTIVES)))
+        if switching_penalty < 0:
+            raise ValueError("switching penalty must not be negative: {}".format(switching_penalty))
+        if priorities is None:
+            priorities = {}
+        for robot_ID, weight in priorities.items():
+            if weight < 0:
+                raise ValueError("priority of robot {} must not be negative: {}".format(robot_ID, weight))
+        self.name = name
+        self.switching_penalty = float(switching_penalty)
+        self.priorities = {int(robot_ID): float(weight) for robot_ID, weight in priorities.items()}
+
+    def priority(self, robot_ID):
+        return self.priorities.get(robot_ID, 1.0)
+
+    def key(self):
+        return (self.name, self.switching_penalty, tuple(sorted(self.priorities.items())))
+
+    def __eq__(self, other):
+        return isinstance(other, Objective) and self.key() == other.key()
+
+    def __hash__(self):
+        return hash(self.key())
+
+    def __repr__(self):
+        return "Objective({!r}, switching_penalty={}, priorities={})".format(self.name, self.switching_penalty, self.priorities)
+
+def make_objective(cost_func, priorities=None):
+    """
+        Objective from a name (see the module docstring), or cost_func
+        itself if it already is one. Raises ValueError for unknown names.
+    """
+    if isinstance(cost_func, Objective):
+        return cost_func
+    match = re.fullmatch(r"(\w+?)_kb_(\d+(?:\.\d+)?)", cost_func)
+    if match is None:
+        return Objective(cost_func, priorities=priorities)
+    name = match.group(1)
+    if name == "bp": # binary penalty
+        name = "cumulative"
+    return Objective(name, switching_penalty=float(match.group(2)), priorities=priorities)
+
+def goal_variables(robots, milp_variables):
+    return [milp_variables["continuous"][robot.robot_ID][robot.get_goal_node()] for robot in robots]
+
+@register_objective("cumulative")
+def cumulative_cost(formulation, robots, milp_variables, objective):
+    """ sum of the goal times """
+    return xsum(objective.priority(robot.robot_ID)*goal_variable
+                for robot, goal_variable in zip(robots, goal_variables(robots, milp_variables)))
+
+@register_objective("max")
+def makespan_cost(formulation, robots, milp_variables, objective):
+    """ makespan min max(t_g(v_i^k)) for all v_i^k \\in \\mathcal{V}_{ADG} """
+    z = formulation.objective_var("makespan")
+    for robot, goal_variable in zip(robots, goal_variables(robots, milp_variables)):
+        formulation.objective_constr(("makespan", robot.robot_ID), objective.priority(robot.robot_ID)*goal_variable <= z)
+    return xsum([z])
+
+@register_objective("greedy")
+def greedy_cost(formulation, robots, milp_variables, objective):
+    """ sum of the times of all remaining nodes (a node's time is its anchor's variable plus its offset) """
+    return xsum(objective.priority(robot.robot_ID)*(node_variable + formulation.node_offset(node))
+                for robot in robots for node, node_variable in milp_variables["continuous"][robot.robot_ID].items())
+
+OBJECTIVE_VALUES = {} # name -> value(robots, completion_times, objective)
+
+def register_objective_value(name):
+    """
+        decorator adding the value function of an objective (its cost for
+        given completion times, used by the solvers which do not build an
+        MILP) to OBJECTIVE_VALUES
+    """
+    def register(value):
+        OBJECTIVE_VALUES[name] = value
+        return value
+    return register
+
+def objective_value(objective, robots, completion_times, switched_count=0):
+    """
+        Cost of the objective for {node: completion time} with switched_count
+        switched (reversed) dependency groups
+    """
+    if objective.name not in OBJECTIVE_VALUES:
+        raise ValueError("objective '{}' has no value function".format(objective.name))
+    return OBJECTIVE_VALUES[objective.name](robots, completion_times, objective) + objective.switching_penalty*switched_count
+
+@register_objective_value("cumulative")
+def cumulative_value(robots, completion_times, objective):
+    return sum(objective.priority(robot.robot_ID)*completion_times[robot.get_goal_node()] for robot in robots)
+
+@register_objective_value("max")
+def makespan_value(robots, completion_times, objective):
+    return max(objective.priority(robot.robot_ID)*completion_times[robot.get_goal_node()] for robot in robots)
+
+@register_objective_value("greedy")
+def greedy_value(robots, completion_times, objective):
+    return sum(objective.priority(robot.robot_ID)*completion_times[node] for robot in robots for node in robot.get_remaining_plan())
@@ -0,0 +1,147 @@
+"""
+    Combinatorial alternative to the ordering MILP (solve_MILP)
+
+    Decides the same switching of the dependency groups without building an
+    MILP: every candidate orientation is scored with the earliest completion
+    times it allows (longest path through the precedence and dependency
+    constraints, which also detects cycles), so an orientation with a cycle
+    is never accepted.
+"""
+
+from mip import OptimizationStatus
+import time
+
+from functions.milp_formulation import PlanSchedule, determine_switchable_groups, update_ADG_ordering
+from functions.objectives import make_objective, objective_value
+
+import logging
+logger = logging.getLogger(__name__)
+
+class OrderingEvaluator(object):
+    """
+        Scores orientations of the switchable dependency groups with the
+        earliest completion times of the MILP's constraints (PlanSchedule of
+        milp_formulation, also behind earliest_completion_times), so the
+        heuristic optimizes the same objective the MILP is compared against.
+        The plan steps and the fixed dependencies do not depend on the
+        orientation and are only set up once.
+    """
+    def __init__(self, robots, switchable_dependency_groups, fixed_dependency_groups, objective, uncertainty_bound=0.0):
+        self.robots = robots
+        self.objective = objective
+        self.switchable_dependency_groups = switchable_dependency_groups
+        self.schedule = PlanSchedule(robots, uncertainty_bound, fixed_dependency_groups=fixed_dependency_groups)
+
+    def completion_times(self, reversed_groups):
+        """
+            {node: earliest completion time} with the switchable groups
+            reversed where reversed_groups is True (groups beyond its length
+            are left out), None if that has a cycle
+        """
+        switchable_dependency_groups = self.switchable_dependency_groups[:len(reversed_groups)]
+        directions = {dependency_group: not reverse for dependency_group, reverse in zip(switchable_dependency_groups, reversed_groups)}
+        return self.schedule.earliest_times(switchable_dependency_groups, directions)
+
+    def cost(self, reversed_groups):
+        """ objective value of the orientation, None if it has a cycle """
+        completion_times = self.completion_times(reversed_groups)
+        if completion_times is None:
+            return None
+        return objective_value(self.objective, self.robots, completion_times, sum(reversed_groups))
+
+def earliest_arrival_orientation(evaluator, switchable_dependency_groups):
+    """
+        Greedy orientation: the robot which would finish its node of the
+        group first, if no switchable group constrained it, goes first
+    """
+    free_times = evaluator.completion_times([]) # plan steps and fixed dependencies only
+    if free_times is None:
+        return None
+    reversed_groups = []
+    for dependency_group in switchable_dependency_groups:
+        blocking_time = free_times[dependency_group.first_edge_tail]
+        blocked_time = free_times[dependency_group.first_edge_head]
+        reversed_groups.append(blocked_time < blocking_time)
+    return reversed_groups
+
+def solve_heuristic(robots, dependency_groups, ADG, H_control, cost_func="cumulative", uncertainty_bound=0.0, time_budget=None, cache=None, cycle_check=None, outcomes=None):
+    """
+        Orders the robots like solve_MILP, without an MILP:
+         1 start from the better of the current orientation (acyclic, as the
+           ADG is) and the greedy earliest arrival orientation
+         2 local search: switch single groups while that lowers the cost
+        With a time_budget [s], the local search stops once it is used up
+        (anytime); the best orientation found so far is applied to the ADG
+        (through the ADGCycleCheck, if one is given). With SolveOutcomes, the
+        outcome of the step is recorded: "optimal" once no single switch
+        lowers the cost (a local optimum), "incumbent" if the time budget
+        stopped the search first.
+        Outputs:
+         - res : OptimizationStatus.FEASIBLE (no optimality proof)
+         - solver_time : process time of the search
+    """
+    objective = make_objective(cost_func)
+    logger.info(" solve_heuristic: ordering with local search ...")
+
+    nodes = ADG.graph["nodes"]
+    switchable_dependency_groups, fixed_dependency_groups = determine_switchable_groups(robots, dependency_groups, nodes, H_control,
+                                                                                         ADG.graph.get("group_thresholds"))
+
+    if cache is not None:
+        fingerprint = cache.input_fingerprint(robots, switchable_dependency_groups, nodes, objective, uncertainty_bound)
+        if len(switchable_dependency_groups) == 0 or fingerprint == cache.fingerprint:
+            logger.info("   - switchable dependency groups unchanged: keeping the current ordering")
+            cache.step_hits.append(1)
+            if outcomes is not None:
+                outcomes.record("skipped")
+            return cache.status, 0.0
+        cache.step_hits.append(0)
+
+    start = time.process_time()
+    deadline = None
+    if time_budget is not None:
+        deadline = time.perf_counter() + time_budget
+    evaluator = OrderingEvaluator(robots, switchable_dependency_groups, fixed_dependency_groups, objective, uncertainty_bound)
+
+    best = [not dependency_group.original_direction for dependency_group in switchable_dependency_groups]
+    best_cost = evaluator.cost(best)
+    if best_cost is None:
+        raise Exception("current orientation has a cycle")
+    greedy = earliest_arrival_orientation(evaluator, switchable_dependency_groups)
+    if greedy is not None:
+        greedy_cost = evaluator.cost(greedy)
+        if greedy_cost is not None and greedy_cost < best_cost:
+            best, best_cost = greedy, greedy_cost
+    logger.info("   - initial cost: {}".format(best_cost))
+
+    # first improvement: switch one group at a time until no switch helps
+    improved = True
+    budget_used = False
+    while improved and (deadline is None or time.perf_counter() < deadline):
+        improved = False
+        for group_idx in range(len(best)):
+            if deadline is not None and time.perf_counter() >= deadline:
+                logger.info("   - time budget used up")
+                budget_used = True
+                break
+            candidate = list(best)
+            candidate[group_idx] = not candidate[group_idx]
+            candidate_cost = evaluator.cost(candidate)
+            if candidate_cost is not None and candidate_cost < best_cost - 1e-9:
+                best, best_cost = candidate, candidate_cost
+                improved = True
+    budget_used = budget_used or improved # still improving when the budget ran out
+    solver_time = time.process_time() - start
+    logger.info("   - final cost: {}".format(best_cost))
+    logger.info("   solver time: {} s".format(solver_time))
+
+    res = OptimizationStatus.FEASIBLE
+    update_ADG_ordering(ADG, switchable_dependency_groups, fixed_dependency_groups, [1.0 if reverse else 0.0 for reverse in best], cycle_check)
+
+    if cache is not None:
+        # with the orientation of the solution
+        cache.fingerprint = cache.input_fingerprint(robots, switchable_dependency_groups, nodes, objective, uncertainty_bound)
+        cache.status = res
+    if outcomes is not None:
+        outcomes.record("incumbent" if budget_used else "optimal")
+    return res, solver_time
@@ -0,0 +1,59 @@
+"""
+    Binary plan files of the planners (--format binary, see
+    example/plan_output.hpp)
+
+    A header with the statistics, then per agent its state count and its
+    packed int32 (x, y, t) states. read_plans returns the usual
+    {"statistics": ..., "schedule": {"agent<i>": plan}} dictionary, but every
+    plan is a [states, 3] int32 array viewing the file buffer (no per-state
+    parsing or copying), which determine_ADG consumes directly.
+"""
+
+import struct
+import numpy as np
+
+PLAN_MAGIC = b"MRPPLAN1"
+HEADER = struct.Struct("<8siiiidqq") # magic, agents, cost, makespan, reserved, runtime, expanded (high, low level)
+
+def plan_array(plan):
+    """ [states, 3] int32 array (x, y, t) of a plan, from a list of {"x", "y", "t"} or an array """
+    if isinstance(plan, np.ndarray):
+        return plan
+    return np.array([(item["x"], item["y"], item["t"]) for item in plan], dtype=np.int32).reshape(-1, 3)
+
+def read_plans(buffer):
+    """ plans of a binary plan file in buffer (bytes, mmap, uint8 array, ...) """
+    buffer = memoryview(buffer).cast("B")
+    if len(buffer) < HEADER.size or bytes(buffer[:len(PLAN_MAGIC)]) != PLAN_MAGIC:
+        raise ValueError("not a binary plan file")
+    _, agent_count, cost, makespan, _, runtime, high_level_expanded, low_level_expanded = HEADER.unpack_from(buffer)
+    plans = {"statistics": {"cost": cost,
+                            "makespan": makespan,
+                            "runtime": runtime,
+                            "highLevelExpanded": high_level_expanded,
+                            "lowLevelExpanded": low_level_expanded},
+             "schedule": {}}
+    offset = HEADER.size
+    for agent in range(agent_count):
+        state_count = int(np.frombuffer(buffer, dtype="<i4", count=1, offset=offset)[0])
+        offset += 4
+        plans["schedule"]["agent" + str(agent)] = np.frombuffer(buffer, dtype="<i4", count=3*state_count, offset=offset).reshape(state_count, 3)
+        offset += 12*state_count
+    if offset != len(buffer):
+        raise ValueError("binary plan file has {} bytes, expected {}".format(len(buffer), offset))
+    return plans
+
+def load_plans(file_name):
+    """ plans of a binary plan file: one read of the file, the plans view its buffer """
+    return read_plans(np.fromfile(file_name, dtype=np.uint8))
+
+def write_plans(plans, file_name):
+    """ writes plans (e.g. loaded from a YAML plan file) as a binary plan file """
+    statistics = plans.get("statistics", {})
+    with open(file_name, "wb") as plan_file:
+        plan_file.write(HEADER.pack(PLAN_MAGIC, len(plans["schedule"]), statistics.get("cost", 0), statistics.get("makespan", 0), 0,
+                                    statistics.get("runtime", 0.0), statistics.get("highLevelExpanded", 0), statistics.get("lowLevelExpanded", 0)))
+        for plan in plans["schedule"].values():
+            states = plan_array(plan).astype("<i4")
+            plan_file.write(struct.pack("<i", len(states)))
+            plan_file.write(states.tobytes())
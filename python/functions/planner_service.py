@@ -0,0 +1,143 @@
+"""
+    Persistent planner processes
+
+    run_CBS / run_ECBS start the planner executable for every plan, which
+    loads the map and exchanges YAML files. A PlannerProcess starts the
+    planner once with --serve: it keeps the map loaded and plans the start
+    and goal sets it gets over a pipe (see serve() of example/ecbs.cpp for the
+    protocol). A PlannerPool shares such processes between threads.
+"""
+
+import queue
+import subprocess
+import threading
+import yaml
+
+import logging
+logger = logging.getLogger(__name__)
+
+def load_robots(robot_file):
+    """ starts and goals [(x, y)] of a robots YAML file (as written by generate_map.py) """
+    with open(robot_file) as yaml_file:
+        robots = yaml.safe_load(yaml_file)["robots"]
+    starts = [(int(robot["start"][0]), int(robot["start"][1])) for robot in robots]
+    goals = [(int(robot["goal"][0]), int(robot["goal"][1])) for robot in robots]
+    return starts, goals
+
+class PlannerProcess(object):
+    """ one planner executable serving the plans of map_file (not thread-safe) """
+    def __init__(self, map_file, executable="../build/ecbs"):
+        self.map_file = map_file
+        self.process = subprocess.Popen([executable, "-m", map_file, "--serve"],
+                                        stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True, bufsize=1)
+
+    def plan(self, starts, goals, w=1.0):
+        """
+            Plans of the robots from starts to goals [(x, y)] with
+            sub-optimality bound w (1.0: optimal)
+            Outputs:
+             - plans : {"statistics": ..., "schedule": ...} like run_CBS, None
+                       if the planner found no solution
+        """
+        if len(starts) != len(goals):
+            raise ValueError("{} starts but {} goals".format(len(starts), len(goals)))
+        request = ["plan", str(w), str(len(starts))]
+        for (sx, sy), (gx, gy) in zip(starts, goals):
+            request += [str(sx), str(sy), str(gx), str(gy)]
+        self.process.stdin.write(" ".join(request) + "\n")
+        self.process.stdin.flush()
+
+        status = self.__read_line().split()
+        if status[0] == "fail":
+            return None
+        if status[0] != "ok":
+            raise ValueError("planner: {}".format(" ".join(status)))
+        plans = {"statistics": {"cost": int(status[1]),
+                                "makespan": int(status[2]),
+                                "runtime": float(status[3]),
+                                "highLevelExpanded": int(status[4]),
+                                "lowLevelExpanded": int(status[5])},
+                 "schedule": {}}
+        for agent in range(len(starts)):
+            values = [int(value) for value in self.__read_line().split()[1:]]
+            plans["schedule"]["agent" + str(agent)] = [{"x": values[idx], "y": values[idx+1], "t": values[idx+2]}
+                                                      for idx in range(0, len(values), 3)]
+        return plans
+
+    def __read_line(self):
+        line = self.process.stdout.readline()
+        if line == "":
+            raise Exception("planner process for {} exited with {}".format(self.map_file, self.process.wait()))
+        return line
+
+    def close(self):
+        if self.process.poll() is None:
+            try:
+                self.process.stdin.write("quit\n")
+                self.process.stdin.close()
+            except BrokenPipeError:
+                pass
+            self.process.wait()
+
+class PlannerPool(object):
+    """
+        Up to size planner processes for map_file, started when needed and
+        shared between threads: plan() uses an idle process or waits for one
+    """
+    def __init__(self, map_file, size=1, executable="../build/ecbs"):
+        self.map_file = map_file
+        self.size = size
+        self.executable = executable
+        self.processes = []
+        self.idle = queue.LifoQueue()
+        self.lock = threading.Lock()
+
+    def __acquire(self):
+        while True:
+            try:
+                return self.idle.get_nowait()
+            except queue.Empty:
+                pass
+            with self.lock:
+                if len(self.processes) < self.size:
+                    process = PlannerProcess(self.map_file, self.executable)
+                    self.processes.append(process)
+                    return process
+            try:
+                return self.idle.get(timeout=0.1) # or start a process replacing a failed one
+            except queue.Empty:
+                pass
+
+    def plan(self, starts, goals, w=1.0):
+        """ see PlannerProcess.plan """
+        process = self.__acquire()
+        try:
+            plans = process.plan(starts, goals, w)
+        except ValueError:
+            self.idle.put(process) # rejected request, the process is still in sync
+            raise
+        except Exception:
+            # the process may be out of sync with its pipe: replace it
+            with self.lock:
+                self.processes.remove(process)
+            process.close()
+            raise
+        self.idle.put(process)
+        return plans
+
+    def plan_robots(self, robot_file, w=1.0):
+        """ plans of the starts and goals of a robots YAML file """
+        starts, goals = load_robots(robot_file)
+        return self.plan(starts, goals, w)
+
+    def close(self):
+        with self.lock:
+            for process in self.processes:
+                process.close()
+            self.processes = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
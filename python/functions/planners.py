@@ -10,6 +10,9 @@ import logging
 import networkx as nx
 import matplotlib.pyplot as plt
 
+from functions.plan_format import load_plans
+from functions.prioritized_planner import PrioritizedPlanner
+
 logger = logging.getLogger(__name__)
 
 def run_ECBS_TA(map_file, robot_file, w=1.2):
@@ -25,30 +28,50 @@ def run_ECBS_TA(map_file, robot_file, w=1.2):
     with open("data/tmp/output.yaml") as output_file:
         return yaml.safe_load(output_file)
 
-def run_ECBS(map_file, robot_file, w, thread_number=1):
+def read_output(output_file, yaml_output):
+    if yaml_output:
+        with open(output_file) as output:
+            return yaml.safe_load(output)
+    return load_plans(output_file)
+
+def run_ECBS(map_file, robot_file, w, thread_number=1, yaml_output=False):
+    """
+        Plans of ECBS with sub-optimality bound w; the planner writes a binary
+        plan file (functions/plan_format.py) unless yaml_output (for
+        debugging: readable, but slow to parse)
+    """
     logger.info("running ECBS ...")
     tmp = "tmp" + str(thread_number)
+    output_file = "data/" + tmp + ("/output.yaml" if yaml_output else "/output.plan")
     subprocess.run(
         ["../build/ecbs",
          "-m", map_file,
          "-r", robot_file,
          "-w", str(w),
-         "-o", "data/" + tmp + "/output.yaml"],
+         "-o", output_file,
+         "--format", "yaml" if yaml_output else "binary"],
         check=True)
     logger.info("done!")
-    with open("data/"  + tmp + "/output.yaml") as output_file:
-        return yaml.safe_load(output_file)
+    return read_output(output_file, yaml_output)
 
-def run_CBS(map_file, robot_file, w=1.0, thread_number=1):
+def run_CBS(map_file, robot_file, w=1.0, thread_number=1, yaml_output=False):
     if float(w) != 1.0:
-        return run_ECBS(map_file, robot_file, w, thread_number=thread_number)
+        return run_ECBS(map_file, robot_file, w, thread_number=thread_number, yaml_output=yaml_output)
     else:
         tmp = "tmp" + str(thread_number)
+        output_file = "data/" + tmp + ("/output.yaml" if yaml_output else "/output.plan")
         subprocess.run(
             ["../build/cbs",
         	 "-m", map_file,
              "-r", robot_file,
-        	 "-o", "data/" + tmp + "/output.yaml"],
+        	 "-o", output_file,
+             "--format", "yaml" if yaml_output else "binary"],
         	check=True)
-        with open("data/" + tmp + "/output.yaml") as output_file:
-            return yaml.safe_load(output_file)
+        return read_output(output_file, yaml_output)
+
+def run_prioritized(map_file, robot_file):
+    """ plans of the in-process prioritized planner (no executable), None if it fails """
+    logger.info("running prioritized planner ...")
+    plans = PrioritizedPlanner(map_file).plan_robots(robot_file)
+    logger.info("done!")
+    return plans
@@ -0,0 +1,185 @@
+"""
+    In-process prioritized planner
+
+    The robots are planned one after the other (in order of priority) with
+    space-time A*: a robot avoids the cells and swaps the robots planned
+    before it reserved in a [time, x, y] occupancy cube, and the heuristic is
+    the true distance to its goal (BFS distance field of the map, precomputed
+    by generate_map.py or computed once per goal). Robots stay at their goal
+    after they reached it.
+
+    Prioritized planning is not complete (it can fail where ECBS finds a
+    plan) and not optimal, but it plans within the Python process: its main
+    use is to quickly replan a few (e.g. delayed) robots around the fixed
+    plans of the others.
+"""
+
+import heapq
+import os
+import time
+import numpy as np
+
+from functions.map_distances import UNREACHABLE, load_map, distance_field, load_distance_fields
+from functions.planner_service import load_robots
+
+import logging
+logger = logging.getLogger(__name__)
+
+MOVES = ((0, 0), (1, 0), (-1, 0), (0, 1), (0, -1)) # wait first
+
+class PrioritizedPlanner(object):
+    """
+        Prioritized space-time A* on the map (a map YAML file or the boolean
+        array of its free cells); the distance fields of the goals are kept
+        for the next plans
+    """
+    def __init__(self, map_file, max_time=None):
+        self.precomputed = None
+        if isinstance(map_file, str):
+            self.free = load_map(map_file)
+            map_dir = os.path.dirname(os.path.abspath(map_file))
+            csv_map_file = os.path.join(map_dir, "csv_map.csv")
+            if os.path.exists(csv_map_file):
+                self.precomputed = load_distance_fields(map_dir, csv_map_file)
+            if self.precomputed is not None and self.precomputed.fields.shape[1:] != self.free.shape:
+                self.precomputed = None
+        else:
+            self.free = np.asarray(map_file, dtype=bool)
+        self.max_time = max_time if max_time is not None else 4*self.free.size
+        self.distance_fields = {} # goal -> distance_field
+
+    def heuristic(self, goal):
+        goal = tuple(int(value) for value in goal)
+        if goal not in self.distance_fields:
+            field = None
+            if self.precomputed is not None:
+                field = self.precomputed.field(goal)
+            if field is None:
+                field = distance_field(self.free, goal)
+            self.distance_fields[goal] = field
+        return self.distance_fields[goal]
+
+    def plan(self, starts, goals, order=None, fixed_plans=None):
+        """
+            Plans the robots from starts to goals [(x, y)]
+             - order : robot indices by decreasing priority, default: the
+                       robots with the longest distance first
+             - fixed_plans : {robot index: [states, 3] array (x, y, t)} of
+                             robots which keep their plan (partial replan)
+            Outputs:
+             - plans : {"statistics": ..., "schedule": {"agent<i>": [states, 3]
+                       int32 array}} like run_CBS, None if a robot has no plan
+        """
+        start_time = time.perf_counter()
+        if len(starts) != len(goals):
+            raise ValueError("{} starts but {} goals".format(len(starts), len(goals)))
+        starts = [tuple(int(value) for value in start) for start in starts]
+        goals = [tuple(int(value) for value in goal) for goal in goals]
+        fixed_plans = {} if fixed_plans is None else fixed_plans
+        for robot_idx, cell in enumerate(starts + goals):
+            if not (0 <= cell[0] < self.free.shape[0] and 0 <= cell[1] < self.free.shape[1] and self.free[cell]):
+                raise ValueError("start or goal {} of robot {} is not a free cell".format(cell, robot_idx % len(starts)))
+
+        distances = [self.heuristic(goal)[start] for start, goal in zip(starts, goals)]
+        if order is None:
+            order = sorted(range(len(starts)), key=lambda robot_idx: -distances[robot_idx])
+        order = [robot_idx for robot_idx in order if robot_idx not in fixed_plans]
+
+        # reservations: robot index + 1 per [time, x, y], and the time from
+        # which a robot stays at its goal per cell
+        horizon = 2*max([0] + [distance for distance in distances if distance != UNREACHABLE]) + 2
+        horizon = max([horizon] + [len(plan) + 1 for plan in fixed_plans.values()])
+        self.reserved = np.zeros((horizon, self.free.shape[0], self.free.shape[1]), dtype=np.int32)
+        self.parked_from = np.full(self.free.shape, UNREACHABLE, dtype=np.int64)
+        self.expanded = 0
+
+        states = {}
+        for robot_idx, plan in fixed_plans.items():
+            states[robot_idx] = np.asarray(plan, dtype=np.int32).reshape(-1, 3)
+            self.__reserve(robot_idx, states[robot_idx])
+        for robot_idx in order:
+            plan = self.__search(robot_idx, starts[robot_idx], goals[robot_idx])
+            if plan is None:
+                logger.warning("prioritized planner: no plan for robot {}".format(robot_idx))
+                return None
+            states[robot_idx] = plan
+            self.__reserve(robot_idx, plan)
+
+        costs = [int(states[robot_idx][-1, 2]) for robot_idx in range(len(starts))]
+        return {"statistics": {"cost": sum(costs),
+                               "makespan": max(costs),
+                               "runtime": time.perf_counter() - start_time,
+                               "highLevelExpanded": 0,
+                               "lowLevelExpanded": self.expanded},
+                "schedule": {"agent" + str(robot_idx): states[robot_idx] for robot_idx in range(len(starts))}}
+
+    def plan_robots(self, robot_file, order=None):
+        """ plans of the starts and goals of a robots YAML file """
+        starts, goals = load_robots(robot_file)
+        return self.plan(starts, goals, order)
+
+    def __grow(self, horizon):
+        extra = np.zeros((horizon - self.reserved.shape[0],) + self.reserved.shape[1:], dtype=np.int32)
+        self.reserved = np.concatenate([self.reserved, extra])
+
+    def __reserve(self, robot_idx, plan):
+        if plan[-1, 2] + 2 > self.reserved.shape[0]:
+            self.__grow(int(plan[-1, 2]) + 2)
+        self.reserved[plan[:, 2], plan[:, 0], plan[:, 1]] = robot_idx + 1
+        goal = (plan[-1, 0], plan[-1, 1])
+        self.parked_from[goal] = min(self.parked_from[goal], plan[-1, 2])
+
+    def __search(self, robot_idx, start, goal):
+        distance = self.heuristic(goal)
+        if distance[start] == UNREACHABLE or self.parked_from[goal] != UNREACHABLE:
+            return None
+        while True:
+            plan = self.__space_time_astar(start, goal, distance)
+            if plan is not None or self.reserved.shape[0] >= self.max_time:
+                return plan
+            self.__grow(min(2*self.reserved.shape[0], self.max_time))
+
+    def __space_time_astar(self, start, goal, distance):
+        reserved = self.reserved
+        parked_from = self.parked_from
+        free = self.free
+        horizon = reserved.shape[0]
+        dimx, dimy = free.shape
+        # the robot can only stay at its goal after the last reservation of it
+        reserved_times = np.flatnonzero(reserved[:, goal[0], goal[1]])
+        goal_free_from = reserved_times[-1] + 1 if len(reserved_times) > 0 else 0
+
+        closed = np.zeros(reserved.shape, dtype=bool)
+        parent = {(0, start[0], start[1]): None}
+        open_list = [(int(distance[start]), 0, start[0], start[1])]
+        while len(open_list) > 0:
+            _, negative_t, x, y = heapq.heappop(open_list)
+            t = -negative_t
+            if closed[t, x, y]:
+                continue
+            closed[t, x, y] = True
+            self.expanded += 1
+            if (x, y) == goal and t >= goal_free_from:
+                plan = []
+                state = (t, x, y)
+                while state is not None:
+                    plan.append((state[1], state[2], state[0]))
+                    state = parent[state]
+                return np.array(plan[::-1], dtype=np.int32)
+            if t + 1 >= horizon:
+                continue
+            for dx, dy in MOVES:
+                next_x = x + dx
+                next_y = y + dy
+                if not (0 <= next_x < dimx and 0 <= next_y < dimy) or not free[next_x, next_y]:
+                    continue
+                if closed[t+1, next_x, next_y] or reserved[t+1, next_x, next_y] != 0 or parked_from[next_x, next_y] <= t + 1:
+                    continue
+                other = reserved[t, next_x, next_y]
+                if other != 0 and reserved[t+1, x, y] == other: # swap
+                    continue
+                state = (t+1, next_x, next_y)
+                if state not in parent: # every path to a state has the same length t+1
+                    parent[state] = (t, x, y)
+                    heapq.heappush(open_list, (t + 1 + int(distance[next_x, next_y]), -(t+1), next_x, next_y))
+        return None
@@ -12,6 +12,8 @@ import matplotlib.colors as clr
 import matplotlib.animation as animation
 from matplotlib.animation import FFMpegWriter
 
+from functions.map_store import load_grid_map
+
 import logging
 logger = logging.getLogger(__name__)
 
@@ -25,24 +27,8 @@ class Visualizer(object):
 
 
     def _read_map_file(self):
-        with open(self.map_file) as stream:
-            try:
-                map_data = yaml.safe_load(stream)
-            except yaml.YAMLError as exc:
-                logger.warning(exc)
-                map_data = None
-
-        dim = map_data["map"]["dimensions"]
-        map_array = np.zeros(dim)
-        for obstacle in map_data["map"]["obstacles"]:
-            x = obstacle[0]
-            y = obstacle[1]
-            map_array[x, y] = 1.0
-
-        # add padding for plotting
-        map_array = np.pad(map_array,(1,1),mode="constant",constant_values=1.0)
-
-        self.map_array = map_array
+        # padded for plotting
+        self.map_array = load_grid_map(self.map_file).padded()
 
 
     def redraw(self, robots, pause_length=1.0, show_traj=False, writer=None):
@@ -102,13 +88,6 @@ def show_factory_map(map_file, robot_file, show=False):
         Shows graph of simple CBS or ECBS input files.
         NOT FOR TA algorithms
     """
-    with open(map_file) as stream:
-        try:
-            map = yaml.safe_load(stream)
-        except yaml.YAMLError as exc:
-            logger.warning(exc)
-            map = None
-
     with open(robot_file) as stream:
         try:
             robot_data = yaml.safe_load(stream)
@@ -116,12 +95,7 @@ def show_factory_map(map_file, robot_file, show=False):
             logger.warning(exc)
             robot_data = None
 
-    dim = map["map"]["dimensions"]
-    map_array = np.zeros(dim)
-    for obstacle in map["map"]["obstacles"]:
-        x = obstacle[0]
-        y = obstacle[1]
-        map_array[x, y] = 1.0
+    map_array = np.where(load_grid_map(map_file).free, 0.0, 1.0)
 
     robot_count = 0
     for robot in robot_data["robots"]:
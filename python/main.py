@@ -12,6 +12,7 @@ import time
 import numpy as np
 import subprocess
 sys.path.insert(1, "functions/")
+from functions.objectives import make_objective
 
 def main():
     thread_number = 1
@@ -30,6 +31,11 @@ def main():
     # nuernberg 50, 30, 40
 
     # nuernberg, islands
+
+    # cost functions to sweep, e.g. "cumulative", "max", "greedy", "bp_kb_5", "max_kb_2"
+    cost_func_names = ["cumulative"]
+    for cost_func_name in cost_func_names:
+        make_objective(cost_func_name) # fail before the first run
     
     # map_name = "nuernberg"
     # for map_name in ["nuernberg", "islands", "general", "halfgen"]
@@ -53,7 +59,7 @@ def main():
                 for delay in [10]:
                     for horizon in [0,5]:
                         solver = "CBC"
-                        for cost_func_name in ["cumulative"]: #, "cumulative", "binary_penalty", "greedy"]:
+                        for cost_func_name in cost_func_names:
                             subprocess.run(
                                 ["python",
                                     "main_ECBS.py",
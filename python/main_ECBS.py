@@ -14,6 +14,7 @@ import time
 import networkx as nx
 import csv
 import statistics as stat
+from concurrent.futures import ProcessPoolExecutor
 import os
 import sys
 from mip import Model, ProgressLog, xsum, maximize, minimize, BINARY, CONTINUOUS, Constr, ConstrList
@@ -22,14 +23,43 @@ from mip import Model, ProgressLog, xsum, maximize, minimize, BINARY, CONTINUOUS
 from functions.planners import *
 from functions.visualizers import *
 from functions.milp_formulation import *
+from functions.objectives import *
+from functions.ordering_heuristic import *
 from functions.robot import *
 from functions.adg import *
 from functions.adg_node import *
+from functions.adg_cycle_check import *
+from functions.adg_execution import *
+from functions.event_simulation import *
+from functions.delay_models import *
 from functions.process_results import *
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(format='%(name)s - %(levelname)s :: %(message)s', level=logging.INFO)
 
+def mission_results(time_to_goal, solve_time, solve_outcomes, milp_cache=None, event_simulation=None):
+    """
+        "results" section of the results YAML file (plain Python values only,
+        yaml.safe_dump cannot represent NumPy scalars)
+         - time_to_goal : {robot ID: time step or completion time of the robot}
+    """
+    results = {}
+    results["comp time"] = {}
+    results["comp time"]["solve_time"] = [[float(t) for t in solve_time]]
+    results["comp time"]["max"] = float(max(solve_time))
+    results["comp time"]["avg"] = float(stat.mean(solve_time))
+    results["total time"] = float(sum(time_to_goal.values()))
+    results["MILP outcomes"] = solve_outcomes.counts()
+    results["MILP outcome per step"] = [solve_outcomes.steps]
+    if event_simulation is not None:
+        results["events"] = event_simulation.event_count
+    if milp_cache is not None:
+        results["MILP cache"] = {}
+        results["MILP cache"]["hits"] = milp_cache.hit_count()
+        results["MILP cache"]["misses"] = milp_cache.miss_count()
+        results["MILP cache"]["hit per step"] = [milp_cache.step_hits]
+    return results
+
 def main():
 
     """ ------------------------ UNCHANGED INPUTS -------------------------- """
@@ -39,6 +69,21 @@ def main():
         show_visual = True
         show_ADG = True
         run_MILP = True
+        ordering_solver = "MILP"     # or "heuristic": local search instead of the MILP
+        heuristic_time_budget = None # [s] per time step, None: until no switch improves
+        incremental_MILP = True # keep the MILP alive across time steps
+        warm_start = True       # start the solver from the previous ordering
+        mip_gap = None          # e.g. 0.01: stop once within 1% of the bound
+        solve_time_budget = None # [s] per time step: best solution so far (or the current ordering) once used up
+        cache_MILP = True       # skip the solve if the switchable groups did not change
+        decompose_MILP = False  # one MILP per group of robots linked by switchable dependencies
+        MILP_processes = 0      # > 0: solve these MILPs in parallel worker processes
+        big_M = "tight"         # M of the switchable constraints: "fixed" or "tight" (per constraint)
+        simulation = "steps"    # or "events": continuous time with real node durations
+        robot_speed_range = (0.5, 1.5) # "events": speeds [cells/time] drawn uniformly per robot
+        event_interval = 1.0    # "events": simulated time between two orderings (and delays)
+        delay_model = "interval" # see functions/delay_models.py, e.g. "bernoulli", "stall", "zone"
+        delay_params = {}        # parameters of the delay model (besides delay_amount / delayed_robot_cnt of "interval")
         save_file = False
         # Simulation parameters
         pwd = os.path.dirname(os.path.abspath(__file__))
@@ -46,6 +91,7 @@ def main():
         delayed_robot_cnt = 4
         map_gen_seedval = 1
         H_control = 5
+        H_prediction = None # nodes per robot with their own MILP variables (>= H_control), None: whole plans
         delay_amount = 5
         thread_number = 1
         solver = "CBC" # or "GRB" for Gurobi
@@ -53,13 +99,29 @@ def main():
         w = 4.0     # sub-optimality bound: w = 1.0 -> CBS, else ECBS!
         fldr = "gazebo1" # + str(thread_number)
         save_file_location = "general"
-        cost_func_name = "cumulative"
+        cost_func_name = "cumulative" # see functions/objectives.py, e.g. "max" or "bp_kb_5"
+        robot_priorities = None       # {robot ID: weight} of the robots' cost terms
 
     else: # if running the main.py file with parameter input arguments
         """ ----------------------- READ INPUTS ---------------------------- """
         show_visual = False
         show_ADG = False
         run_MILP = True
+        ordering_solver = "MILP"
+        heuristic_time_budget = None
+        incremental_MILP = True
+        warm_start = True
+        mip_gap = None
+        solve_time_budget = None
+        cache_MILP = True
+        decompose_MILP = False
+        MILP_processes = 0
+        big_M = "tight"
+        simulation = "steps"
+        robot_speed_range = (0.5, 1.5)
+        event_interval = 1.0
+        delay_model = "interval"
+        delay_params = {}
         save_file = True
         sim_timeout = 500
 
@@ -67,16 +129,27 @@ def main():
         map_gen_robot_count = int(sys.argv[1])
         map_gen_seedval = int(sys.argv[2])
         H_control = int(sys.argv[3])
+        H_prediction = None
         delay_amount = int(sys.argv[4])
         thread_number = str(sys.argv[5])
         solver = str(sys.argv[6])
         save_file_location = str(sys.argv[7])
         map_name = str(sys.argv[8])
         cost_func_name = str(sys.argv[9])
+        robot_priorities = None
         w = 3.5
         fldr = map_name + thread_number
         delayed_robot_cnt = round(0.2*int(map_gen_robot_count))
 
+    # fail before planning if the cost function is unknown
+    objective = make_objective(cost_func_name, priorities=robot_priorities)
+    if ordering_solver not in ["MILP", "heuristic"]:
+        raise ValueError("unknown ordering solver '{}'".format(ordering_solver))
+    if simulation not in ["steps", "events"]:
+        raise ValueError("unknown simulation '{}'".format(simulation))
+    if delay_model not in DELAY_MODELS:
+        raise ValueError("unknown delay model '{}'".format(delay_model))
+
     # LOG TO CONSOLE
     logging.info(" fldr: {}".format(fldr))
     logging.info(" thread number: {}".format(thread_number))
@@ -88,7 +161,6 @@ def main():
     robot_file_tmp = pwd + "/data/tmp" + str(thread_number) + "/robots.yaml"
     random.seed(map_gen_seedval)
     np.random.seed(map_gen_seedval)
-    H_prediction = np.NaN # integer value for forward node lookup
 
     """ -------------------------- SOLVE MAPF ------------------------------ """
 
@@ -104,6 +176,8 @@ def main():
     ADG, robot_plan, goal_positions = determine_ADG(plans, show_graph=False)
     nodes_all, edges_type_1, dependency_groups = analyze_ADG(ADG, plans, show_graph=False)
     ADG_reverse = ADG.reverse(copy=False)
+    cycle_check = ADGCycleCheck(ADG) # the ordering solvers change the Type 2 edges through it
+    ADG_nodes = ADG.graph["nodes"]
 
     """ ---------------------- START OF SIMULATION ------------------------ """
 
@@ -120,34 +194,58 @@ def main():
         robots.append(new_robot)
         robots_done.append(False)
         time_to_goal[robot_id] = 0
+    execution = ADGExecution(ADG, robots) # robots whose dependencies have been met
+    if delay_model == "interval":
+        delay_params = dict({"delay_amount": delay_amount, "delayed_robot_cnt": delayed_robot_cnt}, **delay_params)
+    delays = make_delay_model(delay_model, map_gen_robot_count, sim_timeout, seed=map_gen_seedval, **delay_params) # all draws of the run
+    cycle_check.listeners.append(execution)
+    if simulation == "events":
+        robot_speeds = np.random.uniform(robot_speed_range[0], robot_speed_range[1], size=len(robots))
+        event_simulation = EventSimulation(robots, execution, node_durations(ADG_nodes, robot_speeds))
 
     if show_visual:
         visualizer = Visualizer(map_file, robots)
 
     # initialize optimization MIP object m_opt
     # solver = 'CBC' # or 'CBC' for coin-or branch-and-cut solver
-    m_opt = Model() # 'MILP_sequence', solver='CBC')
+    if incremental_MILP:
+        m_opt = MILPFormulation(Model(solver_name=solver), big_M=big_M) # updated in place every time step
+    else:
+        m_opt = Model() # 'MILP_sequence', solver='CBC')
     pl_opt = ProgressLog()
+    if cache_MILP:
+        milp_cache = MILPCache()
+    else:
+        milp_cache = None
+    solve_outcomes = SolveOutcomes()
+    if decompose_MILP and MILP_processes > 0:
+        milp_pool = ProcessPoolExecutor(max_workers=MILP_processes)
+    else:
+        milp_pool = None
 
     k = 0
     robot_IDs_to_delay = []
     while (not all(robots_done)) and (k < sim_timeout):
         print("pl_opt.log: {}".format(pl_opt.log))
-        m_opt.clear()
-        m_opt.solver_name = solver
+        if not incremental_MILP:
+            m_opt.clear()
+            m_opt.solver_name = solver
 
         # show current robot status
         logger.info("-------------------- @ time step k = {} --------------------".format(k))
         for robot in robots:
-            node_info = ADG.nodes[robot.current_node]["data"]
-            logger.debug("   - Robot {} # {} @ {} => status: {}".format(robot.robot_ID, node_info.ID, node_info.s_loc, robot.status))
+            logger.debug("   - Robot {} # {} @ {} => status: {}".format(robot.robot_ID, ADG_nodes.name(robot.current_node), ADG_nodes.s_loc[robot.current_node], robot.status))
 
         # solve MILP for the advanced ADG to potentially adjust ordering
-        res, solve_t = solve_MILP(robots, dependency_groups, ADG, ADG_reverse, H_control, H_prediction, m_opt, pl_opt, run=run_MILP, uncertainty_bound=0, cost_func=cost_func_name)
+        if run_MILP and ordering_solver == "heuristic":
+            res, solve_t = solve_heuristic(robots, dependency_groups, ADG, H_control, cost_func=objective, time_budget=heuristic_time_budget, cache=milp_cache, cycle_check=cycle_check, outcomes=solve_outcomes)
+        else:
+            res, solve_t = solve_MILP(robots, dependency_groups, ADG, ADG_reverse, H_control, H_prediction, m_opt, pl_opt, run=run_MILP, uncertainty_bound=0, cost_func=objective, warm_start=warm_start, max_mip_gap=mip_gap, cache=milp_cache, decompose=decompose_MILP, pool=milp_pool, big_M=big_M, cycle_check=cycle_check, time_budget=solve_time_budget, outcomes=solve_outcomes)
 
-        if (res is None):
-            # exit this ECBS run
+        if (res is None) and not run_MILP:
+            # no optimization (original behavior): exit this ECBS run
             return 0
+        # a failed solve keeps the current (acyclic) ordering and is counted as a fallback in solve_outcomes
 
         solve_time.append(solve_t)
 
@@ -157,41 +255,32 @@ def main():
             draw_ADG(ADG, robots, "ADG after MILP ADG | k = {}".format(k))
             plt.show()
 
-        # check for cycles
-        try:
-            nx.find_cycle(ADG, orientation="original")
-            logger.warning("Cycle detected!!")
+        # check for cycles (maintained with the changed edges only)
+        if cycle_check.cycle is not None:
+            logger.warning("Cycle detected!! {}".format([(ADG_nodes.name(tail), ADG_nodes.name(head)) for tail, head in cycle_check.cycle]))
             raise Exception("ADG has a cycle => deadlock! something is wrong with optimization")
-        except nx.NetworkXNoCycle:
-            logger.debug("no cycle detected in ADG => no deadlock. good!")
-            pass
+        logger.debug("no cycle detected in ADG => no deadlock. good!")
 
 
-        if (k % delay_amount) == 0:
-            robot_IDs = np.arange(map_gen_robot_count)
-            robot_IDs_to_delay = np.random.choice(map_gen_robot_count, size=delayed_robot_cnt, replace=False)
+        previously_delayed = robot_IDs_to_delay
+        robot_IDs_to_delay = delays.robot_IDs_to_delay(k, robots)
+        if not np.array_equal(robot_IDs_to_delay, previously_delayed):
             logger.info("delaying robots (ID): {}".format(robot_IDs_to_delay))
+        if simulation == "events":
+            for robot_ID in robot_IDs_to_delay:
+                event_simulation.delay(robot_ID, event_interval)
 
         # Advance robots if possible (dependencies have been met)
-        for robot in robots:
-            # check if all dependencies have been met, to advance to next node
-            node_info = ADG.nodes[robot.current_node]["data"]
-            node_dependencies_list = list(ADG_reverse.neighbors(robot.current_node))
-            all_dependencies_completed = True
-            for dependency in node_dependencies_list:
-                if (ADG.nodes[dependency]["data"].status != Status.FINISHED):
-                    all_dependencies_completed = False
-
-            # if all dependencies are completed, the robot can advance!
-            if all_dependencies_completed and k > 0: # (robot.robot_ID == 2 or k > 5)
-                if (not (robot.robot_ID in robot_IDs_to_delay)): # or (k < 10 or k > 20)): # or (robot.robot_ID == 3 or k > 8):
-                    ADG.nodes[robot.current_node]["data"].status = Status.FINISHED
-                    robot.advance()
-
-            if not robot.is_done():
-                time_to_goal[robot.robot_ID] += 1
-            else:
+        if simulation == "events":
+            # process the node completions until the next ordering
+            for robot in event_simulation.run(until=(k+1)*event_interval):
                 robots_done[robot.robot_ID] = True
+                time_to_goal[robot.robot_ID] = float(event_simulation.completion_time[robot.robot_ID])
+        elif k > 0:
+            for robot in execution.step(robot_IDs_to_delay):
+                if robot.is_done():
+                    robots_done[robot.robot_ID] = True
+                    time_to_goal[robot.robot_ID] = k # steps before the one the robot is done in
 
         if show_visual:
             visualizer.redraw(robots, pause_length=0.001)
@@ -200,10 +289,16 @@ def main():
         k += 1
     # end of while loop
     print("DONE!")
+    for robot in robots:
+        if not robot.is_done():
+            if simulation == "events":
+                time_to_goal[robot.robot_ID] = float(event_simulation.time)
+            else:
+                time_to_goal[robot.robot_ID] = k
+    if milp_pool is not None:
+        milp_pool.shutdown()
 
-    total_time = 0
-    for idx, t in time_to_goal.items():
-        total_time += t
+    total_time = float(sum(time_to_goal.values()))
 
     
     logger.info("Total time to complete missions: {}".format(total_time))
@@ -212,29 +307,32 @@ def main():
     logger.info("Computation time:")
     logger.info(" - max: {}".format(max(solve_time)))
     logger.info(" - avg: {}".format(stat.mean(solve_time)))
+    if milp_cache is not None:
+        logger.info("MILP cache hits: {} / {}".format(milp_cache.hit_count(), len(milp_cache.step_hits)))
+    logger.info("MILP outcomes: {}".format(solve_outcomes.counts()))
 
     if save_file:
         # create data to save to YAML file
         simulation_results = {}
         simulation_results["parameters"] = {}
         simulation_results["parameters"]["H_control"] = H_control
+        simulation_results["parameters"]["H_prediction"] = H_prediction
         simulation_results["parameters"]["random seed"] = map_gen_seedval
         simulation_results["parameters"]["ECBS w"] = w
         simulation_results["parameters"]["solver"] = solver
+        simulation_results["parameters"]["solve time budget"] = solve_time_budget
         simulation_results["parameters"]["cost_function"] = cost_func_name
         # simulation_results["parameters"]["mu"] = mu
         # simulation_results["parameters"]["robust param"] = robust_param
         simulation_results["parameters"]["delay amount"] = delay_amount
         simulation_results["parameters"]["delayed_robot_cnt"] = delayed_robot_cnt
+        simulation_results["parameters"]["delay model"] = delay_model
+        simulation_results["parameters"]["simulation"] = simulation
         simulation_results["map details"] = {}
         simulation_results["map details"]["robot_count"] = map_gen_robot_count
         simulation_results["map details"]["seed val"] = map_gen_seedval
-        simulation_results["results"] = {}
-        simulation_results["results"]["comp time"] = {}
-        simulation_results["results"]["comp time"]["solve_time"] = [solve_time]
-        simulation_results["results"]["comp time"]["max"] = max(solve_time)
-        simulation_results["results"]["comp time"]["avg"] = stat.mean(solve_time)
-        simulation_results["results"]["total time"] = total_time
+        simulation_results["results"] = mission_results(time_to_goal, solve_time, solve_outcomes, milp_cache,
+                                                         event_simulation if simulation == "events" else None)
         logger.info(simulation_results["parameters"])
         file_name = pwd + "/results/" + save_file_location + "/Costfunc_" + cost_func_name + "_AGVcnt_" + str(map_gen_robot_count) + "_mapseed_" + str(map_gen_seedval) + "_delayk_" + str(delay_amount) + "_H_" + str(H_control) + ".yaml"
 
@@ -13,6 +13,7 @@ import random
 
 sys.path.insert(1, "functions/")
 from planners import *
+from planner_service import PlannerPool
 from visualizers import *
 from robot_obj import Robot
 
@@ -24,6 +25,8 @@ def main():
     robot_TA_file_tmp = "data/tmp/robots_ta.yaml"    
     plans = run_ECBS_TA(map_file, robot_TA_file, w=1.2)
 
+    planner = PlannerPool(map_file) # keeps the map loaded for the replanning
+
     for robot, plan in plans.items():
         print(robot)
 
@@ -100,14 +103,17 @@ def main():
 
         if plans_must_change:
             print("Ein robot haz disobeyed ze commands! rE-OptImIzE zE PlAnS!")
-            with open(robot_file_tmp, "w") as robot_file:
-                yaml.safe_dump(robot_dict, robot_file, sort_keys=True, default_flow_style=False)
-            plans = run_CBS(map_file, robot_file_tmp)
+            starts = [(int(robot["start"][0]), int(robot["start"][1])) for robot in robot_dict["robots"]]
+            goals = [(int(robot["goal"][0]), int(robot["goal"][1])) for robot in robot_dict["robots"]]
+            # w=1.0: ECBS without suboptimality, the same (optimal) cost as
+            # the run_CBS replanning of before, ties broken by fewest conflicts
+            plans = planner.plan(starts, goals, w=1.0)
             print(" --> runtime: {}".format(plans["statistics"]["runtime"]))
         else:
             print("no plans changed: no re-calculation required")
         plt.pause(0.5)
 
+    planner.close()
     plt.show()
 
 if __name__ == "__main__":
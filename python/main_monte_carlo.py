@@ -0,0 +1,69 @@
+"""
+    Monte Carlo sweep of delay scenarios: plans once per map and seed, then
+    simulates many delay realizations, horizons and cost functions on the same
+    ADG in parallel (see functions/monte_carlo.py)
+"""
+
+import os
+import subprocess
+import logging
+import time
+
+from functions.planners import run_CBS
+from functions.objectives import make_objective
+from functions.monte_carlo import Scenario, plan_snapshot, run_scenarios, summarize, save_table
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(format='%(name)s - %(levelname)s :: %(message)s', level=logging.INFO)
+
+def main():
+    thread_number = 1
+    processes = os.cpu_count()
+    w = 3.5 # ECBS sub-optimality bound
+    save_file_location = "monte_carlo"
+
+    delay_seeds = range(20)      # delay realizations per map
+    cost_func_names = ["cumulative"]
+    for cost_func_name in cost_func_names:
+        make_objective(cost_func_name) # fail before the first run
+
+    pwd = os.path.dirname(os.path.abspath(__file__))
+    results = []
+    for seedval in range(38,40):
+        for map_name in ["gazebo"]:
+            for robot_count in [20]: # number of AGVs
+                # Generate new map and plan once for all scenarios
+                subprocess.run(
+                    ["python",
+                    "data/generate_map.py",
+                    str(robot_count),
+                    str(seedval),
+                    str(thread_number),
+                    map_name],
+                    check=True)
+                fldr = map_name + str(thread_number)
+                plans = run_CBS(pwd + "/data/" + fldr + "/csv_map_yaml.yaml", pwd + "/data/" + fldr + "/csv_robots_yaml.yaml", w=w, thread_number=thread_number)
+                snapshot = plan_snapshot(plans)
+
+                scenarios = [Scenario(delay_seed, delay, round(0.2*robot_count), horizon, cost_func_name)
+                             for delay in [10]
+                             for horizon in [0,5]
+                             for cost_func_name in cost_func_names
+                             for delay_seed in delay_seeds]
+                start = time.perf_counter()
+                for result in run_scenarios(snapshot, scenarios, processes=processes):
+                    result["map"] = map_name
+                    result["robot_count"] = robot_count
+                    result["map seed"] = seedval
+                    results.append(result)
+                logger.info("{} scenarios on {} (seed {}, {} AGVs): {:.1f} s".format(len(scenarios), map_name, seedval, robot_count, time.perf_counter() - start))
+
+    os.makedirs(pwd + "/results/" + save_file_location, exist_ok=True)
+    save_table(results, pwd + "/results/" + save_file_location + "/scenarios.csv")
+    summary = summarize(results, keys=("map", "robot_count", "H_control", "delay_amount", "cost_func", "ordering_solver"))
+    save_table(summary, pwd + "/results/" + save_file_location + "/summary.csv")
+    for row in summary:
+        logger.info(row)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+import unittest
+import glob
+import os
+import yaml
+
+from functions.adg import determine_ADG, analyze_ADG
+
+DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data")
+
+def load_plans(tmp, robot_count=None):
+    with open(os.path.join(DATA, tmp, "output.yaml")) as output_file:
+        plans = yaml.safe_load(output_file)
+    if robot_count is not None:
+        plans["schedule"] = dict(list(plans["schedule"].items())[:robot_count])
+    return plans
+
+class TestADG(unittest.TestCase):
+
+    def assertSameADG(self, plans):
+        ADG_pairwise, _, _ = determine_ADG(plans, spatial_index=False)
+        ADG_indexed, _, _ = determine_ADG(plans, spatial_index=True)
+        self.assertEqual(list(ADG_pairwise.nodes()), list(ADG_indexed.nodes()))
+        self.assertEqual(list(ADG_pairwise.edges(data=True)), list(ADG_indexed.edges(data=True)))
+
+    def test_indexed_type_2_edges_gazebo(self):
+        self.assertSameADG(load_plans("tmp1"))
+
+    def test_indexed_type_2_edges_50(self):
+        self.assertSameADG(load_plans("tmp5", robot_count=30))
+
+    def test_single_node_plan(self):
+        plans = {"schedule": {
+            "agent0": [{"x": 0, "y": 0, "t": 0}],
+            "agent1": [{"x": 1, "y": 0, "t": 0}, {"x": 0, "y": 0, "t": 1}, {"x": 0, "y": 1, "t": 2}]}}
+        self.assertSameADG(plans)
+
+    def test_indexed_grouping(self):
+        # every bundled plan, cut to 30 robots to keep the scan fast
+        for plan_file in sorted(glob.glob(os.path.join(DATA, "tmp*", "output.yaml"))):
+            tmp = os.path.basename(os.path.dirname(plan_file))
+            with self.subTest(plan=tmp):
+                plans = load_plans(tmp, robot_count=30)
+                ADG, _, _ = determine_ADG(plans)
+                _, _, groups_scan = analyze_ADG(ADG, plans, indexed_grouping=False)
+                _, _, groups_indexed = analyze_ADG(ADG, plans, indexed_grouping=True)
+                self.assertEqual(len(groups_scan), len(groups_indexed))
+                for group_scan, group_indexed in zip(groups_scan, groups_indexed):
+                    self.assertEqual(group_scan.type, group_indexed.type)
+                    self.assertEqual(group_scan.edges, group_indexed.edges)
+                    self.assertEqual(group_scan.reverse_edges, group_indexed.reverse_edges)
+                    self.assertEqual(group_scan.first_edge_tail, group_indexed.first_edge_tail)
+                    self.assertEqual(group_scan.first_edge_head, group_indexed.first_edge_head)
+
+    def test_integer_node_IDs(self):
+        # the baseline named the nodes "p_<robot>_<index>" and pointed the
+        # reverse edge of a group that blocks a robot's first node at
+        # "p_<robot>_-1"; such groups are now not reversible
+        with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "baseline_adg.yaml")) as baseline_file:
+            baseline = yaml.safe_load(baseline_file)
+        plans = {"schedule": baseline["schedule"]}
+        ADG, robot_plan, _ = determine_ADG(plans)
+        _, _, groups = analyze_ADG(ADG, plans)
+        ADG_nodes = ADG.graph["nodes"]
+        name = ADG_nodes.name
+        names = lambda edges: [[name(tail), name(head)] for tail, head in edges]
+
+        self.assertEqual(sorted([name(node), int(ADG_nodes.time[node]), ADG_nodes.s_loc[node].tolist(), ADG_nodes.g_loc[node].tolist()] for node in ADG.nodes()),
+                         sorted([node_ID] + data for node_ID, data in baseline["nodes"].items()))
+        self.assertEqual(sorted([name(tail), name(head), edge["type"]] for tail, head, edge in ADG.edges(data=True)), sorted(baseline["edges"]))
+        self.assertEqual({robot_ID: [name(node) for node in plan["nodes"]] for robot_ID, plan in robot_plan.items()}, baseline["robot_plans"])
+
+        self.assertEqual(len(groups), len(baseline["groups"]))
+        self.assertEqual({group.type.name for group in groups}, {"single", "same", "opposite"})
+        not_reversible = 0
+        for group, baseline_group in zip(groups, baseline["groups"]):
+            self.assertEqual(group.type.name, baseline_group["type"])
+            self.assertEqual(names(group.edges), baseline_group["edges"])
+            self.assertEqual(name(group.first_edge_tail), baseline_group["first_edge_tail"])
+            self.assertEqual(name(group.first_edge_head), baseline_group["first_edge_head"])
+            reverse_edges = [edge for edge in baseline_group["reverse_edges"] if not edge[1].endswith("_-1")]
+            self.assertEqual(group.reversible, len(reverse_edges) == len(baseline_group["reverse_edges"]))
+            self.assertEqual(names(group.reverse_edges), reverse_edges)
+            not_reversible += not group.reversible
+        self.assertGreater(not_reversible, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+import unittest
+import random
+import networkx as nx
+
+from functions.adg_cycle_check import ADGCycleCheck
+from test_milp_formulation import setup_simulation
+
+class TestADGCycleCheck(unittest.TestCase):
+
+    def assertValidOrder(self, cycle_check):
+        for tail, head in cycle_check.ADG.edges():
+            self.assertLess(cycle_check.order[tail], cycle_check.order[head])
+
+    def test_random_edges(self):
+        random.seed(0)
+        graph = nx.DiGraph()
+        graph.add_nodes_from(range(60))
+        cycle_check = ADGCycleCheck(graph)
+        for _ in range(400):
+            tail, head = random.sample(range(60), 2)
+            if graph.has_edge(tail, head):
+                cycle_check.remove_edge(tail, head)
+                continue
+            cycle = cycle_check.add_edge(tail, head)
+            if cycle is None:
+                self.assertTrue(nx.is_directed_acyclic_graph(graph))
+                self.assertValidOrder(cycle_check)
+            else:
+                # the reported edges form a closed path through the new edge
+                self.assertIn((tail, head), cycle)
+                self.assertTrue(all(graph.has_edge(*edge) for edge in cycle))
+                self.assertTrue(all(cycle[idx][1] == cycle[(idx+1) % len(cycle)][0] for idx in range(len(cycle))))
+                cycle_check.remove_edge(tail, head)
+                self.assertIsNone(cycle_check.cycle)
+
+    def test_reversed_dependency(self):
+        ADG, _, dependency_groups = setup_simulation("tmp1")
+        cycle_check = ADGCycleCheck(ADG)
+        self.assertIsNone(cycle_check.cycle)
+        self.assertValidOrder(cycle_check)
+
+        # a dependency and its reverse edge form a cycle with the robots' plans
+        dependency_group = dependency_groups[0]
+        tail, head = dependency_group.reverse_edges[0]
+        self.assertIsNotNone(cycle_check.add_edge(tail, head, type=2))
+        cycle_check.remove_edge(tail, head)
+        self.assertIsNone(cycle_check.cycle)
+        self.assertValidOrder(cycle_check)
+
+if __name__ == "__main__":
+    unittest.main()
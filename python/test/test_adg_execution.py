@@ -0,0 +1,34 @@
+import unittest
+
+from functions.adg_cycle_check import ADGCycleCheck
+from functions.adg_execution import ADGExecution
+from functions.ordering_heuristic import solve_heuristic
+from test_milp_formulation import setup_simulation, advance_robots
+
+class TestADGExecution(unittest.TestCase):
+
+    def test_same_steps_as_scan(self):
+        # the scan over all robots (advance_robots) and the event-driven
+        # execution advance the same robots, also when the ordering changes
+        simulations = []
+        for _ in range(2):
+            ADG, robots, dependency_groups = setup_simulation("tmp4", robot_count=40)
+            cycle_check = ADGCycleCheck(ADG)
+            execution = ADGExecution(ADG, robots)
+            cycle_check.listeners.append(execution)
+            simulations.append((ADG, robots, dependency_groups, cycle_check, execution))
+
+        for k in range(1, 150):
+            delayed_robot_IDs = range(k % 5, 40, 5)
+            positions = []
+            for idx, (ADG, robots, dependency_groups, cycle_check, execution) in enumerate(simulations):
+                solve_heuristic(robots, dependency_groups, ADG, 10, cycle_check=cycle_check)
+                if idx == 0:
+                    advance_robots(ADG, robots, delayed_robot_IDs)
+                else:
+                    execution.step(delayed_robot_IDs)
+                positions.append([(robot.current_idx, robot.is_done()) for robot in robots])
+            self.assertEqual(positions[0], positions[1])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+
+from functions.delay_models import make_delay_model, load_delay_trace, draw_durations
+from functions.robot import Robot
+
+class TestDelayModels(unittest.TestCase):
+
+    def test_interval_matches_step_draws(self):
+        model = make_delay_model("interval", 20, 23, seed=3, delay_amount=5, delayed_robot_cnt=4)
+        np.random.seed(3)
+        for k in range(23):
+            if k % 5 == 0:
+                robot_IDs_to_delay = np.random.choice(20, size=4, replace=False)
+            self.assertEqual(sorted(robot_IDs_to_delay), list(model.robot_IDs_to_delay(k, [])))
+        self.assertEqual(len(model.robot_IDs_to_delay(23, [])), 0)
+
+    def test_bernoulli_rate(self):
+        model = make_delay_model("bernoulli", 50, 400, seed=1, p=0.1)
+        self.assertAlmostEqual(model.delayed.mean(), 0.1, delta=0.01)
+
+    def test_stall_durations(self):
+        rng = np.random.RandomState(0)
+        self.assertAlmostEqual(draw_durations(rng, 100000, 4.0).mean(), 4.0, delta=0.05)
+        pareto = draw_durations(rng, 100000, 4.0, distribution="pareto", pareto_shape=2.5)
+        self.assertGreaterEqual(pareto.min(), 1)
+        self.assertGreater(pareto.max(), 40)
+        model = make_delay_model("stall", 10, 300, seed=2, rate=0.02, mean_duration=6)
+        self.assertTrue(0.0 < model.delayed.mean() < 0.2)
+
+    def test_trace_replay(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            file_name = os.path.join(tmp, "trace.csv")
+            with open(file_name, "w") as trace_file:
+                trace_file.write("step,robot,duration\n2,1,3\n4,1,2\n0,0,1\n9,5,4\n")
+            self.assertEqual(load_delay_trace(file_name)[0], (2, 1, 3))
+            model = make_delay_model("trace", 3, 8, trace=file_name)
+        self.assertEqual(list(np.flatnonzero(model.delayed[:, 1])), [2, 3, 4, 5])
+        self.assertEqual(list(np.flatnonzero(model.delayed[:, 0])), [0])
+        self.assertEqual(model.delayed.sum(), 5)
+
+    def test_zone_delays_robots_inside(self):
+        plan = {"nodes": [0, 1], "positions": [{"x": 1, "y": 1}, {"x": 2, "y": 1}]}
+        robots = [Robot(0, plan, None, {"x": 2, "y": 1}),
+                  Robot(1, {"nodes": [2], "positions": [{"x": 8, "y": 8}]}, None, {"x": 8, "y": 8})]
+        model = make_delay_model("zone", 2, 50, seed=0, zones=[(0, 0, 3, 3)], rate=0.1)
+        congested_steps = np.flatnonzero(model.delayed[:, 0])
+        self.assertGreater(len(congested_steps), 0)
+        self.assertEqual(list(model.robot_IDs_to_delay(congested_steps[0], robots)), [0])
+
+    def test_unknown_model(self):
+        with self.assertRaises(ValueError):
+            make_delay_model("gaussian", 10, 10)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+import os
+import tempfile
+import unittest
+import networkx as nx
+import numpy as np
+import yaml
+from mip import Model
+
+from functions.adg_cycle_check import ADGCycleCheck
+from functions.adg_execution import ADGExecution
+from functions.adg_node import Status
+from functions.event_simulation import EventSimulation, node_durations
+from functions.milp_formulation import MILPCache, MILPFormulation, SolveOutcomes, solve_MILP
+from functions.ordering_heuristic import solve_heuristic
+from functions.process_results import save_to_yaml
+from main_ECBS import mission_results
+from test_milp_formulation import setup_simulation
+
+class TestEventSimulation(unittest.TestCase):
+
+    def setup(self, tmp, robot_count, robot_speeds=None):
+        ADG, robots, dependency_groups = setup_simulation(tmp, robot_count=robot_count)
+        cycle_check = ADGCycleCheck(ADG)
+        execution = ADGExecution(ADG, robots)
+        cycle_check.listeners.append(execution)
+        durations = node_durations(ADG.graph["nodes"], robot_speeds)
+        return ADG, robots, dependency_groups, cycle_check, EventSimulation(robots, execution, durations)
+
+    def test_single_robot(self):
+        ADG, robots, _, _, simulation = self.setup("tmp1", 1, robot_speeds=[2.0])
+        simulation.delay(0, 3.0)
+        simulation.run()
+        self.assertAlmostEqual(simulation.completion_time[0], 0.5*len(robots[0].plan_nodes) + 3.0)
+        self.assertEqual(simulation.event_count, len(robots[0].plan_nodes))
+
+    def test_delay_while_waiting(self):
+        ADG, robots, _, _, simulation = self.setup("tmp1", 20)
+        simulation.run()
+        reference = dict(simulation.completion_time)
+
+        ADG, robots, _, _, simulation = self.setup("tmp1", 20)
+        waiting_delays = 0
+        k = 0
+        while not simulation.is_done():
+            for robot in robots:
+                if not robot.is_done() and robot.robot_ID not in simulation.running and robot.robot_ID not in simulation.execution.ready:
+                    simulation.delay(robot.robot_ID, 1.0) # waits for a dependency: no time lost
+                    waiting_delays += 1
+            k += 1
+            simulation.run(until=0.5*k)
+        self.assertGreater(waiting_delays, 0)
+        self.assertEqual(simulation.completion_time, reference)
+
+    def test_reordered_execution(self):
+        speeds = np.linspace(0.5, 1.5, 30)
+        ADG, robots, dependency_groups, cycle_check, simulation = self.setup("tmp4", 30, robot_speeds=speeds)
+        nodes = ADG.graph["nodes"]
+        interval = 0
+        while not simulation.is_done():
+            solve_heuristic(robots, dependency_groups, ADG, 5, cycle_check=cycle_check)
+            self.assertIsNone(cycle_check.cycle)
+            interval += 1
+            simulation.run(until=interval)
+        self.assertTrue(nx.is_directed_acyclic_graph(ADG))
+        self.assertTrue(np.all(nodes.status == Status.FINISHED))
+        self.assertEqual(simulation.event_count, len(nodes))
+        for robot in robots:
+            self.assertTrue(robot.is_done())
+            self.assertGreaterEqual(simulation.completion_time[robot.robot_ID], len(robot.plan_nodes)/speeds[robot.robot_ID] - 1e-9)
+
+    def test_results_yaml(self):
+        # the "events" simulation of main_ECBS up to its results YAML file
+        speeds = np.random.RandomState(1).uniform(0.5, 1.5, size=10)
+        ADG, robots, dependency_groups, cycle_check, simulation = self.setup("tmp5", 10, robot_speeds=speeds)
+        formulation = MILPFormulation(Model())
+        cache = MILPCache()
+        outcomes = SolveOutcomes()
+        solve_time = []
+        time_to_goal = {}
+        k = 0
+        while not simulation.is_done():
+            _, solve_t = solve_MILP(robots, dependency_groups, ADG, None, 5, None, formulation, None, cache=cache, cycle_check=cycle_check, outcomes=outcomes)
+            solve_time.append(solve_t)
+            simulation.delay(k % len(robots), 1.0)
+            for robot in simulation.run(until=k + 1.0):
+                time_to_goal[robot.robot_ID] = float(simulation.completion_time[robot.robot_ID])
+            k += 1
+        for completion_time in simulation.completion_time.values():
+            self.assertIs(type(completion_time), float)
+
+        results = mission_results(time_to_goal, solve_time, outcomes, cache, simulation)
+        with tempfile.TemporaryDirectory() as tmp:
+            save_to_yaml({"results": results}, os.path.join(tmp, "results.yaml"))
+            with open(os.path.join(tmp, "results.yaml")) as yaml_file:
+                saved = yaml.safe_load(yaml_file)["results"]
+        self.assertAlmostEqual(saved["total time"], sum(simulation.completion_time.values()))
+        self.assertEqual(saved["events"], len(ADG.graph["nodes"]))
+        self.assertEqual(saved["MILP cache"]["hits"] + saved["MILP cache"]["misses"], k)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,50 @@
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+
+from functions.map_distances import distance_field, load_distance_fields, load_map, update_distance_fields, UNREACHABLE, FIELDS_FILE
+
+DATA = os.path.join(os.path.dirname(__file__), "../data/gazebo1")
+
+class TestMapDistances(unittest.TestCase):
+
+    def test_cache(self):
+        free = load_map(DATA + "/csv_map_yaml.yaml")
+        cells = list(zip(*np.nonzero(free)))[::25]
+        with tempfile.TemporaryDirectory() as tmp:
+            csv_map_file = os.path.join(tmp, "csv_map.csv")
+            shutil.copy(DATA + "/csv_map.csv", csv_map_file)
+            self.assertIsNone(load_distance_fields(tmp, csv_map_file))
+
+            fields = update_distance_fields(tmp, csv_map_file, free, cells + cells[:2])
+            self.assertIsInstance(fields.fields, np.memmap)
+            self.assertEqual(len(fields.cells), len(cells))
+            for cell in cells:
+                self.assertTrue(np.array_equal(fields.field(cell), distance_field(free, cell)))
+            self.assertIsNone(fields.field((0, 0)))
+
+            # unchanged map: the stored fields are kept
+            modified = os.stat(os.path.join(tmp, FIELDS_FILE)).st_mtime_ns
+            update_distance_fields(tmp, csv_map_file, free, cells)
+            self.assertEqual(os.stat(os.path.join(tmp, FIELDS_FILE)).st_mtime_ns, modified)
+
+            # changed map CSV: rebuilt
+            with open(csv_map_file, "a") as csv_file:
+                csv_file.write("\n")
+            self.assertIsNone(load_distance_fields(tmp, csv_map_file))
+            fields = update_distance_fields(tmp, csv_map_file, free, cells[:3])
+            self.assertEqual(len(fields.cells), 3)
+            self.assertIsNotNone(load_distance_fields(tmp, csv_map_file))
+
+    def test_unreachable(self):
+        free = np.ones((3, 3), dtype=bool)
+        free[:, 1] = False
+        distance = distance_field(free, (0, 0))
+        self.assertEqual(distance[2, 0], 2)
+        self.assertEqual(distance[0, 2], UNREACHABLE)
+        self.assertEqual(distance[0, 1], UNREACHABLE)
+
+if __name__ == "__main__":
+    unittest.main()
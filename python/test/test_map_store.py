@@ -0,0 +1,52 @@
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+import yaml
+
+from functions.map_store import GridMap, MapStore, grid_file
+
+DATA = os.path.join(os.path.dirname(__file__), "../data/gazebo1")
+
+class TestMapStore(unittest.TestCase):
+
+    def test_grid_map(self):
+        with open(DATA + "/csv_map_yaml.yaml") as yaml_file:
+            map_config = yaml.safe_load(yaml_file)["map"]
+        with tempfile.TemporaryDirectory() as tmp:
+            map_file = os.path.join(tmp, "csv_map_yaml.yaml")
+            shutil.copy(DATA + "/csv_map_yaml.yaml", map_file)
+            store = MapStore()
+            grid_map = store.get(map_file)
+            self.assertIs(store.get(map_file), grid_map)
+            self.assertTrue(os.path.exists(grid_file(map_file)))
+
+            self.assertEqual(list(grid_map.dimensions), map_config["dimensions"])
+            self.assertEqual(sorted(grid_map.obstacles.tolist()), sorted(map_config["obstacles"]))
+            for array in [grid_map.free, grid_map.indptr, grid_map.indices]:
+                self.assertFalse(array.flags.writeable)
+
+            # a new process loads the binary grid
+            cached = MapStore().get(map_file)
+            for name in ["free", "indptr", "indices"]:
+                self.assertTrue(np.array_equal(getattr(cached, name), getattr(grid_map, name)))
+
+            # changed map file: reloaded and the binary grid is rebuilt
+            map_config["obstacles"] = map_config["obstacles"][1:]
+            with open(map_file, "w") as yaml_file:
+                yaml.safe_dump({"map": map_config}, yaml_file)
+            self.assertEqual(len(store.get(map_file).obstacles), len(map_config["obstacles"]))
+            self.assertEqual(len(MapStore().get(map_file).obstacles), len(map_config["obstacles"]))
+
+    def test_adjacency(self):
+        free = np.ones((3, 4), dtype=bool)
+        free[1, 1] = False
+        grid_map = GridMap(free)
+        self.assertEqual(sorted(map(tuple, grid_map.neighbours((0, 1)).tolist())), [(0, 0), (0, 2)])
+        self.assertEqual(sorted(map(tuple, grid_map.neighbours((1, 2)).tolist())), [(0, 2), (1, 3), (2, 2)])
+        self.assertEqual(len(grid_map.neighbours((1, 1))), 0)
+        self.assertEqual(grid_map.indptr[-1], 2*(free[1:, :] & free[:-1, :]).sum() + 2*(free[:, 1:] & free[:, :-1]).sum())
+
+if __name__ == "__main__":
+    unittest.main()
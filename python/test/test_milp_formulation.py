@@ -0,0 +1,269 @@
+import os
+import tempfile
+import unittest
+import networkx as nx
+import yaml
+from mip import Model, OptimizationStatus
+
+from functions.adg import determine_ADG, analyze_ADG
+from functions.adg_node import Status
+from functions.robot import Robot
+from functions.objectives import make_objective
+from functions.milp_formulation import MILPFormulation, define_objective, solve_full_MILP, update_ADG_ordering, determine_switchable_groups, determine_components, solve_MILP, prediction_horizon, SolveOutcomes, ConstraintRows, MILPCache
+from functions.process_results import save_to_yaml
+from test_adg import load_plans
+
+def setup_simulation(tmp, robot_count=None):
+    plans = load_plans(tmp, robot_count)
+    ADG, robot_plan, goal_positions = determine_ADG(plans)
+    _, _, dependency_groups = analyze_ADG(ADG, plans)
+    robots = [Robot(robot_ID, robot_plan[robot_ID], None, goal_positions[robot_ID]) for robot_ID in robot_plan]
+    return ADG, robots, dependency_groups
+
+def advance_robots(ADG, robots, delayed_robot_IDs=()):
+    nodes = ADG.graph["nodes"]
+    ADG_reverse = ADG.reverse(copy=False)
+    for robot in robots:
+        if robot.is_done() or robot.robot_ID in delayed_robot_IDs:
+            continue
+        if all(nodes.status[node] == Status.FINISHED for node in ADG_reverse.neighbors(robot.current_node)):
+            nodes.status[robot.current_node] = Status.FINISHED
+            robot.advance()
+
+class TestMILPFormulation(unittest.TestCase):
+
+    def test_components_partition(self):
+        ADG, robots, dependency_groups = setup_simulation("tmp5", robot_count=30)
+        switchable_dependency_groups, _ = determine_switchable_groups(robots, dependency_groups, ADG.graph["nodes"], 5)
+        components = determine_components(robots, switchable_dependency_groups)
+
+        robot_IDs = [robot_ID for component_robot_IDs, _ in components for robot_ID in component_robot_IDs]
+        self.assertEqual(len(robot_IDs), len(set(robot_IDs)))
+        component_groups = [group for _, groups in components for group in groups]
+        self.assertEqual(sorted(map(id, component_groups)), sorted(map(id, switchable_dependency_groups)))
+        for component_robot_IDs, groups in components:
+            for group in groups:
+                self.assertIn(group.robot_blocking, component_robot_IDs)
+                self.assertIn(group.robot_blocked, component_robot_IDs)
+
+    def test_switchable_group_thresholds(self):
+        ADG, robots, dependency_groups = setup_simulation("tmp5", robot_count=30)
+        nodes = ADG.graph["nodes"]
+        for step in range(6):
+            for H_control in [1, 5]:
+                switchable = set(map(id, determine_switchable_groups(robots, dependency_groups, nodes, H_control, ADG.graph["group_thresholds"])[0]))
+                for group in dependency_groups:
+                    # per edge, like determine_switchable_groups used to
+                    expected = (group.reversible
+                                and all(nodes.index[v] > nodes.index[robots[group.robot_blocked].current_node] for _, v in group.edges)
+                                and all(nodes.index[v] > nodes.index[robots[group.robot_blocking].current_node] for _, v in group.reverse_edges)
+                                and nodes.index[group.first_edge_head] <= nodes.index[robots[int(nodes.robot[group.first_edge_head])].current_node] + H_control)
+                    self.assertEqual(id(group) in switchable, expected)
+            advance_robots(ADG, robots, delayed_robot_IDs=range(0, 30, 3))
+
+    def test_decomposed_orientation_is_acyclic(self):
+        ADG, robots, dependency_groups = setup_simulation("tmp1")
+        m = Model()
+        for k in range(40):
+            m.clear()
+            res, _ = solve_MILP(robots, dependency_groups, ADG, None, 5, None, m, None, decompose=True)
+            self.assertIsNotNone(res)
+            self.assertTrue(nx.is_directed_acyclic_graph(ADG))
+            advance_robots(ADG, robots, delayed_robot_IDs=range(k % 4, len(robots), 4))
+
+    def test_tight_big_M(self):
+        ADG, robots, dependency_groups = setup_simulation("tmp5", robot_count=30)
+        tight = MILPFormulation(Model(), big_M="tight")
+        for k in range(30):
+            directions = [group.original_direction for group in dependency_groups]
+            fixed = Model()
+            solve_MILP(robots, dependency_groups, ADG, None, 5, None, fixed, None)
+            for group, direction in zip(dependency_groups, directions):
+                group.original_direction = direction
+            solve_MILP(robots, dependency_groups, ADG, None, 5, None, tight, None)
+            self.assertAlmostEqual(tight.model.objective_value, fixed.objective_value, delta=1e-4*fixed.objective_value)
+            advance_robots(ADG, robots, delayed_robot_IDs=range(k % 4, len(robots), 4))
+
+    def test_compressed_time_variables(self):
+        ADG, robots, dependency_groups = setup_simulation("tmp5", robot_count=20)
+        formulations = {compress: MILPFormulation(Model(), compress=compress) for compress in [False, True]}
+        for k in range(10):
+            directions = [group.original_direction for group in dependency_groups]
+            oriented = {}
+            for compress, formulation in formulations.items():
+                for group, direction in zip(dependency_groups, directions):
+                    group.original_direction = direction
+                solve_MILP(robots, dependency_groups, ADG, None, 5, None, formulation, None, cost_func="greedy", max_mip_gap=1e-9)
+                oriented[compress] = [group.original_direction for group in dependency_groups]
+            self.assertEqual(oriented[True], oriented[False])
+            compressed, full = formulations[True], formulations[False]
+            self.assertAlmostEqual(compressed.model.objective_value, full.model.objective_value, delta=1e-6*full.model.objective_value)
+            self.assertLessEqual(len(compressed.node_variables), len(full.node_variables))
+            # every node of the compressed model's schedule respects its plan
+            completion_times = compressed.completion_times()
+            for robot in robots:
+                remaining_plan = robot.get_remaining_plan()
+                for node, next_node in zip(remaining_plan, remaining_plan[1:]):
+                    self.assertGreater(completion_times[next_node], completion_times[node])
+            advance_robots(ADG, robots, delayed_robot_IDs=range(k % 4, len(robots), 4))
+        self.assertLess(len(formulations[True].node_variables), len(formulations[False].node_variables))
+
+    def test_prediction_horizon(self):
+        ADG, robots, dependency_groups = setup_simulation("tmp5", robot_count=30)
+        horizon, full = MILPFormulation(Model()), MILPFormulation(Model())
+        for k in range(10):
+            res, _ = solve_MILP(robots, dependency_groups, ADG, None, 5, 10, horizon, None)
+            self.assertIsNotNone(res)
+            self.assertTrue(nx.is_directed_acyclic_graph(ADG))
+            switchable_dependency_groups, fixed_dependency_groups = determine_switchable_groups(robots, dependency_groups, ADG.graph["nodes"], 5)
+            full.update(robots, switchable_dependency_groups, fixed_dependency_groups)
+            self.assertLess(horizon.model.num_rows, full.model.num_rows)
+            self.assertLess(len(horizon.node_variables), len(full.node_variables))
+            advance_robots(ADG, robots, delayed_robot_IDs=range(k % 4, len(robots), 4))
+        self.assertIsNone(prediction_horizon(float("nan")))
+        with self.assertRaises(ValueError):
+            prediction_horizon(-1)
+
+    def test_time_budget_fallback(self):
+        ADG, robots, dependency_groups = setup_simulation("tmp5", robot_count=30)
+        formulation = MILPFormulation(Model())
+        outcomes = SolveOutcomes()
+        edges = set(ADG.edges())
+        # no time left: the current ordering is kept
+        res, _ = solve_MILP(robots, dependency_groups, ADG, None, 5, None, formulation, None, time_budget=0.0, outcomes=outcomes)
+        self.assertEqual(res, OptimizationStatus.NO_SOLUTION_FOUND) # the solver's status, not the fallback's
+        self.assertEqual(set(ADG.edges()), edges)
+        self.assertEqual(outcomes.steps, ["fallback"])
+        for k in range(5):
+            res, _ = solve_MILP(robots, dependency_groups, ADG, None, 5, None, formulation, None, time_budget=60.0, outcomes=outcomes)
+            self.assertIsNotNone(res)
+            self.assertTrue(nx.is_directed_acyclic_graph(ADG))
+            advance_robots(ADG, robots, delayed_robot_IDs=range(k % 4, len(robots), 4))
+        self.assertEqual(outcomes.counts(), {"optimal": 5, "incumbent": 0, "fallback": 1, "skipped": 0})
+        with self.assertRaises(ValueError):
+            outcomes.record("aborted")
+
+    def test_cache(self):
+        from main_ECBS import mission_results
+        ADG, robots, dependency_groups = setup_simulation("tmp5", robot_count=20)
+        nodes = ADG.graph["nodes"]
+        formulation = MILPFormulation(Model())
+        cache = MILPCache()
+        outcomes = SolveOutcomes()
+        solve_time = []
+        for k in range(2):
+            res, solve_t = solve_MILP(robots, dependency_groups, ADG, None, 5, None, formulation, None, cache=cache, outcomes=outcomes)
+            solve_time.append(solve_t)
+        # same inputs: skipped, the ordering is untouched
+        edges = set(ADG.edges())
+        res, solve_t = solve_MILP(robots, dependency_groups, ADG, None, 5, None, formulation, None, cache=cache, outcomes=outcomes)
+        solve_time.append(solve_t)
+        self.assertEqual(cache.step_hits[-1], 1)
+        self.assertEqual(outcomes.steps[-1], "skipped")
+        self.assertEqual(solve_t, 0.0)
+        self.assertEqual(set(ADG.edges()), edges)
+
+        # another orientation of a switchable group
+        switchable_dependency_groups, _ = determine_switchable_groups(robots, dependency_groups, nodes, 5)
+        fingerprint = cache.input_fingerprint(robots, switchable_dependency_groups, nodes, make_objective("cumulative"), 0.0)
+        self.assertEqual(fingerprint, cache.fingerprint)
+        group = switchable_dependency_groups[0]
+        group.original_direction = not group.original_direction
+        self.assertNotEqual(cache.input_fingerprint(robots, switchable_dependency_groups, nodes, make_objective("cumulative"), 0.0), fingerprint)
+        group.original_direction = not group.original_direction
+
+        # a robot of a switchable group advances (offset to the group)
+        robot = robots[group.robot_blocking]
+        nodes.status[robot.current_node] = Status.FINISHED
+        robot.advance()
+        self.assertNotEqual(cache.input_fingerprint(robots, switchable_dependency_groups, nodes, make_objective("cumulative"), 0.0), fingerprint)
+        res, solve_t = solve_MILP(robots, dependency_groups, ADG, None, 5, None, formulation, None, cache=cache, outcomes=outcomes)
+        solve_time.append(solve_t)
+        self.assertEqual(cache.step_hits, [0, 1, 1, 0])
+        self.assertTrue(nx.is_directed_acyclic_graph(ADG))
+
+        with tempfile.TemporaryDirectory() as tmp:
+            save_to_yaml({"results": mission_results({}, solve_time, outcomes, cache)}, os.path.join(tmp, "results.yaml"))
+            with open(os.path.join(tmp, "results.yaml")) as yaml_file:
+                saved = yaml.safe_load(yaml_file)["results"]
+        self.assertEqual(saved["MILP cache"], {"hits": 2, "misses": 2, "hit per step": [[0, 1, 1, 0]]})
+        self.assertEqual(saved["MILP outcomes"]["skipped"], 2)
+
+    def test_incremental_matches_scratch(self):
+        ADG, robots, dependency_groups = setup_simulation("tmp5", robot_count=20)
+        objective = make_objective("greedy")
+        incremental = MILPFormulation(Model())
+        switchable_sets = []
+        for k in range(12):
+            switchable_dependency_groups, fixed_dependency_groups = determine_switchable_groups(robots, dependency_groups, ADG.graph["nodes"], 5)
+            switchable_sets.append(set(switchable_dependency_groups))
+            scratch = Model()
+            res, incremental_values, _ = solve_full_MILP(robots, switchable_dependency_groups, fixed_dependency_groups, incremental, 0.0, objective, max_mip_gap=1e-9)
+            res, scratch_values, _ = solve_full_MILP(robots, switchable_dependency_groups, fixed_dependency_groups, scratch, 0.0, objective, max_mip_gap=1e-9)
+            self.assertAlmostEqual(incremental.model.objective_value, scratch.objective_value, delta=1e-6*scratch.objective_value)
+            self.assertEqual([round(value) for value in incremental_values], [round(value) for value in scratch_values])
+            update_ADG_ordering(ADG, switchable_dependency_groups, fixed_dependency_groups, incremental_values)
+            advance_robots(ADG, robots, delayed_robot_IDs=range(k % 4, len(robots), 4))
+        # groups entered and left the switchable set along the way
+        self.assertTrue(any(later - earlier for earlier, later in zip(switchable_sets, switchable_sets[1:])))
+        self.assertTrue(any(earlier - later for earlier, later in zip(switchable_sets, switchable_sets[1:])))
+
+    def test_warm_start(self):
+        ADG, robots, dependency_groups = setup_simulation("tmp5", robot_count=20)
+        for k in range(3):
+            advance_robots(ADG, robots, delayed_robot_IDs=range(k % 3, len(robots), 3))
+        switchable_dependency_groups, fixed_dependency_groups = determine_switchable_groups(robots, dependency_groups, ADG.graph["nodes"], 5)
+        self.assertGreater(len(switchable_dependency_groups), 0)
+        for cost_func in ["cumulative", "max"]:
+            formulation = MILPFormulation(Model())
+            milp_variables = formulation.update(robots, switchable_dependency_groups, fixed_dependency_groups)
+            define_objective(formulation, robots, milp_variables, cost_func)
+            m = formulation.model
+            start = formulation.current_orientation_start(robots, switchable_dependency_groups)
+            # every variable gets a value, and every constraint row holds
+            self.assertEqual(sorted(var.idx for var, _ in start), list(range(m.num_cols)))
+            values = {var.idx: value for var, value in start}
+            for constr in m.constrs:
+                lin_expr = constr.expr
+                activity = lin_expr.const + sum(coeff*values[var.idx] for var, coeff in lin_expr.expr.items())
+                if lin_expr.sense == "<":
+                    self.assertLessEqual(activity, 1e-6, (cost_func, constr.name))
+                else:
+                    self.assertGreaterEqual(activity, -1e-6, (cost_func, constr.name))
+            # CBC takes it as an incumbent
+            m.verbose = 0
+            m.start = start
+            m.optimize(max_seconds=0.5, max_nodes=1)
+            self.assertGreater(m.num_solutions, 0)
+
+        formulation = MILPFormulation(Model())
+        solve_MILP(robots, dependency_groups, ADG, None, 5, None, formulation, None, cost_func="max", max_mip_gap=0.05)
+        self.assertAlmostEqual(formulation.model.max_mip_gap, 0.05)
+
+    def test_constraint_rows(self):
+        m = Model()
+        t = [m.add_var(var_type="C") for _ in range(3)]
+        b = m.add_var(var_type="B")
+        rows = ConstraintRows()
+        rows.add([[t[1].idx, t[0].idx]], [1.0, -1.0], 2.0, ["link"])
+        rows.add([], [1.0, -1.0], 0.01, [])
+        rows.add([[t[2].idx, t[1].idx, b.idx], [t[0].idx, t[2].idx, b.idx]], [[1.0, -1.0, 5.0], [1.0, -1.0, -5.0]], [0.01, -4.99], ["edge", "reverse edge"])
+        indptr, columns, coeffs, rhs = rows.csr()
+        self.assertEqual(indptr.tolist(), [0, 2, 5, 8])
+        self.assertEqual(columns.tolist(), [1, 0, 2, 1, 3, 0, 2, 3])
+        self.assertEqual(coeffs.tolist(), [1.0, -1.0, 1.0, -1.0, 5.0, 1.0, -1.0, -5.0])
+        self.assertEqual(rhs.tolist(), [2.0, 0.01, -4.99])
+
+        constrs = rows.emit(m)
+        self.assertEqual([key for key, _ in constrs], ["link", "edge", "reverse edge"])
+        self.assertEqual(m.num_rows, 3)
+        reverse_edge = constrs[2][1]
+        self.assertEqual(reverse_edge.expr.expr, {t[0]: 1.0, t[2]: -1.0, b: -5.0})
+        self.assertAlmostEqual(reverse_edge.rhs, -4.99)
+
+    def test_unknown_big_M(self):
+        with self.assertRaises(ValueError):
+            MILPFormulation(Model(), big_M="indicator")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,29 @@
+import unittest
+import numpy as np
+
+from functions.adg_node import Status
+from functions.monte_carlo import Scenario, plan_snapshot, run_scenarios, summarize
+from test_adg import load_plans
+
+class TestMonteCarlo(unittest.TestCase):
+
+    def test_workers_match_serial(self):
+        snapshot = plan_snapshot(load_plans("tmp1"))
+        edges = sorted(snapshot["ADG"].edges())
+        scenarios = [Scenario(seed, 5, 2, H_control, "cumulative", ordering_solver="heuristic")
+                     for H_control in [0, 5] for seed in range(3)]
+        serial = run_scenarios(snapshot, scenarios)
+        parallel = run_scenarios(snapshot, scenarios, processes=2)
+        self.assertEqual([result["total time"] for result in serial], [result["total time"] for result in parallel])
+        self.assertEqual([result["seed"] for result in parallel], [scenario.seed for scenario in scenarios])
+
+        # the scenarios run on copies of the snapshot
+        self.assertEqual(sorted(snapshot["ADG"].edges()), edges)
+        self.assertTrue(np.all(snapshot["ADG"].graph["nodes"].status == Status.STAGED))
+
+        summary = summarize(serial)
+        self.assertEqual([row["H_control"] for row in summary], [0, 5])
+        self.assertEqual([row["runs"] for row in summary], [3, 3])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+import unittest
+from mip import Model
+
+from functions.milp_formulation import MILPFormulation, define_objective, determine_switchable_groups
+from functions.objectives import Objective, make_objective
+from test_milp_formulation import setup_simulation
+
+class TestObjectives(unittest.TestCase):
+
+    def solve(self, cost_func, H_control=5):
+        ADG, robots, dependency_groups = setup_simulation("tmp5", robot_count=20)
+        switchable_dependency_groups, fixed_dependency_groups = determine_switchable_groups(robots, dependency_groups, ADG.graph["nodes"], H_control)
+        formulation = MILPFormulation(Model(), incremental=False)
+        milp_variables = formulation.update(robots, switchable_dependency_groups, fixed_dependency_groups)
+        define_objective(formulation, robots, milp_variables, cost_func)
+        formulation.model.verbose = 0
+        formulation.model.optimize()
+        return formulation, robots, milp_variables
+
+    def test_names(self):
+        self.assertEqual(make_objective("cumulative"), Objective("cumulative"))
+        self.assertEqual(make_objective("bp_kb_5"), Objective("cumulative", switching_penalty=5))
+        self.assertEqual(make_objective("max_kb_2.5"), Objective("max", switching_penalty=2.5))
+        objective = Objective("greedy")
+        self.assertIs(make_objective(objective), objective)
+
+    def test_validation(self):
+        with self.assertRaises(ValueError):
+            make_objective("binary_penalty")
+        with self.assertRaises(ValueError):
+            Objective("cumulative", switching_penalty=-1)
+        with self.assertRaises(ValueError):
+            Objective("cumulative", priorities={0: -1.0})
+
+    def test_greedy_sums_node_times(self):
+        formulation, robots, milp_variables = self.solve("greedy")
+        node_time_sum = sum(formulation.completion_times().values())
+        self.assertAlmostEqual(formulation.model.objective_value, node_time_sum, places=4)
+
+    def test_priorities(self):
+        formulation, robots, milp_variables = self.solve(Objective("cumulative", priorities={0: 2.0}))
+        goal_times = [milp_variables["continuous"][robot.robot_ID][robot.get_goal_node()].x for robot in robots]
+        self.assertAlmostEqual(formulation.model.objective_value, sum(goal_times) + goal_times[0], places=4)
+
+    def test_makespan_constraints_added_once(self):
+        formulation = MILPFormulation(Model())
+        ADG, robots, dependency_groups = setup_simulation("tmp5", robot_count=20)
+        switchable_dependency_groups, fixed_dependency_groups = determine_switchable_groups(robots, dependency_groups, ADG.graph["nodes"], 5)
+        milp_variables = formulation.update(robots, switchable_dependency_groups, fixed_dependency_groups)
+        define_objective(formulation, robots, milp_variables, "max")
+        row_count = formulation.model.num_rows
+        milp_variables = formulation.update(robots, switchable_dependency_groups, fixed_dependency_groups)
+        define_objective(formulation, robots, milp_variables, "max")
+        self.assertEqual(formulation.model.num_rows, row_count)
+        define_objective(formulation, robots, milp_variables, "cumulative")
+        self.assertEqual(formulation.model.num_rows, row_count - len(robots))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,44 @@
+import unittest
+import networkx as nx
+
+from functions.milp_formulation import MILPCache, SolveOutcomes, determine_switchable_groups, earliest_completion_times
+from functions.objectives import make_objective
+from functions.ordering_heuristic import OrderingEvaluator, solve_heuristic
+from test_milp_formulation import setup_simulation, advance_robots
+
+class TestOrderingHeuristic(unittest.TestCase):
+
+    def test_evaluator_matches_longest_path(self):
+        ADG, robots, dependency_groups = setup_simulation("tmp5", robot_count=30)
+        switchable_dependency_groups, fixed_dependency_groups = determine_switchable_groups(robots, dependency_groups, ADG.graph["nodes"], 5)
+        evaluator = OrderingEvaluator(robots, switchable_dependency_groups, fixed_dependency_groups, make_objective("cumulative"))
+        reversed_groups = [idx % 3 == 0 for idx in range(len(switchable_dependency_groups))]
+        directions = {group: not reverse for group, reverse in zip(switchable_dependency_groups, reversed_groups)}
+        self.assertEqual(evaluator.completion_times(reversed_groups),
+                         earliest_completion_times(robots, dependency_groups, directions=directions))
+
+    def test_orientation_is_acyclic(self):
+        ADG, robots, dependency_groups = setup_simulation("tmp4", robot_count=50)
+        for k in range(40):
+            switchable_dependency_groups, fixed_dependency_groups = determine_switchable_groups(robots, dependency_groups, ADG.graph["nodes"], 10)
+            evaluator = OrderingEvaluator(robots, switchable_dependency_groups, fixed_dependency_groups, make_objective("cumulative"))
+            current_cost = evaluator.cost([not group.original_direction for group in switchable_dependency_groups])
+
+            res, _ = solve_heuristic(robots, dependency_groups, ADG, 10, time_budget=0.05 if k % 2 else None)
+            self.assertIsNotNone(res)
+            self.assertTrue(nx.is_directed_acyclic_graph(ADG))
+            new_cost = evaluator.cost([not group.original_direction for group in switchable_dependency_groups])
+            self.assertLessEqual(new_cost, current_cost + 1e-9)
+            advance_robots(ADG, robots, delayed_robot_IDs=range(k % 4, len(robots), 4))
+
+    def test_outcomes(self):
+        ADG, robots, dependency_groups = setup_simulation("tmp4", robot_count=50)
+        cache = MILPCache()
+        outcomes = SolveOutcomes()
+        solve_heuristic(robots, dependency_groups, ADG, 10, time_budget=0.0, outcomes=outcomes)
+        solve_heuristic(robots, dependency_groups, ADG, 10, cache=cache, outcomes=outcomes)
+        solve_heuristic(robots, dependency_groups, ADG, 10, cache=cache, outcomes=outcomes) # nothing changed
+        self.assertEqual(outcomes.steps, ["incumbent", "optimal", "skipped"])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,47 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+
+from functions.adg import determine_ADG
+from functions.plan_format import load_plans, read_plans, write_plans
+from test_adg import load_plans as load_yaml_plans
+
+class TestPlanFormat(unittest.TestCase):
+
+    def test_round_trip(self):
+        plans = load_yaml_plans("tmp1")
+        with tempfile.TemporaryDirectory() as tmp:
+            file_name = os.path.join(tmp, "output.plan")
+            write_plans(plans, file_name)
+            binary_plans = load_plans(file_name)
+            buffer = np.fromfile(file_name, dtype=np.uint8)
+        self.assertEqual(binary_plans["statistics"], plans["statistics"])
+        self.assertEqual(list(binary_plans["schedule"]), list(plans["schedule"]))
+        for plan, states in zip(plans["schedule"].values(), binary_plans["schedule"].values()):
+            self.assertEqual(states.tolist(), [[item["x"], item["y"], item["t"]] for item in plan])
+
+        # the plans are views of the buffer
+        for states in read_plans(buffer)["schedule"].values():
+            self.assertTrue(np.shares_memory(states, buffer))
+
+        ADG, robot_plan, goal_positions = determine_ADG(plans)
+        binary_ADG, binary_robot_plan, binary_goal_positions = determine_ADG(binary_plans)
+        self.assertEqual(list(ADG.edges(data=True)), list(binary_ADG.edges(data=True)))
+        self.assertEqual(robot_plan, binary_robot_plan)
+        self.assertEqual(goal_positions, binary_goal_positions)
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            read_plans(b"statistics:\n  cost: 1\n")
+        with tempfile.TemporaryDirectory() as tmp:
+            file_name = os.path.join(tmp, "output.plan")
+            write_plans({"schedule": {"agent0": np.zeros((2, 3), dtype=np.int32)}}, file_name)
+            with open(file_name, "rb") as plan_file:
+                buffer = plan_file.read()
+        self.assertEqual(read_plans(buffer)["schedule"]["agent0"].shape, (2, 3))
+        with self.assertRaises(ValueError):
+            read_plans(buffer[:-4])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,34 @@
+import os
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from functions.adg import determine_ADG
+from functions.planner_service import PlannerPool, load_robots
+
+ECBS = os.environ.get("ECBS_EXECUTABLE", os.path.join(os.path.dirname(__file__), "../../build/ecbs"))
+DATA = os.path.join(os.path.dirname(__file__), "../data/gazebo1")
+
+@unittest.skipUnless(os.path.exists(ECBS), "ecbs executable not built")
+class TestPlannerService(unittest.TestCase):
+
+    def test_pool(self):
+        starts, goals = load_robots(DATA + "/csv_robots_yaml.yaml")
+        with PlannerPool(DATA + "/csv_map_yaml.yaml", size=2, executable=ECBS) as pool:
+            with ThreadPoolExecutor(4) as executor:
+                costs = list(executor.map(lambda _: pool.plan(starts, goals, w=3.5)["statistics"]["cost"], range(6)))
+            self.assertEqual(len(set(costs)), 1)
+            self.assertLessEqual(len(pool.processes), 2)
+
+            plans = pool.plan(starts, goals, w=3.5)
+            self.assertEqual(len(plans["schedule"]), len(starts))
+            for (start, goal), plan in zip(zip(starts, goals), plans["schedule"].values()):
+                self.assertEqual((plan[0]["x"], plan[0]["y"]), start)
+                self.assertEqual((plan[-1]["x"], plan[-1]["y"]), goal)
+            determine_ADG(plans)
+
+            with self.assertRaises(ValueError):
+                pool.plan([(-1, 0)], [(0, 0)])
+            self.assertLessEqual(pool.plan(starts[:1], goals[:1])["statistics"]["cost"], len(plans["schedule"]["agent0"]) - 1)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+import os
+import unittest
+import numpy as np
+
+from functions.adg import determine_ADG
+from functions.planner_service import load_robots
+from functions.map_distances import distance_field, UNREACHABLE
+from functions.prioritized_planner import PrioritizedPlanner
+
+DATA = os.path.join(os.path.dirname(__file__), "../data/gazebo1")
+
+class TestPrioritizedPlanner(unittest.TestCase):
+
+    def assertValidPlans(self, plans, starts, goals):
+        states = list(plans["schedule"].values())
+        makespan = max(plan[-1, 2] for plan in states)
+        positions = np.zeros((len(states), makespan + 1, 2), dtype=np.int64)
+        for robot_idx, plan in enumerate(states):
+            self.assertEqual(tuple(plan[0, :2]), starts[robot_idx])
+            self.assertEqual(tuple(plan[-1, :2]), goals[robot_idx])
+            self.assertEqual(plan[:, 2].tolist(), list(range(len(plan))))
+            self.assertTrue(np.all(np.abs(np.diff(plan[:, :2], axis=0)).sum(axis=1) <= 1))
+            positions[robot_idx, :len(plan)] = plan[:, :2]
+            positions[robot_idx, len(plan):] = plan[-1, :2] # staying at the goal
+        for t in range(makespan + 1):
+            self.assertEqual(len(set(map(tuple, positions[:, t]))), len(states))
+            if t > 0:
+                before = {tuple(cell): robot_idx for robot_idx, cell in enumerate(positions[:, t-1])}
+                for robot_idx, cell in enumerate(positions[:, t]):
+                    other = before.get(tuple(cell))
+                    if other is not None and other != robot_idx:
+                        self.assertNotEqual(tuple(positions[other, t]), tuple(positions[robot_idx, t-1]))
+
+    def test_distance_field(self):
+        free = np.ones((3, 4), dtype=bool)
+        free[1, :3] = False
+        distance = distance_field(free, (0, 0))
+        self.assertEqual(distance[2, 0], 8)
+        self.assertEqual(distance[1, 0], UNREACHABLE)
+
+    def test_plan_and_partial_replan(self):
+        starts, goals = load_robots(DATA + "/csv_robots_yaml.yaml")
+        planner = PrioritizedPlanner(DATA + "/csv_map_yaml.yaml")
+        plans = planner.plan(starts, goals)
+        self.assertValidPlans(plans, starts, goals)
+        self.assertEqual(plans["statistics"]["cost"], sum(len(plan) - 1 for plan in plans["schedule"].values()))
+        determine_ADG(plans)
+
+        replanned = [0, 3, 7]
+        fixed_plans = {robot_idx: plans["schedule"]["agent" + str(robot_idx)] for robot_idx in range(len(starts)) if robot_idx not in replanned}
+        partial_plans = planner.plan(starts, goals, order=replanned[::-1], fixed_plans=fixed_plans)
+        self.assertValidPlans(partial_plans, starts, goals)
+        for robot_idx, plan in fixed_plans.items():
+            self.assertTrue(np.array_equal(partial_plans["schedule"]["agent" + str(robot_idx)], plan))
+
+    def test_invalid(self):
+        planner = PrioritizedPlanner(np.ones((3, 3), dtype=bool))
+        with self.assertRaises(ValueError):
+            planner.plan([(0, 0)], [(3, 0)])
+        self.assertIsNone(planner.plan([(0, 0), (1, 1)], [(2, 2), (2, 2)]))
+
+if __name__ == "__main__":
+    unittest.main()
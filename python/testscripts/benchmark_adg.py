@@ -0,0 +1,54 @@
+"""
+    BENCHMARKS THE ADG CONSTRUCTION (determine_ADG)
+
+    Compares the pairwise Type 2 edge search with the location-indexed one on
+    the planner outputs stored in data/tmp*/output.yaml. Each plan is cut to
+    an increasing number of robots to show construction time vs robot count.
+
+    usage (from the python/ directory):
+        python testscripts/benchmark_adg.py [plan_file ...]
+"""
+
+import glob
+import logging
+import os
+import sys
+import time
+import yaml
+
+sys.path.insert(1, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from functions.adg import determine_ADG
+
+def time_ADG(plans, spatial_index):
+    start = time.perf_counter()
+    ADG, _, _ = determine_ADG(plans, spatial_index=spatial_index)
+    return ADG, time.perf_counter() - start
+
+def main():
+    logging.basicConfig(level=logging.WARNING)
+    pwd = os.path.dirname(os.path.abspath(__file__))
+    plan_files = sys.argv[1:]
+    if len(plan_files) == 0:
+        plan_files = sorted(glob.glob(pwd + "/../data/tmp*/output.yaml"))
+
+    print("{:<28} {:>6} {:>7} {:>7} {:>12} {:>12} {:>8}".format(
+        "plan", "robots", "nodes", "edges", "pairwise [s]", "indexed [s]", "speedup"))
+    for plan_file in plan_files:
+        with open(plan_file) as stream:
+            plans = yaml.safe_load(stream)
+        schedule = list(plans["schedule"].items())
+        name = os.path.relpath(plan_file, pwd + "/../data")
+
+        for robot_count in list(range(10, len(schedule), 10)) + [len(schedule)]:
+            sub_plans = {"schedule": dict(schedule[:robot_count])}
+            ADG_pairwise, t_pairwise = time_ADG(sub_plans, spatial_index=False)
+            ADG_indexed, t_indexed = time_ADG(sub_plans, spatial_index=True)
+            if list(ADG_pairwise.edges(data=True)) != list(ADG_indexed.edges(data=True)):
+                raise Exception("ADG mismatch for {} with {} robots".format(name, robot_count))
+
+            print("{:<28} {:>6} {:>7} {:>7} {:>12.4f} {:>12.4f} {:>7.1f}x".format(
+                name, robot_count, ADG_indexed.number_of_nodes(), ADG_indexed.number_of_edges(),
+                t_pairwise, t_indexed, t_pairwise / max(t_indexed, 1e-9)))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+    BENCHMARKS THE BIG-M OF THE ORDERING MILP (solve_MILP)
+
+    Runs the closed loop of main_ECBS (without planner, robots delayed at
+    random) on the planner outputs stored in data/tmp*/output.yaml. At every
+    time step the MILP (cumulative cost) is built from scratch once with the
+    fixed M and once with the tight per-constraint M, and the solver time and the number of
+    branch-and-bound nodes CBC enumerated are summed per formulation, as
+    well as the objective values. A tight M never cuts off the optimum, so its
+    objective is at most the fixed-M one (up to the solver's relative gap);
+    a lower objective means the fixed-M solve stopped at a worse solution.
+    The ordering of solve_MILP (fixed M) drives the simulation.
+
+    usage (from the python/ directory):
+        python testscripts/benchmark_milp.py [robot_count [H_control]]
+"""
+
+import glob
+import logging
+import os
+import re
+import sys
+import tempfile
+import time
+import yaml
+import numpy as np
+from mip import Model
+
+sys.path.insert(1, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from functions.adg import determine_ADG, analyze_ADG
+from functions.adg_node import Status
+from functions.robot import Robot
+from functions.milp_formulation import MILPFormulation, define_objective, determine_switchable_groups, solve_MILP
+
+def solve_counting_nodes(robots, dependency_groups, ADG, H_control, big_M):
+    """ solves the MILP from scratch, returns (solver time, B&B nodes, objective) """
+    switchable_dependency_groups, fixed_dependency_groups = determine_switchable_groups(robots, dependency_groups, ADG.graph["nodes"], H_control)
+    formulation = MILPFormulation(Model(), incremental=False, big_M=big_M)
+    milp_variables = formulation.update(robots, switchable_dependency_groups, fixed_dependency_groups)
+    define_objective(formulation, robots, milp_variables, "cumulative")
+    m = formulation.model
+    m.verbose = 1
+    # CBC reports the node count on the C-level stdout only
+    with tempfile.TemporaryFile(mode="w+") as log_file:
+        sys.stdout.flush()
+        stdout_fd = os.dup(1)
+        os.dup2(log_file.fileno(), 1)
+        try:
+            start = time.process_time()
+            m.optimize(max_seconds=600)
+            solver_time = time.process_time() - start
+        finally:
+            sys.stdout.flush()
+            os.dup2(stdout_fd, 1)
+            os.close(stdout_fd)
+        log_file.seek(0)
+        node_counts = re.findall(r"Enumerated nodes:\s+(\d+)", log_file.read())
+    return solver_time, int(node_counts[-1]) if node_counts else 0, m.objective_value
+
+def run(plans, H_control, delay_amount=5, seed=1, sim_timeout=500):
+    np.random.seed(seed)
+    ADG, robot_plan, goal_positions = determine_ADG(plans)
+    _, _, dependency_groups = analyze_ADG(ADG, plans)
+    ADG_nodes = ADG.graph["nodes"]
+    ADG_reverse = ADG.reverse(copy=False)
+    robots = [Robot(robot_ID, robot_plan[robot_ID], None, goal_positions[robot_ID]) for robot_ID in robot_plan]
+    delayed_robot_cnt = round(0.2*len(robots))
+
+    totals = {"fixed": [0.0, 0, 0.0], "tight": [0.0, 0, 0.0]}
+    k = 0
+    robot_IDs_to_delay = []
+    while not all(robot.is_done() for robot in robots) and k < sim_timeout:
+        objectives = {}
+        for big_M in ["fixed", "tight"]:
+            solver_time, node_count, objectives[big_M] = solve_counting_nodes(robots, dependency_groups, ADG, H_control, big_M)
+            totals[big_M][0] += solver_time
+            totals[big_M][1] += node_count
+            totals[big_M][2] += objectives[big_M]
+        # both within the solver's default relative gap of the optimum
+        if objectives["tight"] - objectives["fixed"] > 1e-4*max(1.0, abs(objectives["fixed"])):
+            raise Exception("tight M cut off the optimum at k = {}: {}".format(k, objectives))
+        solve_MILP(robots, dependency_groups, ADG, ADG_reverse, H_control, np.nan, Model(), None)
+
+        if (k % delay_amount) == 0:
+            robot_IDs_to_delay = np.random.choice(len(robots), size=delayed_robot_cnt, replace=False)
+        for robot in robots:
+            if robot.is_done() or k == 0 or robot.robot_ID in robot_IDs_to_delay:
+                continue
+            if all(ADG_nodes.status[node] == Status.FINISHED for node in ADG_reverse.neighbors(robot.current_node)):
+                ADG_nodes.status[robot.current_node] = Status.FINISHED
+                robot.advance()
+        k += 1
+    return k, totals
+
+def main():
+    logging.basicConfig(level=logging.WARNING)
+    pwd = os.path.dirname(os.path.abspath(__file__))
+    robot_count = int(sys.argv[1]) if len(sys.argv) > 1 else 30
+    H_control = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    rows = []
+    for plan_file in sorted(glob.glob(pwd + "/../data/tmp*/output.yaml")):
+        with open(plan_file) as stream:
+            plans = yaml.safe_load(stream)
+        plans["schedule"] = dict(list(plans["schedule"].items())[:robot_count])
+        steps, totals = run(plans, H_control)
+        rows.append((os.path.relpath(plan_file, pwd + "/../data"), len(plans["schedule"]), steps, totals))
+
+    print("{:<20} {:>6} {:>6} {:>12} {:>12} {:>12} {:>12} {:>14}".format(
+        "plan", "robots", "steps", "fixed M [s]", "tight M [s]", "fixed nodes", "tight nodes", "fixed - tight"))
+    for name, robots, steps, totals in rows:
+        print("{:<20} {:>6} {:>6} {:>12.3f} {:>12.3f} {:>12} {:>12} {:>14.2f}".format(
+            name, robots, steps, totals["fixed"][0], totals["tight"][0], totals["fixed"][1], totals["tight"][1],
+            totals["fixed"][2] - totals["tight"][2]))
+
+if __name__ == "__main__":
+    main()
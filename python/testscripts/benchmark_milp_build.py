@@ -0,0 +1,95 @@
+"""
+    BENCHMARKS THE MODEL BUILD OF THE ORDERING MILP (MILPFormulation)
+
+    Runs the closed loop of main_ECBS (without planner and without solving,
+    robots delayed at random, the ordering of the ADG is kept) on the planner
+    outputs with at least 50 robots stored in data/tmp*/output.yaml. At every
+    time step the model (variables, precedence, switchable and fixed group
+    constraints, cumulative objective) is built from scratch, and the
+    incremental model of solve_MILP is brought up to date. The wall-clock
+    build times are summed per plan; the largest from-scratch build is
+    reported as well.
+
+    usage (from the python/ directory):
+        python testscripts/benchmark_milp_build.py [H_control [min_robots]]
+"""
+
+import glob
+import logging
+import os
+import sys
+import time
+import yaml
+import numpy as np
+from mip import Model
+
+sys.path.insert(1, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from functions.adg import determine_ADG, analyze_ADG
+from functions.adg_node import Status
+from functions.robot import Robot
+from functions.milp_formulation import MILPFormulation, define_objective, determine_switchable_groups
+
+def build(formulation, robots, dependency_groups, ADG, H_control):
+    """ brings formulation up to date, returns the build time [s] """
+    start = time.perf_counter()
+    switchable_dependency_groups, fixed_dependency_groups = determine_switchable_groups(
+        robots, dependency_groups, ADG.graph["nodes"], H_control, ADG.graph.get("group_thresholds"))
+    milp_variables = formulation.update(robots, switchable_dependency_groups, fixed_dependency_groups)
+    define_objective(formulation, robots, milp_variables, "cumulative")
+    return time.perf_counter() - start
+
+def run(plans, H_control, delay_amount=5, seed=1, sim_timeout=500):
+    np.random.seed(seed)
+    ADG, robot_plan, goal_positions = determine_ADG(plans)
+    _, _, dependency_groups = analyze_ADG(ADG, plans)
+    ADG_nodes = ADG.graph["nodes"]
+    ADG_reverse = ADG.reverse(copy=False)
+    robots = [Robot(robot_ID, robot_plan[robot_ID], None, goal_positions[robot_ID]) for robot_ID in robot_plan]
+    delayed_robot_cnt = round(0.2*len(robots))
+
+    incremental = MILPFormulation(Model(), incremental=True)
+    totals = {"scratch": 0.0, "worst": 0.0, "incremental": 0.0, "rows": 0}
+    k = 0
+    robot_IDs_to_delay = []
+    while not all(robot.is_done() for robot in robots) and k < sim_timeout:
+        formulation = MILPFormulation(Model(), incremental=False)
+        build_time = build(formulation, robots, dependency_groups, ADG, H_control)
+        totals["scratch"] += build_time
+        totals["worst"] = max(totals["worst"], build_time)
+        totals["rows"] = max(totals["rows"], formulation.model.num_rows)
+        totals["incremental"] += build(incremental, robots, dependency_groups, ADG, H_control)
+
+        if (k % delay_amount) == 0:
+            robot_IDs_to_delay = np.random.choice(len(robots), size=delayed_robot_cnt, replace=False)
+        for robot in robots:
+            if robot.is_done() or k == 0 or robot.robot_ID in robot_IDs_to_delay:
+                continue
+            if all(ADG_nodes.status[node] == Status.FINISHED for node in ADG_reverse.neighbors(robot.current_node)):
+                ADG_nodes.status[robot.current_node] = Status.FINISHED
+                robot.advance()
+        k += 1
+    return k, totals
+
+def main():
+    logging.basicConfig(level=logging.WARNING)
+    pwd = os.path.dirname(os.path.abspath(__file__))
+    H_control = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    min_robots = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+
+    rows = []
+    for plan_file in sorted(glob.glob(pwd + "/../data/tmp*/output.yaml")):
+        with open(plan_file) as stream:
+            plans = yaml.safe_load(stream)
+        if len(plans["schedule"]) < min_robots:
+            continue
+        steps, totals = run(plans, H_control)
+        rows.append((os.path.relpath(plan_file, pwd + "/../data"), len(plans["schedule"]), steps, totals))
+
+    print("{:<20} {:>6} {:>6} {:>8} {:>14} {:>14} {:>16}".format(
+        "plan", "robots", "steps", "rows", "scratch [s]", "worst [ms]", "incremental [s]"))
+    for name, robots, steps, totals in rows:
+        print("{:<20} {:>6} {:>6} {:>8} {:>14.3f} {:>14.1f} {:>16.3f}".format(
+            name, robots, steps, totals["rows"], totals["scratch"], 1000*totals["worst"], totals["incremental"]))
+
+if __name__ == "__main__":
+    main()
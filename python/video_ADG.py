@@ -40,7 +40,7 @@ def main():
     sim_timeout = 500
 
     # define prediction and control horizons: H_prediction >= H_control
-    H_prediction = np.NaN # integer value for forward node lookup
+    H_prediction = None # integer value for forward node lookup, None: whole plans
     H_control = 5
     random_seed = 0
     mu = 0.5
@@ -87,6 +87,7 @@ def main():
     ADG, robot_plan, goal_positions = determine_ADG(plans, show_graph=False)
     nodes_all, edges_type_1, dependency_groups = analyze_ADG(ADG, plans, show_graph=False)
     ADG_reverse = ADG.reverse(copy=False)
+    ADG_nodes = ADG.graph["nodes"]
 
     # initialize simulation
     robots = []
@@ -133,8 +134,7 @@ def main():
             # show current robot status
             logger.info("-------------------- @ time step k = {} --------------------".format(k))
             for robot in robots:
-                node_info = ADG.node[robot.current_node]["data"]
-                logger.debug("   - Robot {} # {} @ {} => status: {}".format(robot.robot_ID, node_info.ID, node_info.s_loc, robot.status))
+                logger.debug("   - Robot {} # {} @ {} => status: {}".format(robot.robot_ID, ADG_nodes.name(robot.current_node), ADG_nodes.s_loc[robot.current_node], robot.status))
 
             # solve MILP for the advanced ADG to potentially adjust ordering
             res, solve_t = solve_MILP(robots, dependency_groups, ADG, ADG_reverse, H_control, H_prediction, m_opt, pl_opt, run=run_MILP, uncertainty_bound=robust_param)
@@ -166,11 +166,10 @@ def main():
             # Advance robots if possible (dependencies have been met)
             for robot in robots:
                 # check if all dependencies have been met, to advance to next node
-                node_info = ADG.node[robot.current_node]["data"]
                 node_dependencies_list = list(ADG_reverse.neighbors(robot.current_node))
                 all_dependencies_completed = True
                 for dependency in node_dependencies_list:
-                    if (ADG.node[dependency]["data"].status != Status.FINISHED):
+                    if (ADG_nodes.status[dependency] != Status.FINISHED):
                         all_dependencies_completed = False
 
                 # if all dependencies are completed, the robot can advance!
@@ -179,7 +178,7 @@ def main():
 
                 if all_dependencies_completed and k > 0: # (robot.robot_ID == 2 or k > 5)
                     if (not (robot.robot_ID in robot_IDs_to_delay)): # or (k < 10 or k > 20)): # or (robot.robot_ID == 3 or k > 8):
-                        ADG.node[robot.current_node]["data"].status = Status.FINISHED
+                        ADG_nodes.status[robot.current_node] = Status.FINISHED
                         robot.advance()
 
                 if not robot.is_done():
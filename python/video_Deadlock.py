@@ -45,7 +45,7 @@ def main():
     sim_timeout = 500
 
     # define prediction and control horizons: H_prediction >= H_control
-    H_prediction = np.NaN # integer value for forward node lookup
+    H_prediction = None # integer value for forward node lookup, None: whole plans
     H_control = 5
     random_seed = 0
     mu = 0.5